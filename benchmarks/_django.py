@@ -0,0 +1,44 @@
+"""
+Shared setup for the benchmark scripts in this directory.
+
+Each script is run from the repository root, e.g.::
+
+    python -m benchmarks.pagination
+
+and works against a throwaway test database, never ``db.sqlite3``.
+"""
+import contextlib
+import os
+import time
+
+import django
+
+
+def setup():
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'school_website.settings')
+    django.setup()
+
+
+@contextlib.contextmanager
+def test_database():
+    from django.db import connection
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+def timeit(func, repeat=20):
+    """Return the median wall time of ``func`` in milliseconds."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return samples[len(samples) // 2]
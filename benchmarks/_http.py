@@ -0,0 +1,60 @@
+"""
+Load-testing helpers for the benchmarks that drive a real server process.
+"""
+import http.client
+import socket
+import threading
+import time
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for(port):
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f'Server on port {port} did not start')
+
+
+def load(port, paths, concurrency, duration):
+    """
+    ``(requests per second, errors)`` from ``concurrency`` keep-alive clients
+    cycling through ``paths`` for ``duration`` seconds.
+    """
+    deadline = time.monotonic() + duration
+    counts = [0] * concurrency
+    errors = [0] * concurrency
+
+    def client(n):
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        i = n
+        while time.monotonic() < deadline:
+            try:
+                connection.request('GET', paths[i % len(paths)])
+                response = connection.getresponse()
+                response.read()
+                if response.status != 200:
+                    errors[n] += 1
+                counts[n] += 1
+            except (OSError, http.client.HTTPException):
+                errors[n] += 1
+                connection.close()
+                connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+            i += 1
+        connection.close()
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(concurrency)]
+    start = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sum(counts) / (time.monotonic() - start), sum(errors)
@@ -0,0 +1,94 @@
+"""
+Time and queries per request of the student admin change list at 200k
+students, as main/admin.py sets it up against variations of it:
+
+* a bare ``admin.site.register(Student)``, with its two COUNT(*)s
+* exact counts instead of the estimate
+* ``icontains`` search instead of the indexed prefix search
+
+and the COUNT(*) the estimate replaces, on its own.
+"""
+import contextlib
+
+from benchmarks._django import setup, test_database, timeit
+
+setup()
+
+from datetime import date  # noqa: E402
+
+from django.contrib import admin  # noqa: E402
+from django.contrib.auth.models import User  # noqa: E402
+from django.core.paginator import Paginator  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test import Client  # noqa: E402
+from django.test.utils import CaptureQueriesContext  # noqa: E402
+from django.urls import reverse  # noqa: E402
+
+from main.models import Student  # noqa: E402
+from main.pagination import estimated_count  # noqa: E402
+
+ROWS = 200_000
+
+
+def populate():
+    User.objects.bulk_create((User(username=f'user{n}') for n in range(ROWS)), batch_size=5000)
+    users = User.objects.order_by('pk').values_list('pk', flat=True).iterator()
+    Student.objects.bulk_create(
+        (
+            Student(
+                user_id=user_id, first_name='Sita', last_name=f'Rai {n}', date_of_birth=date(2010, 4, 1),
+                phone_number='9800000000', address='Ward 4', city='Kathmandu', zip_code='44600',
+                student_id=f'S{n:06}', faculty='science', department=('physics', 'mathematics')[n % 2],
+                enrollment_date=date(2025, 4, 14),
+            )
+            for n, user_id in enumerate(users)
+        ),
+        batch_size=5000,
+    )
+
+
+@contextlib.contextmanager
+def patched(model_admin, **attrs):
+    old = {name: getattr(model_admin, name) for name in attrs}
+    for name, value in attrs.items():
+        setattr(model_admin, name, value)
+    try:
+        yield
+    finally:
+        for name, value in old.items():
+            setattr(model_admin, name, value)
+
+
+def main():
+    model_admin = admin.site.get_model_admin(Student)
+    bare = {
+        'list_display': ('__str__',), 'list_select_related': False, 'list_filter': (), 'search_fields': (),
+        'paginator': Paginator, 'show_full_result_count': True,
+    }
+    variants = [
+        ('bare register()', bare, ''),
+        ('main/admin.py', {}, ''),
+        ('  with exact counts', {'paginator': Paginator, 'show_full_result_count': True}, ''),
+        ('  filtered by department', {}, '?department__exact=physics'),
+        ('  prefix search', {}, '?q=S19999'),
+        ('  icontains search', {'search_fields': ['student_id', 'last_name', 'first_name']}, '?q=S19999'),
+    ]
+    with test_database():
+        populate()
+        client = Client()
+        client.force_login(User.objects.create(username='admin', is_staff=True, is_superuser=True))
+        url = reverse('admin:main_student_changelist')
+        print(f'{ROWS} students')
+        for label, attrs, query in variants:
+            with patched(model_admin, **attrs):
+                with CaptureQueriesContext(connection) as ctx:
+                    assert client.get(url + query).status_code == 200
+                queries = len(ctx.captured_queries)
+                ms = timeit(lambda: client.get(url + query), repeat=5)
+            print(f'{label:32} {queries:>4} queries {ms:9.1f} ms')
+        print(f'{"COUNT(*)":32} {"":12} {timeit(Student.objects.count):9.2f} ms')
+        print(f'{"estimated_count()":32} {"":12} {timeit(lambda: estimated_count(Student.objects.all())):9.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
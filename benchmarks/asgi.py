@@ -0,0 +1,96 @@
+"""
+Requests per second for the public read pages under gunicorn's sync and
+threaded workers (WSGI, sync views) versus a uvicorn worker (ASGI, with
+ASYNC_VIEWS on). Each server gets one worker process and CONCURRENCY
+clients for DURATION seconds; the page cache is off so every request
+reaches the view.
+
+Needs gunicorn, uvicorn and uvicorn-worker installed.
+"""
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from datetime import date, timedelta
+
+DIRECTORY = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = f'sqlite:///{os.path.join(DIRECTORY, "bench.sqlite3")}'
+os.environ['PAGE_CACHE_ENABLE'] = 'False'
+
+from benchmarks._django import setup  # noqa: E402
+from benchmarks._http import free_port, load, wait_for  # noqa: E402
+
+setup()
+
+from django.contrib.auth.models import User  # noqa: E402
+from django.core.management import call_command  # noqa: E402
+from django.utils import timezone  # noqa: E402
+
+from main.models import Announcement, Event, News, SchoolInfo, Staff  # noqa: E402
+
+PATHS = ('/', '/announcements/', '/events/', '/news/')
+CONCURRENCY = 32
+DURATION = 10
+
+SERVERS = {
+    'gunicorn sync (WSGI)': (['school_website.wsgi:application', '-k', 'sync'], {}),
+    'gunicorn gthread x8 (WSGI)': (['school_website.wsgi:application', '-k', 'gthread', '--threads', '8'], {}),
+    'uvicorn (ASGI, async views)': (
+        ['school_website.asgi:application', '-k', 'uvicorn_worker.UvicornWorker'], {'ASYNC_VIEWS': 'True'},
+    ),
+}
+
+
+def populate():
+    now = timezone.now()
+    SchoolInfo.objects.create(
+        name='Bench School', address='Kathmandu', phone='01', email='info@example.com',
+        logo='school/logo/logo.png', established_date=date(2000, 1, 1),
+    )
+    author = User.objects.create(username='bench')
+    staff = Staff.objects.create(
+        first_name='Ram', last_name='Sharma', photo='staff/photos/ram.jpg',
+        position='Teacher', department='teaching', join_date=date(2020, 1, 1),
+    )
+    Announcement.objects.bulk_create(
+        Announcement(title=f'Announcement {i}', content='Lorem ipsum ' * 50, author=author, important=i % 5 == 0)
+        for i in range(500)
+    )
+    Event.objects.bulk_create(
+        Event(
+            title=f'Event {i}', description='...', location='Hall', event_type='academic',
+            start_date=now + timedelta(days=i - 100), end_date=now + timedelta(days=i - 100, hours=2),
+        )
+        for i in range(500)
+    )
+    News.objects.bulk_create(
+        News(title=f'News {i}', content='Lorem ipsum ' * 50, author=staff, featured_image='news/n.jpg')
+        for i in range(500)
+    )
+
+
+def main():
+    try:
+        call_command('migrate', verbosity=0)
+        populate()
+        for name, (args, env) in SERVERS.items():
+            port = free_port()
+            server = subprocess.Popen(
+                [sys.executable, '-m', 'gunicorn', *args, '-w', '1', '-b', f'127.0.0.1:{port}', '--log-level', 'warning'],
+                env={**os.environ, **env},
+            )
+            try:
+                wait_for(port)
+                load(port, PATHS, CONCURRENCY, DURATION)  # warm up
+                rate, errors = load(port, PATHS, CONCURRENCY, DURATION)
+            finally:
+                server.terminate()
+                server.wait()
+            print(f'{name:30} {rate:8.1f} req/s ({errors} errors)')
+    finally:
+        shutil.rmtree(DIRECTORY)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,40 @@
+"""
+Home page render time with the base layout's header/nav/footer fragments
+cached versus rendered on every request.
+"""
+from datetime import date
+
+from benchmarks._django import setup, test_database, timeit
+
+setup()
+
+from django.conf import settings  # noqa: E402
+from django.test import Client, override_settings  # noqa: E402
+
+from main.models import SchoolInfo  # noqa: E402
+
+UNCACHED = {
+    **settings.CACHES,
+    # {% cache %} uses this alias when it exists; the dummy backend never hits
+    'template_fragments': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+}
+
+
+def main():
+    with test_database():
+        SchoolInfo.objects.create(
+            name='Bench School', address='Kathmandu', phone='01', email='info@example.com',
+            logo='school/logo/logo.png', established_date=date(2000, 1, 1),
+        )
+        client = Client()
+
+        with override_settings(CACHES=UNCACHED):
+            before = timeit(lambda: client.get('/'), repeat=200)
+        client.get('/')
+        after = timeit(lambda: client.get('/'), repeat=200)
+        print(f'home, fragments rendered: {before:6.2f} ms')
+        print(f'home, fragments cached:   {after:6.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
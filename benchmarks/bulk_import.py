@@ -0,0 +1,79 @@
+"""
+Time to import students (each with a User account) from CSV with
+``import_csv``, against saving the same rows one at a time through the
+registration forms.
+
+Most of an import with passwords is PBKDF2 hashing, which the process pool
+spreads over IMPORT_HASH_WORKERS cores; rows without a password skip it.
+"""
+import io
+import os
+import time
+
+from benchmarks._django import setup, test_database
+
+setup()
+
+from django.conf import settings  # noqa: E402
+from django.contrib.auth.models import User  # noqa: E402
+
+from main.forms import StudentRegistrationForm, UserRegistrationForm  # noqa: E402
+from main.imports import IMPORTERS, import_csv  # noqa: E402
+from main.models import Student  # noqa: E402
+
+HEADER = (
+    'username,email,password,first_name,last_name,date_of_birth,phone_number,address,city,zip_code,'
+    'student_id,faculty,department,enrollment_date'
+)
+
+
+def rows(start, count, password=''):
+    for n in range(start, start + count):
+        yield {
+            'username': f'student{n}', 'email': f'student{n}@example.com', 'password': password,
+            'first_name': 'Sita', 'last_name': f'Rai {n}', 'date_of_birth': '2010-04-01',
+            'phone_number': '9800000000', 'address': 'Ward 4', 'city': 'Kathmandu', 'zip_code': '44600',
+            'student_id': f'S{n:06}', 'faculty': 'science', 'department': 'physics', 'enrollment_date': '2025-04-14',
+        }
+
+
+def as_csv(data):
+    return io.StringIO(HEADER + '\n' + ''.join(','.join(row.values()) + '\n' for row in data))
+
+
+def one_by_one(data):
+    for row in data:
+        user_form = UserRegistrationForm({**row, 'password1': row['password'], 'password2': row['password']})
+        student_form = StudentRegistrationForm(row)
+        assert user_form.is_valid() and student_form.is_valid()
+        student = student_form.save(commit=False)
+        student.user = user_form.save()
+        student.save()
+
+
+def timed(label, count, func):
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    print(f'{label:44} {count:>6} rows {elapsed:8.2f} s {count / elapsed:8.0f} rows/s')
+    return elapsed
+
+
+def main():
+    workers = settings.IMPORT_HASH_WORKERS
+    print(f'{os.cpu_count()} CPUs, IMPORT_HASH_WORKERS={workers}')
+    with test_database():
+        importer = IMPORTERS['students']
+        timed('import_csv, no passwords', 10_000, lambda: import_csv(importer, as_csv(rows(0, 10_000))))
+        hashed = 8 * workers
+        elapsed = timed(
+            'import_csv, with passwords', hashed,
+            lambda: import_csv(importer, as_csv(rows(10_000, hashed, 'Secret#123')), batch_size=2 * workers),
+        )
+        print(f'{"":44} => 10k with passwords in ~{elapsed / hashed * 10_000:.0f} s at {workers} workers')
+        timed('registration forms, one row at a time', hashed, lambda: one_by_one(rows(20_000, hashed, 'Secret#123')))
+        assert Student.objects.count() == User.objects.count() == 10_000 + 2 * hashed
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+Calendar API month window and .ics feed builds at 100k events, with and
+without event_window_idx.
+"""
+import random
+from datetime import timedelta
+
+from benchmarks._django import setup, test_database, timeit
+
+setup()
+
+from django.core.cache import caches  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.utils import timezone  # noqa: E402
+
+from main.calendars import events_in_window, ics_feed  # noqa: E402
+from main.models import Event  # noqa: E402
+
+ROWS = 100_000
+TYPES = ('academic', 'sports', 'cultural', 'holiday')
+
+
+def populate():
+    # Ten years of events either side of today
+    now = timezone.now()
+    events = []
+    for i in range(ROWS):
+        start = now + timedelta(minutes=random.randint(-5 * 525_600, 5 * 525_600))
+        events.append(Event(
+            title=f'Event {i}', description='Lorem ipsum ' * 20, location='Hall',
+            event_type=random.choice(TYPES), start_date=start,
+            end_date=start + timedelta(hours=random.randint(1, 72)),
+        ))
+    Event.objects.bulk_create(events, batch_size=5000)
+
+
+def month_window(event_type=None):
+    start = timezone.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    end = start + timedelta(days=42)
+    return lambda: list(events_in_window(start, end, event_type))
+
+
+def main():
+    with test_database():
+        populate()
+        print(f'{ROWS} events')
+
+        index = next(i for i in Event._meta.indexes if i.name == 'event_window_idx')
+        print(f'month window, with index:          {timeit(month_window()):8.3f} ms')
+        print(f'month window, one type, with index:{timeit(month_window("sports")):8.3f} ms')
+        with connection.schema_editor() as editor:
+            editor.remove_index(Event, index)
+        print(f'month window, without index:       {timeit(month_window()):8.3f} ms')
+        print(f'month window, one type, no index:  {timeit(month_window("sports")):8.3f} ms')
+        with connection.schema_editor() as editor:
+            editor.add_index(Event, index)
+
+        cache = caches['default']
+
+        def cold():
+            cache.clear()
+            ics_feed('sports', 'Bench School sports events')
+
+        def after_one_edit():
+            event = Event.objects.filter(event_type='sports', start_date__gte=timezone.now()).first()
+            event.save()
+            ics_feed('sports', 'Bench School sports events')
+
+        def unchanged():
+            ics_feed('sports', 'Bench School sports events')
+
+        print(f'sports feed, cold build:           {timeit(cold, repeat=5):8.1f} ms')
+        print(f'sports feed, after one edit:       {timeit(after_one_edit, repeat=5):8.1f} ms')
+        print(f'sports feed, unchanged:            {timeit(unchanged):8.3f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""
+Requests per second for a news detail page answered with 304 Not Modified
+versus a full render.
+"""
+import time
+from datetime import date
+
+from benchmarks._django import setup, test_database
+
+setup()
+
+from django.test import Client  # noqa: E402
+
+from main.models import News, SchoolInfo, Staff  # noqa: E402
+
+REQUESTS = 1000
+
+
+def throughput(client, url, **headers):
+    start = time.perf_counter()
+    for _ in range(REQUESTS):
+        response = client.get(url, **headers)
+    return REQUESTS / (time.perf_counter() - start), response.status_code
+
+
+def main():
+    with test_database():
+        SchoolInfo.objects.create(
+            name='Bench School', address='Kathmandu', phone='01', email='info@example.com',
+            logo='school/logo/logo.png', established_date=date(2000, 1, 1),
+        )
+        author = Staff.objects.create(
+            first_name='Ram', last_name='Sharma', photo='staff/photos/ram.jpg',
+            position='Teacher', department='teaching', join_date=date(2020, 1, 1),
+        )
+        news = News.objects.create(
+            title='Sports week', content='Lorem ipsum ' * 500, author=author, featured_image='news/n.jpg',
+        )
+        client = Client()
+        url = f'/news/{news.pk}/'
+        etag = client.get(url)['ETag']
+
+        full, status = throughput(client, url)
+        print(f'full render:      {full:8.1f} req/s ({status})')
+        not_modified, status = throughput(client, url, HTTP_IF_NONE_MATCH=etag)
+        print(f'304 Not Modified: {not_modified:8.1f} req/s ({status})')
+
+
+if __name__ == '__main__':
+    main()
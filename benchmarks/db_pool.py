@@ -0,0 +1,118 @@
+"""
+PostgreSQL connections and throughput under gunicorn's threaded workers,
+with a persistent connection per thread (CONN_MAX_AGE) versus DB_POOL.
+
+Runs against a throwaway local PostgreSQL started with pgserver
+(pip install pgserver psycopg[binary,pool]), standing in for the real
+database server.
+"""
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import date
+
+import pgserver
+import psycopg
+
+DIRECTORY = tempfile.mkdtemp()
+SERVER = pgserver.get_server(DIRECTORY, cleanup_mode='stop')
+os.environ['DATABASE_URL'] = SERVER.get_uri()
+os.environ['PAGE_CACHE_ENABLE'] = 'False'
+
+from benchmarks._django import setup  # noqa: E402
+from benchmarks._http import free_port, load, wait_for  # noqa: E402
+
+setup()
+
+from django.contrib.auth.models import User  # noqa: E402
+from django.core.management import call_command  # noqa: E402
+from django.db import connections  # noqa: E402
+
+from main.models import Announcement, News, SchoolInfo, Staff  # noqa: E402
+
+PATHS = ('/announcements/', '/news/', '/announcements/?page=2', '/news/?page=3')
+WORKERS = 2
+THREADS = 16
+CONCURRENCY = 64
+DURATION = 10
+
+MODES = {
+    'persistent per thread': {},
+    'DB_POOL, max 4 per worker': {'DB_POOL': 'True', 'DB_POOL_MIN_SIZE': '2', 'DB_POOL_MAX_SIZE': '4'},
+}
+
+
+def populate():
+    SchoolInfo.objects.create(
+        name='Bench School', address='Kathmandu', phone='01', email='info@example.com',
+        logo='school/logo/logo.png', established_date=date(2000, 1, 1),
+    )
+    author = User.objects.create(username='bench')
+    staff = Staff.objects.create(
+        first_name='Ram', last_name='Sharma', photo='staff/photos/ram.jpg',
+        position='Teacher', department='teaching', join_date=date(2020, 1, 1),
+    )
+    Announcement.objects.bulk_create(
+        Announcement(title=f'Announcement {i}', content='Lorem ipsum ' * 50, author=author) for i in range(500)
+    )
+    News.objects.bulk_create(
+        News(title=f'News {i}', content='Lorem ipsum ' * 50, author=staff, featured_image='news/n.jpg')
+        for i in range(500)
+    )
+
+
+class ConnectionSampler(threading.Thread):
+    """Peak number of client connections to the server while running."""
+
+    def __init__(self):
+        super().__init__(daemon=True)
+        self.peak = 0
+        self.running = True
+
+    def run(self):
+        with psycopg.connect(SERVER.get_uri(), autocommit=True) as conn:
+            while self.running:
+                count = conn.execute(
+                    "SELECT count(*) FROM pg_stat_activity WHERE backend_type = 'client backend' AND pid <> pg_backend_pid()"
+                ).fetchone()[0]
+                self.peak = max(self.peak, count)
+                time.sleep(0.1)
+
+
+def main():
+    try:
+        call_command('migrate', verbosity=0)
+        populate()
+        connections.close_all()  # count only the servers' connections
+        for name, env in MODES.items():
+            port = free_port()
+            server = subprocess.Popen(
+                [
+                    sys.executable, '-m', 'gunicorn', 'school_website.wsgi:application',
+                    '-k', 'gthread', '-w', str(WORKERS), '--threads', str(THREADS),
+                    '-b', f'127.0.0.1:{port}', '--log-level', 'warning',
+                ],
+                env={**os.environ, **env},
+            )
+            sampler = ConnectionSampler()
+            try:
+                wait_for(port)
+                load(port, PATHS, CONCURRENCY, 2)  # warm up
+                sampler.start()
+                rate, errors = load(port, PATHS, CONCURRENCY, DURATION)
+            finally:
+                sampler.running = False
+                server.terminate()
+                server.wait()
+            print(f'{name:28} {rate:8.1f} req/s, peak {sampler.peak:3} connections ({errors} errors)')
+    finally:
+        SERVER.cleanup()
+        shutil.rmtree(DIRECTORY, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
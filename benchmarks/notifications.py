@@ -0,0 +1,41 @@
+"""
+Throughput of one-at-a-time sends against ``send_many`` over the stub
+backend, with a simulated provider round trip per message.
+"""
+import time
+
+from benchmarks._django import setup
+
+setup()
+
+from django.test import override_settings  # noqa: E402
+
+from main.notifications import LocMemBackend, Message  # noqa: E402
+
+MESSAGES = 200
+LATENCY = 0.02  # seconds per simulated provider call
+
+
+def run(send):
+    LocMemBackend.outbox = []
+    start = time.perf_counter()
+    send()
+    elapsed = time.perf_counter() - start
+    return len(LocMemBackend.outbox) / elapsed
+
+
+def main():
+    LocMemBackend.latency = LATENCY
+    backend = LocMemBackend()
+    messages = [Message('sms', f'+97798000{i:05d}', '', 'Hello') for i in range(MESSAGES)]
+
+    sequential = run(lambda: [backend.send(*m) for m in messages])
+    print(f'{"sequential":>16}: {sequential:8.1f} msg/s')
+    for concurrency in (4, 8, 16):
+        with override_settings(NOTIFICATION_CONCURRENCY=concurrency):
+            rate = run(lambda: backend.send_many(messages))
+        print(f'{f"send_many x{concurrency}":>16}: {rate:8.1f} msg/s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+OTP verification lookup and sweeper cost at 1M rows, with and without
+the composite lookup index.
+"""
+import random
+import time
+from datetime import timedelta
+
+from benchmarks._django import setup, test_database, timeit
+
+setup()
+
+from django.core.management import call_command  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.utils import timezone  # noqa: E402
+
+from main.models import OTP  # noqa: E402
+
+ROWS = 1_000_000
+
+
+def populate():
+    now = timezone.now()
+    table = OTP._meta.db_table
+    sql = (
+        f'INSERT INTO {table} (email, phone_number, otp_code, created_at, is_verified) '
+        'VALUES (%s, %s, %s, %s, %s)'
+    )
+    batch = []
+    with connection.cursor() as cursor:
+        for i in range(ROWS):
+            roll = random.random()
+            age = timedelta(minutes=random.randint(0, 9)) if roll < 0.1 else timedelta(hours=random.randint(1, 72))
+            batch.append((
+                f'parent{i}@example.com', f'+9779800{i:06d}', f'{random.randint(0, 999999):06d}',
+                now - age, roll > 0.9,
+            ))
+            if len(batch) == 50_000:
+                cursor.executemany(sql, batch)
+                batch = []
+        if batch:
+            cursor.executemany(sql, batch)
+
+
+def lookup():
+    target = OTP.objects.order_by('?').only('email', 'phone_number', 'otp_code').first()
+
+    def run():
+        OTP.objects.filter(
+            email=target.email,
+            phone_number=target.phone_number,
+            otp_code=target.otp_code,
+            is_verified=False,
+            created_at__gt=OTP.expiry_cutoff(),
+        ).order_by('-created_at').first()
+    return timeit(run, repeat=50)
+
+
+def main():
+    with test_database():
+        start = time.perf_counter()
+        populate()
+        print(f'Inserted {ROWS} OTPs in {time.perf_counter() - start:.1f}s')
+
+        index = next(i for i in OTP._meta.indexes if i.name == 'otp_lookup_idx')
+        print(f'lookup with index:    {lookup():8.3f} ms')
+        with connection.schema_editor() as editor:
+            editor.remove_index(OTP, index)
+        print(f'lookup without index: {lookup():8.3f} ms')
+        with connection.schema_editor() as editor:
+            editor.add_index(OTP, index)
+
+        start = time.perf_counter()
+        call_command('sweep_otps', batch_size=5000)
+        print(f'sweep: {time.perf_counter() - start:.1f}s, {OTP.objects.count()} OTPs left')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""
+Compare page-number and keyset pagination of the announcements list at
+100k rows. Offset pages get slower the deeper they go; keyset pages
+should stay flat.
+"""
+from benchmarks._django import setup, test_database, timeit
+
+setup()
+
+from django.contrib.auth.models import User  # noqa: E402
+from django.test import RequestFactory, override_settings  # noqa: E402
+
+from main.models import Announcement  # noqa: E402
+from main.views import AnnouncementListView  # noqa: E402
+
+ROWS = 100_000
+PAGES = (1, 10, 100, 1000, 9000)
+
+
+def populate():
+    author = User.objects.create(username='bench')
+    Announcement.objects.bulk_create(
+        (Announcement(title=f'Announcement {i}', content='...', author=author) for i in range(ROWS)),
+        batch_size=5000,
+    )
+
+
+def list_page(query):
+    view = AnnouncementListView()
+    view.setup(RequestFactory().get('/announcements/', query))
+    view.object_list = view.get_queryset()
+    context = view.get_context_data()
+    list(context['object_list'])
+    return context['page_obj']
+
+
+def keyset_query_for(page_number):
+    """Build the cursor a reader would hold after paging to ``page_number``."""
+    if page_number == 1:
+        return {}
+    view = AnnouncementListView()
+    fields = [view._parse_ordering(item) for item in view.keyset_ordering]
+    ordering = [('-' if desc else '') + name for name, desc in fields]
+    last_row = Announcement.objects.order_by(*ordering)[(page_number - 1) * view.paginate_by - 1]
+    return {'cursor': view._encode_cursor(last_row, fields, backwards=False)}
+
+
+def main():
+    with test_database():
+        populate()
+        print(f'{"page":>6} {"offset ms":>10} {"keyset ms":>10}')
+        for number in PAGES:
+            offset_ms = timeit(lambda: list_page({'page': number}))
+            query = keyset_query_for(number)
+            with override_settings(LIST_PAGINATION_MODE='keyset'):
+                keyset_ms = timeit(lambda: list_page(query))
+            print(f'{number:>6} {offset_ms:>10.2f} {keyset_ms:>10.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""
+Cost of RequestTimingMiddleware on the announcements and news list pages
+(page cache off, so each request queries and renders).
+
+End-to-end timings of a ~10 ms page vary by more than the 1% budget from
+run to run, so the middleware's own work is timed directly: its fixed cost
+per request (sampled or not) and what its execute wrapper adds to each
+query, which every request pays. Those, the pages' query count and their
+mean time give the overhead at the configured sample rate.
+"""
+import os
+import time
+from datetime import date
+
+os.environ['PAGE_CACHE_ENABLE'] = 'False'
+
+from benchmarks._django import setup, test_database  # noqa: E402
+
+setup()
+
+from django.conf import settings  # noqa: E402
+from django.contrib.auth.models import User  # noqa: E402
+from django.http import HttpResponse  # noqa: E402
+from django.test import Client, RequestFactory, override_settings  # noqa: E402
+from django.urls import resolve  # noqa: E402
+
+from main import instrumentation  # noqa: E402
+from main.middleware import RequestTimingMiddleware  # noqa: E402
+from main.models import Announcement, News, SchoolInfo, Staff  # noqa: E402
+
+PATHS = ('/announcements/', '/news/')
+REQUESTS = 500
+LOOPS = 100_000
+
+
+def populate():
+    SchoolInfo.objects.create(
+        name='Bench School', address='Kathmandu', phone='01', email='info@example.com',
+        logo='school/logo/logo.png', established_date=date(2000, 1, 1),
+    )
+    author = User.objects.create(username='bench')
+    staff = Staff.objects.create(
+        first_name='Ram', last_name='Sharma', photo='staff/photos/ram.jpg',
+        position='Teacher', department='teaching', join_date=date(2020, 1, 1),
+    )
+    Announcement.objects.bulk_create(
+        Announcement(title=f'Announcement {i}', content='Lorem ipsum ' * 50, author=author) for i in range(500)
+    )
+    News.objects.bulk_create(
+        News(title=f'News {i}', content='Lorem ipsum ' * 50, author=staff, featured_image='news/n.jpg')
+        for i in range(500)
+    )
+
+
+def per_call_us(func, loops=LOOPS):
+    start = time.perf_counter()
+    for _ in range(loops):
+        func()
+    return (time.perf_counter() - start) * 1e6 / loops
+
+
+def page_stats():
+    """Mean ms per request and queries per request, timing every request."""
+    client = Client()
+    with override_settings(REQUEST_TIMING_SAMPLE_RATE=1.0):
+        for path in PATHS:
+            client.get(path)  # warm up
+        instrumentation.reset_request_stats()
+        start = time.perf_counter()
+        for i in range(REQUESTS):
+            client.get(PATHS[i % len(PATHS)])
+        request_ms = (time.perf_counter() - start) * 1000 / REQUESTS
+    stats = instrumentation.request_stats().values()
+    queries = sum(s['queries'] for s in stats) / sum(s['requests'] for s in stats)
+    instrumentation.reset_request_stats()
+    return request_ms, queries
+
+
+def middleware_us(sample_rate):
+    """The middleware's own time per request, around a view that does nothing."""
+    response = HttpResponse(b'x' * 30_000)
+    request = RequestFactory().get(PATHS[0])
+    request.resolver_match = resolve(PATHS[0])
+    middleware = RequestTimingMiddleware(lambda request: response)
+    with override_settings(REQUEST_TIMING_SAMPLE_RATE=sample_rate):
+        cost = per_call_us(lambda: middleware(request)) - per_call_us(lambda: middleware.get_response(request))
+    instrumentation.reset_request_stats()
+    return cost
+
+
+def query_wrapper_us(timing):
+    """What the execute wrapper adds to a query, in or out of a request."""
+    def execute(sql, params, many, context):
+        return None
+
+    def wrapped():
+        instrumentation.time_query(execute, 'SELECT 1', (), False, None)
+
+    def bare():
+        execute('SELECT 1', (), False, None)
+
+    if timing is None:
+        return per_call_us(wrapped) - per_call_us(bare)
+    with timing.collect():
+        return per_call_us(wrapped) - per_call_us(bare)
+
+
+def main():
+    with test_database():
+        populate()
+        request_ms, queries = page_stats()
+        unsampled_us = middleware_us(0)
+        sampled_us = middleware_us(1)
+        wrap_outside_us = query_wrapper_us(None)
+        wrap_us = query_wrapper_us(instrumentation.RequestTiming())
+
+    print(f'list pages: {request_ms:.2f} ms/request, {queries:.1f} queries/request')
+    print(f'middleware per request: {unsampled_us:.2f} us unsampled, {sampled_us:.2f} us sampled')
+    print(f'execute wrapper per query: {wrap_us:.2f} us in a request, {wrap_outside_us:.2f} us outside one')
+    for rate in sorted({settings.REQUEST_TIMING_SAMPLE_RATE, 1.0}):
+        overhead_us = (1 - rate) * unsampled_us + rate * sampled_us + queries * wrap_us
+        print(f'sample rate {rate:4}: {overhead_us:6.2f} us/request, {overhead_us / (request_ms * 10):.3f}% of a page')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""
+Site search latency over 100k indexed documents: the full-text index
+against the LIKE fallback other databases get.
+"""
+import random
+import time
+
+from benchmarks._django import setup, test_database, timeit
+
+setup()
+
+from django.core.paginator import Paginator  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.utils import timezone  # noqa: E402
+
+from main.models import SearchDocument  # noqa: E402
+from main.search import SearchResults  # noqa: E402
+
+DOCUMENTS = 100_000
+KINDS = ['announcement', 'event', 'gallery', 'news', 'notice']
+
+random.seed(1)
+# A few thousand made-up words; random.choices with Zipf-like weights gives
+# a handful of very common words and a long tail of rare ones.
+VOCABULARY = [
+    ''.join(random.choice('abcdefghijklmnoprstuvwy') for _ in range(random.randint(4, 10)))
+    for _ in range(5000)
+]
+WEIGHTS = [1 / (rank + 1) for rank in range(len(VOCABULARY))]
+
+
+def populate():
+    now = timezone.now()
+    table = SearchDocument._meta.db_table
+    sql = f'INSERT INTO {table} (kind, object_id, title, body, url, date) VALUES (%s, %s, %s, %s, %s, %s)'
+    batch = []
+    with connection.cursor() as cursor:
+        for i in range(DOCUMENTS):
+            title = ' '.join(random.choices(VOCABULARY, WEIGHTS, k=5))
+            body = ' '.join(random.choices(VOCABULARY, WEIGHTS, k=80))
+            batch.append((KINDS[i % 5], i, title, body, f'/news/{i}/', now))
+            if len(batch) == 10_000:
+                cursor.executemany(sql, batch)
+                batch = []
+        if batch:
+            cursor.executemany(sql, batch)
+
+
+def first_page(query, page=1):
+    def run():
+        paginator = Paginator(SearchResults(query), 10)
+        list(paginator.get_page(page).object_list)
+    return run
+
+
+def like_first_page(query):
+    def run():
+        queryset = SearchResults(query)._like_queryset()
+        queryset.count()
+        list(queryset[:10])
+    return run
+
+
+def main():
+    with test_database():
+        start = time.perf_counter()
+        populate()
+        print(f'Indexed {DOCUMENTS} documents in {time.perf_counter() - start:.1f}s ({connection.vendor})')
+
+        common, second, rare = VOCABULARY[0], VOCABULARY[1], VOCABULARY[3000]
+        cases = [
+            (f'rare word "{rare}"', first_page(rare)),
+            (f'common word "{common}"', first_page(common)),
+            ('two common words', first_page(f'{common} {second}')),
+            ('page 50 of a common word', first_page(common, page=50)),
+        ]
+        for label, run in cases:
+            print(f'{label:40} {timeit(run, repeat=20):8.3f} ms')
+        print(f'{"LIKE fallback, rare word":40} {timeit(like_first_page(rare), repeat=5):8.3f} ms')
+
+
+if __name__ == '__main__':
+    main()
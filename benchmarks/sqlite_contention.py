@@ -0,0 +1,79 @@
+"""
+Several processes submitting the contact form to one SQLite file at once,
+with Django's default SQLite settings and with the SQLITE_TUNING profile.
+
+Each submission is a transaction that reads (the rate limiter and form
+validation do) and then inserts. Reports submissions per second and how
+many failed with "database is locked".
+"""
+import multiprocessing
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+PROCESSES = 8
+SUBMISSIONS = 200  # per process
+
+
+def worker(args):
+    database_url, tuning, start_at = args
+    os.environ['DATABASE_URL'] = database_url
+    os.environ['SQLITE_TUNING'] = tuning
+
+    from benchmarks._django import setup
+    setup()
+    from django.db import OperationalError, transaction
+
+    from main.models import ContactMessage
+
+    while time.time() < start_at:
+        time.sleep(0.001)
+    ok = locked = 0
+    for i in range(SUBMISSIONS):
+        try:
+            with transaction.atomic():
+                ContactMessage.objects.filter(email='parent@example.com').count()
+                ContactMessage.objects.create(
+                    name='Parent', email='parent@example.com', subject=f'Question {i}', message='...' * 100,
+                )
+            ok += 1
+        except OperationalError as e:
+            if 'locked' not in str(e):
+                raise
+            locked += 1
+    return ok, locked
+
+
+def run(tuning):
+    directory = tempfile.mkdtemp()
+    database_url = f'sqlite:///{os.path.join(directory, "bench.sqlite3")}'
+    try:
+        subprocess.run(
+            [sys.executable, 'manage.py', 'migrate', '-v', '0'],
+            env={**os.environ, 'DATABASE_URL': database_url, 'SQLITE_TUNING': tuning},
+            check=True, stderr=subprocess.DEVNULL,
+        )
+        context = multiprocessing.get_context('spawn')
+        with context.Pool(PROCESSES) as pool:
+            start_at = time.time() + 3  # once every worker has imported Django
+            results = pool.map(worker, [(database_url, tuning, start_at)] * PROCESSES)
+            elapsed = time.time() - start_at
+        ok = sum(r[0] for r in results)
+        locked = sum(r[1] for r in results)
+        return ok / elapsed, locked
+    finally:
+        shutil.rmtree(directory)
+
+
+def main():
+    total = PROCESSES * SUBMISSIONS
+    for label, tuning in (('default settings', 'False'), ('SQLITE_TUNING', 'True')):
+        rate, locked = run(tuning)
+        print(f'{label:18} {rate:8.1f} submissions/s, {locked}/{total} "database is locked"')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,23 @@
+"""
+gunicorn settings, read from the working directory on start.
+
+Only server hooks live here; pass workers, threads and binds on the
+command line (see Procfile, school_website/asgi.py).
+"""
+import glob
+import os
+
+
+def on_starting(server):
+    # Metrics files left by a previous run would be summed with this one's
+    directory = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+        for path in glob.glob(os.path.join(directory, '*.db')):
+            os.remove(path)
+
+
+def child_exit(server, worker):
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
@@ -1,18 +1,190 @@
-from django.contrib import admin
+import io
+
+from django.conf import settings
+from django.contrib import admin, messages
+from django.core.exceptions import PermissionDenied
+from django.template.response import TemplateResponse
+from django.urls import path
+
 from .models import *
+from .exports import csv_response, export_for_model, xlsx_response
+from .forms import CSVImportForm
+from .imports import IMPORTERS, ImportFileError, count_rows, import_csv
+from .notifications import enqueue_announcement
+from .pagination import EstimatedCountPaginator
 
 admin.site.register(SchoolInfo)
-admin.site.register(Announcement)
-admin.site.register(Staff)
-admin.site.register(Student)
-admin.site.register(Parent)
 admin.site.register(Class)
 admin.site.register(Subject)
-admin.site.register(Event)
 admin.site.register(Gallery)
-admin.site.register(GalleryImage)
 admin.site.register(News)
-admin.site.register(ContactMessage)
 admin.site.register(OTP)
 admin.site.register(ClassLevel)
 admin.site.register(Notice)
+admin.site.register(NotificationJob)
+
+
+class LargeTableMixin:
+    """
+    Change list settings for tables that keep growing: no second COUNT(*)
+    for the "N total" link, and the table's estimated size instead of a
+    COUNT(*) when the list is unfiltered (see EstimatedCountPaginator).
+
+    ``search_fields`` on these admins are prefix searches (``^``) on the
+    model's own columns, which migration 0014 indexes case-insensitively;
+    a search across a join can't use them.
+    """
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
+
+
+@admin.register(Announcement)
+class AnnouncementAdmin(LargeTableMixin, admin.ModelAdmin):
+    list_display = ['title', 'author', 'target_audience', 'important', 'date_posted']
+    list_select_related = ['author']
+    list_filter = ['important']
+    search_fields = ['^title']
+    ordering = ['-date_posted']
+    actions = ['email_parents']
+
+    @admin.action(description="Email selected announcements to parents")
+    def email_parents(self, request, queryset):
+        queued = sum(len(enqueue_announcement(announcement)) for announcement in queryset)
+        self.message_user(request, f"Queued {queued} emails for the notification worker.")
+
+
+class ExportActionsMixin:
+    """
+    Admin actions that download the selected rows with main.exports.
+    """
+    actions = ['export_csv', 'export_xlsx']
+
+    @admin.action(description="Export selected %(verbose_name_plural)s as CSV")
+    def export_csv(self, request, queryset):
+        return csv_response(export_for_model(self.model)[0], queryset)
+
+    @admin.action(description="Export selected %(verbose_name_plural)s as Excel")
+    def export_xlsx(self, request, queryset):
+        return xlsx_response(export_for_model(self.model)[0], queryset)
+
+
+@admin.register(Event)
+class EventAdmin(LargeTableMixin, admin.ModelAdmin):
+    list_display = ['title', 'event_type', 'start_date', 'end_date', 'location', 'organizer']
+    list_select_related = ['organizer']
+    list_filter = ['event_type']
+    search_fields = ['^title']
+    ordering = ['-start_date']
+
+
+@admin.register(GalleryImage)
+class GalleryImageAdmin(LargeTableMixin, admin.ModelAdmin):
+    list_display = ['image', 'caption', 'gallery', 'order', 'uploaded_at']
+    list_select_related = ['gallery']
+    list_filter = ['gallery']
+    search_fields = ['^caption']
+
+
+@admin.register(Admission)
+class AdmissionAdmin(LargeTableMixin, ExportActionsMixin, admin.ModelAdmin):
+    list_display = [
+        'applicant_name', 'applying_for_grade', 'parent_guardian_name', 'contact_email', 'status', 'date_submitted',
+        'user',
+    ]
+    list_select_related = ['user']
+    list_filter = ['status']
+    search_fields = ['^applicant_name', '^parent_guardian_name', '^contact_email']
+
+
+class ImportCSVMixin:
+    """
+    An "Import CSV" page on the change list, importing rows with
+    ``IMPORTERS[import_name]`` from main.imports.
+    """
+    import_name = None
+    change_list_template = 'admin/main/change_list_import.html'
+
+    def get_urls(self):
+        opts = self.model._meta
+        return [
+            path(
+                'import/', self.admin_site.admin_view(self.import_csv_view),
+                name=f'{opts.app_label}_{opts.model_name}_import',
+            ),
+        ] + super().get_urls()
+
+    def import_csv_view(self, request):
+        importer = IMPORTERS[self.import_name]
+        if not self.has_add_permission(request):
+            raise PermissionDenied
+        if importer.accounts and not request.user.has_perm('auth.add_user'):
+            # The import creates a login for every row
+            raise PermissionDenied
+        form = CSVImportForm(request.POST or None, request.FILES or None)
+        result = None
+        if form.is_valid():
+            file = io.TextIOWrapper(form.cleaned_data['file'].file, encoding='utf-8-sig', newline='')
+            dry_run = form.cleaned_data['dry_run']
+            try:
+                # The import has to finish within the request (and the
+                # server's worker timeout); bigger files go to import_data
+                rows, passwords = count_rows(file)
+                too_many_passwords = passwords > settings.IMPORT_ADMIN_MAX_PASSWORDS and not dry_run
+                if rows > settings.IMPORT_ADMIN_MAX_ROWS or too_many_passwords:
+                    raise ImportFileError(
+                        f"This file has {rows} rows, {passwords} of them with passwords. This page imports up to "
+                        f"{settings.IMPORT_ADMIN_MAX_ROWS} rows, {settings.IMPORT_ADMIN_MAX_PASSWORDS} with passwords; "
+                        f"import larger files with manage.py import_data {self.import_name}."
+                    )
+                # Hashed in this process: no process pool inside a web worker
+                result = import_csv(importer, file, dry_run=dry_run, hash_workers=0)
+            except (ImportFileError, UnicodeDecodeError) as e:
+                form.add_error('file', str(e))
+            else:
+                if result.created:
+                    messages.success(request, f"Imported {result.created} {self.model._meta.verbose_name_plural}.")
+        return TemplateResponse(request, 'admin/main/import_csv.html', {
+            **self.admin_site.each_context(request),
+            'title': f"Import {self.model._meta.verbose_name_plural}",
+            'opts': self.model._meta,
+            'form': form,
+            'result': result,
+            'columns': importer.columns,
+            'required_columns': importer.required_columns,
+            'import_name': self.import_name,
+            'max_rows': settings.IMPORT_ADMIN_MAX_ROWS,
+            'max_passwords': settings.IMPORT_ADMIN_MAX_PASSWORDS,
+        })
+
+
+@admin.register(Student)
+class StudentAdmin(LargeTableMixin, ImportCSVMixin, ExportActionsMixin, admin.ModelAdmin):
+    import_name = 'students'
+    list_display = ['student_id', 'first_name', 'last_name', 'faculty', 'department', 'enrollment_date', 'user']
+    list_select_related = ['user']
+    list_filter = ['faculty', 'department']
+    search_fields = ['^student_id', '^last_name', '^first_name']
+
+
+@admin.register(Parent)
+class ParentAdmin(LargeTableMixin, ImportCSVMixin, ExportActionsMixin, admin.ModelAdmin):
+    import_name = 'parents'
+    list_display = ['first_name', 'last_name', 'email', 'phone', 'user']
+    list_select_related = ['user']
+    search_fields = ['^last_name', '^first_name', '^email']
+
+
+@admin.register(Staff)
+class StaffAdmin(LargeTableMixin, ImportCSVMixin, admin.ModelAdmin):
+    import_name = 'staff'
+    list_display = ['full_name', 'position', 'department', 'is_teaching', 'join_date']
+    list_filter = ['department']
+    search_fields = ['^last_name', '^first_name']
+    ordering = ['-join_date']
+
+
+@admin.register(ContactMessage)
+class ContactMessageAdmin(LargeTableMixin, ExportActionsMixin, admin.ModelAdmin):
+    list_display = ['subject', 'name', 'email', 'date_sent', 'is_read']
+    list_filter = ['is_read']
+    search_fields = ['^email', '^name', '^subject']
@@ -0,0 +1,154 @@
+"""
+Async versions of the public read views, served instead of the sync ones
+in main/views.py when ASYNC_VIEWS is on (an ASGI deployment; see
+school_website/asgi.py). They take their configuration and templates from
+the sync views and fetch with Django's async ORM, gathering independent
+queries. Templates are rendered by TemplateResponse in Django's sync
+thread, as usual.
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.http import Http404
+from django.template.response import TemplateResponse
+from django.utils import timezone
+from django.utils.decorators import method_decorator
+from django.views import View
+
+from . import views
+from .cache import get_school_info
+from .conditional import conditional_page
+from .models import Announcement, AnnouncementAttachment, Event, Gallery, GalleryImage, News, SchoolInfo, Staff
+from .pagecache import anonymous_page_cache
+
+
+async def _list(queryset):
+    return [obj async for obj in queryset]
+
+
+class AsyncViewMixin:
+    async def dispatch(self, request, *args, **kwargs):
+        # Bypass the decorators on the sync view's dispatch; the async
+        # classes below carry their own.
+        return await View.dispatch(self, request, *args, **kwargs)
+
+
+class AsyncListMixin(AsyncViewMixin):
+    """
+    ``get`` for the ListViews: the page comes from ``apaginate_queryset``
+    and runs alongside ``aget_extra_context``.
+    """
+
+    async def aget_extra_context(self):
+        return {}
+
+    async def get(self, request, *args, **kwargs):
+        self.object_list = self.get_queryset()
+        page_size = self.get_paginate_by(self.object_list)
+        if page_size:
+            self._page, extra = await asyncio.gather(
+                self.apaginate_queryset(self.object_list, page_size),
+                self.aget_extra_context(),
+            )
+        else:
+            extra = await self.aget_extra_context()
+        return self.render_to_response(self.get_context_data(**extra))
+
+    def paginate_queryset(self, queryset, page_size):
+        # Already fetched in get()
+        return self._page
+
+
+class AsyncDetailMixin(AsyncViewMixin):
+    async def get(self, request, *args, **kwargs):
+        self.object = await self.aget_object()
+        return self.render_to_response(self.get_context_data(object=self.object))
+
+    async def aget_object(self):
+        queryset = self.get_queryset()
+        try:
+            return await queryset.aget(pk=self.kwargs[self.pk_url_kwarg])
+        except queryset.model.DoesNotExist:
+            raise Http404(f'No {queryset.model._meta.verbose_name} found matching the query')
+
+
+# ---------------------------
+# Home Page
+# ---------------------------
+@anonymous_page_cache(Announcement, Event, News, SchoolInfo)
+async def home(request):
+    announcements, upcoming_events, latest_news, school_info = await asyncio.gather(
+        _list(Announcement.objects.filter(important=True).order_by('-date_posted')[:3]),
+        _list(Event.objects.filter(start_date__gte=timezone.now()).order_by('start_date')[:3]),
+        _list(News.objects.filter(is_published=True).order_by('-date_posted')[:3]),
+        sync_to_async(get_school_info)(),
+    )
+    return TemplateResponse(request, 'main/home.html', {
+        'school_info': school_info,
+        'announcements': announcements,
+        'upcoming_events': upcoming_events,
+        'latest_news': latest_news,
+    })
+
+
+# ---------------------------
+# Announcements
+# ---------------------------
+@method_decorator(conditional_page(Announcement), name='dispatch')
+class AnnouncementListView(AsyncListMixin, views.AnnouncementListView):
+    pass
+
+@method_decorator(conditional_page(Announcement, AnnouncementAttachment, related=(User, Staff)), name='dispatch')
+class AnnouncementDetailView(AsyncDetailMixin, views.AnnouncementDetailView):
+    pass
+
+
+# ---------------------------
+# Events
+# ---------------------------
+@method_decorator(conditional_page(Event, upcoming_events=True), name='dispatch')
+@method_decorator(anonymous_page_cache(Event, SchoolInfo, query=views.EVENT_LIST_QUERY), name='dispatch')
+class EventListView(AsyncListMixin, views.EventListView):
+    async def aget_extra_context(self):
+        self.months = self.month_choices(await _list(Event.objects.dates('start_date', 'month')))
+        return {}
+
+    def get_months(self):
+        return self.months
+
+@method_decorator(conditional_page(Event, related=(Staff,)), name='dispatch')
+class EventDetailView(AsyncDetailMixin, views.EventDetailView):
+    pass
+
+
+async def calendar(request):
+    return TemplateResponse(request, 'utilities/calendar.html', views.calendar_context())
+
+
+# ---------------------------
+# News
+# ---------------------------
+@method_decorator(conditional_page(News, related=(Staff,)), name='dispatch')
+@method_decorator(anonymous_page_cache(News, SchoolInfo, query=views.PAGINATION_QUERY), name='dispatch')
+class NewsListView(AsyncListMixin, views.NewsListView):
+    pass
+
+@method_decorator(conditional_page(News, related=(Staff,)), name='dispatch')
+class NewsDetailView(AsyncDetailMixin, views.NewsDetailView):
+    pass
+
+
+# ---------------------------
+# Gallery
+# ---------------------------
+@method_decorator(conditional_page(Gallery, GalleryImage, Event), name='dispatch')
+@method_decorator(
+    anonymous_page_cache(Event, Gallery, GalleryImage, SchoolInfo, query=views.PAGINATION_QUERY), name='dispatch',
+)
+class GalleryListView(AsyncListMixin, views.GalleryListView):
+    pass
+
+@method_decorator(conditional_page(Gallery, GalleryImage, Event), name='dispatch')
+class GalleryDetailView(AsyncDetailMixin, views.GalleryDetailView):
+    pass
@@ -0,0 +1,54 @@
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .models import SchoolInfo
+
+
+SCHOOL_INFO_CACHE_KEY = "main:school_info"
+
+# Cached in place of ``None`` so a site without a SchoolInfo row
+# doesn't query the database on every render either.
+_MISSING = "__missing__"
+
+
+def _school_info_cache():
+    return caches[settings.SCHOOL_INFO_CACHE_ALIAS]
+
+
+def get_school_info_with_version():
+    """
+    ``(school_info, version)``. The version changes every time the entry is
+    refilled, i.e. after each save/delete, so it can key derived caches.
+    """
+    cache = _school_info_cache()
+    entry = cache.get(SCHOOL_INFO_CACHE_KEY)
+    if entry is None:
+        entry = (SchoolInfo.objects.first() or _MISSING, time.time_ns())
+        cache.set(SCHOOL_INFO_CACHE_KEY, entry, settings.SCHOOL_INFO_CACHE_TIMEOUT)
+    school_info, version = entry
+    return (None if school_info == _MISSING else school_info), version
+
+
+def get_school_info():
+    """
+    Return the site's SchoolInfo row, served from the cache once warm.
+    """
+    return get_school_info_with_version()[0]
+
+
+def invalidate_school_info():
+    _school_info_cache().delete(SCHOOL_INFO_CACHE_KEY)
+
+
+def increment(cache, key):
+    """
+    Bump a never-expiring counter in ``cache``, creating it if needed.
+    """
+    cache.add(key, 0, None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Evicted between add() and incr(); start counting again
+        cache.set(key, 1, None)
@@ -0,0 +1,207 @@
+import hashlib
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import F, Max
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import Event, SchoolInfo
+from .pagecache import model_generations
+
+EVENT_TYPES = dict(Event._meta.get_field('event_type').choices)
+
+
+class WindowError(ValueError):
+    pass
+
+
+# ---------------------------
+# Windowed queries
+# ---------------------------
+def _parse_bound(value, name):
+    if not value:
+        raise WindowError(f"{name} is required")
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is None:
+            raise WindowError(f"{name} must be an ISO 8601 date or date-time")
+        parsed = datetime.combine(day, time.min)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def parse_window(start, end):
+    """
+    ``(start, end)`` datetimes from the ``start``/``end`` query parameters,
+    at most CALENDAR_MAX_WINDOW_DAYS apart.
+    """
+    start = _parse_bound(start, 'start')
+    end = _parse_bound(end, 'end')
+    if end <= start:
+        raise WindowError("end must be after start")
+    if end - start > timedelta(days=settings.CALENDAR_MAX_WINDOW_DAYS):
+        raise WindowError(f"The window may be at most {settings.CALENDAR_MAX_WINDOW_DAYS} days")
+    return start, end
+
+
+def _longest_event():
+    """
+    Duration of the longest event, cached until an Event changes. It turns
+    "ends after the window starts" into a bounded range on start_date.
+    """
+    cache = caches[settings.PAGE_CACHE_ALIAS]
+    key = f'calendar:longest:{model_generations([Event._meta.label_lower])[0]}'
+    longest = cache.get(key)
+    if longest is None:
+        longest = Event.objects.aggregate(longest=Max(F('end_date') - F('start_date')))['longest'] or timedelta(0)
+        cache.set(key, longest, settings.CALENDAR_FEED_TIMEOUT)
+    return longest
+
+
+def events_in_window(start, end, event_type=None):
+    """
+    Events overlapping ``[start, end)``, earliest first.
+
+    No event starts more than the longest event's duration before it ends,
+    so bounding start_date from below too lets the query seek a short range
+    of event_window_idx instead of reading every earlier event.
+    """
+    queryset = Event.objects.filter(
+        start_date__gte=start - _longest_event(), start_date__lt=end, end_date__gt=start,
+    )
+    if event_type:
+        queryset = queryset.filter(event_type=event_type)
+    return queryset.order_by('start_date', 'pk')
+
+
+def event_json(event):
+    return {
+        'id': event.pk,
+        'title': event.title,
+        'start': event.start_date.isoformat(),
+        'end': event.end_date.isoformat(),
+        'type': event.event_type,
+        'location': event.location,
+        'url': reverse('event-detail', kwargs={'pk': event.pk}),
+    }
+
+
+# ---------------------------
+# iCalendar feeds
+# ---------------------------
+def _escape(text):
+    return (
+        str(text).replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+        .replace('\r\n', '\\n').replace('\n', '\\n').replace('\r', '\\n')
+    )
+
+
+def _fold(line):
+    # RFC 5545 3.1: lines are at most 75 octets; continuations start with a space
+    encoded = line.encode()
+    if len(encoded) <= 75:
+        return line
+    parts = []
+    limit = 75
+    while encoded:
+        cut = min(limit, len(encoded))
+        # Don't split a UTF-8 sequence
+        while cut < len(encoded) and (encoded[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(encoded[:cut].decode())
+        encoded = encoded[cut:]
+        limit = 74
+    return '\r\n '.join(parts)
+
+
+def _stamp(value):
+    return value.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def _vevent(event):
+    lines = [
+        'BEGIN:VEVENT',
+        f'UID:event-{event.pk}@{urlsplit(settings.SITE_URL).hostname}',
+        f'DTSTAMP:{_stamp(event.updated_at)}',
+        f'LAST-MODIFIED:{_stamp(event.updated_at)}',
+        f'DTSTART:{_stamp(event.start_date)}',
+        f'DTEND:{_stamp(event.end_date)}',
+        f'SUMMARY:{_escape(event.title)}',
+        f'DESCRIPTION:{_escape(event.description)}',
+        f'LOCATION:{_escape(event.location)}',
+        f'CATEGORIES:{_escape(EVENT_TYPES.get(event.event_type, event.event_type))}',
+        f"URL:{settings.SITE_URL}{reverse('event-detail', kwargs={'pk': event.pk})}",
+        'END:VEVENT',
+    ]
+    return ''.join(_fold(line) + '\r\n' for line in lines)
+
+
+def _feed_events(event_type):
+    since = timezone.now() - timedelta(days=settings.CALENDAR_FEED_PAST_DAYS)
+    queryset = Event.objects.filter(end_date__gte=since)
+    if event_type:
+        queryset = queryset.filter(event_type=event_type)
+    return queryset.order_by('start_date', 'pk')
+
+
+def _build_feed(event_type, calendar_name):
+    """
+    Assemble the feed from the VEVENT blocks of its previous build, kept as
+    ``{pk: (updated_at, block)}`` in one cache entry, so only events added
+    or edited since then are loaded and rendered.
+    """
+    cache = caches[settings.PAGE_CACHE_ALIAS]
+    blocks_key = f'calendar:vevents:{event_type or "all"}'
+    previous = cache.get(blocks_key, {})
+    rows = list(_feed_events(event_type).values_list('pk', 'updated_at'))
+
+    blocks = {}
+    stale = []
+    for pk, updated_at in rows:
+        if pk in previous and previous[pk][0] == updated_at:
+            blocks[pk] = previous[pk]
+        else:
+            stale.append(pk)
+    for i in range(0, len(stale), 500):
+        for event in Event.objects.filter(pk__in=stale[i:i + 500]):
+            blocks[event.pk] = (event.updated_at, _vevent(event))
+    cache.set(blocks_key, blocks, settings.CALENDAR_FEED_TIMEOUT)
+
+    header = [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        f'PRODID:-//{_escape(calendar_name)}//Events//EN',
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+        f'X-WR-CALNAME:{_escape(calendar_name)}',
+    ]
+    # An event deleted between the two queries is missing from ``blocks``
+    body = ''.join(blocks[pk][1] for pk, _ in rows if pk in blocks)
+    return ''.join(_fold(line) + '\r\n' for line in header) + body + 'END:VCALENDAR\r\n'
+
+
+def ics_feed(event_type, calendar_name):
+    """
+    ``(content, etag)`` of the iCalendar feed of ``event_type`` (or every
+    type when it is None).
+
+    The assembled feed is cached until an Event or SchoolInfo is saved or
+    deleted (their page cache generations change) or the day changes, since
+    the feed only reaches back CALENDAR_FEED_PAST_DAYS.
+    """
+    cache = caches[settings.PAGE_CACHE_ALIAS]
+    generations = '.'.join(str(g) for g in model_generations([Event._meta.label_lower, SchoolInfo._meta.label_lower]))
+    key = f'calendar:ics:{event_type or "all"}:{timezone.localdate()}:{generations}'
+    feed = cache.get(key)
+    if feed is None:
+        content = _build_feed(event_type, calendar_name)
+        etag = hashlib.md5(content.encode(), usedforsecurity=False).hexdigest()
+        feed = (content, etag)
+        cache.set(key, feed, settings.CALENDAR_FEED_TIMEOUT)
+    return feed
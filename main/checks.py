@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+LOCMEM_BACKEND = 'django.core.cache.backends.locmem.LocMemCache'
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    """
+    With DEBUG off the site runs as several processes, and each would have
+    its own LocMemCache: invalidations and rate limits would only reach
+    the worker that made them.
+    """
+    if settings.DEBUG:
+        return []
+    aliases = {
+        settings.SCHOOL_INFO_CACHE_ALIAS, settings.PAGE_CACHE_ALIAS, settings.RATELIMIT_CACHE_ALIAS,
+        settings.IMAGE_DERIVATIVE_CACHE_ALIAS,
+    }
+    return [
+        Error(
+            f"The {alias!r} cache is a per-process LocMemCache.",
+            hint="Use Redis, Memcached, the database or the file cache (CACHE_BACKEND) when DEBUG is off.",
+            id='main.E001',
+        )
+        for alias in sorted(aliases)
+        if settings.CACHES.get(alias, {}).get('BACKEND') == LOCMEM_BACKEND
+    ]
@@ -0,0 +1,86 @@
+import hashlib
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Count, Max
+from django.utils import timezone
+from django.views.decorators.http import condition
+
+from .cache import get_school_info_with_version
+from .models import Event
+from .pagecache import model_generations
+
+
+def _model_fingerprints(models):
+    """
+    Latest ``updated_at`` and row count (so deletions count as changes) per
+    model. Cached against the page-cache generations, which every save and
+    delete bumps, so repeat requests don't touch the database.
+    """
+    labels = [model._meta.label_lower for model in models]
+    generations = '.'.join(str(g) for g in model_generations(labels))
+    key = f"conditional:{','.join(labels)}:{generations}"
+    cache = caches[settings.PAGE_CACHE_ALIAS]
+    rows = cache.get(key)
+    if rows is None:
+        rows = [
+            model.objects.order_by().aggregate(latest=Max('updated_at'), count=Count('pk'))
+            for model in models
+        ]
+        cache.set(key, rows, settings.PAGE_CACHE_TIMEOUT)
+    return labels, rows
+
+
+def _etag(request, models, related, upcoming_events):
+    """
+    The page's ETag, memoised on the request.
+
+    There is deliberately no Last-Modified: the ETag also covers deletions,
+    related rows, SchoolInfo and who is signed in, none of which a date
+    could express, so a client revalidating by date alone would be told
+    a stale page is current.
+    """
+    cached = getattr(request, '_etag', None)
+    if cached is not None:
+        return cached
+
+    labels, rows = _model_fingerprints(models)
+    parts = [f"{label}:{row['latest']}:{row['count']}" for label, row in zip(labels, rows)]
+    # Models without updated_at: their page cache generations change on every save and delete
+    parts.extend(str(g) for g in model_generations([model._meta.label_lower for model in related]))
+    if upcoming_events:
+        # "Upcoming" lists change when an event starts, without any write
+        parts.append(str(Event.objects.filter(start_date__gte=timezone.now()).count()))
+    # The layout shows SchoolInfo and the signed-in user's links
+    parts.append(str(get_school_info_with_version()[1]))
+    parts.append(str(request.user.pk if request.user.is_authenticated else ''))
+    request._etag = hashlib.md5('|'.join(parts).encode(), usedforsecurity=False).hexdigest()
+    return request._etag
+
+
+def conditional_page(*models, related=(), upcoming_events=False):
+    """
+    Answer GET/HEAD with 304 Not Modified, before any template rendering,
+    when nothing in ``models`` changed since the client's cached copy.
+    Every model must have an ``updated_at`` column; ``related`` lists
+    models without one whose rows the page also shows (authors,
+    organisers). Works on sync and async views.
+    """
+    def etag_func(request, *args, **kwargs):
+        return _etag(request, models, related, upcoming_events)
+
+    def decorator(view_func):
+        conditional_view = condition(etag_func=etag_func)(view_func)
+        if not iscoroutinefunction(view_func):
+            return conditional_view
+
+        @wraps(view_func)
+        async def wrapped(request, *args, **kwargs):
+            # condition() calls etag_func synchronously even for async
+            # views; work it out (and memoise it) off the loop first
+            await sync_to_async(_etag)(request, models, related, upcoming_events)
+            return await conditional_view(request, *args, **kwargs)
+        return wrapped
+    return decorator
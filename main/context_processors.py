@@ -1,6 +1,9 @@
-from .models import SchoolInfo
+from .cache import get_school_info_with_version
 
 def school_info(request):
+    school_info, version = get_school_info_with_version()
     return {
-        "school_info": SchoolInfo.objects.first()
+        "school_info": school_info,
+        # Keys the cached header/nav/footer fragments in main/base.html
+        "school_info_version": version,
     }
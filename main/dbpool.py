@@ -0,0 +1,31 @@
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+def pool_stats(alias=DEFAULT_DB_ALIAS):
+    """
+    Counters for this process's connection pool (see DB_POOL), or None when
+    ``alias`` isn't pooled. ``wait_ms`` is the total time requests spent
+    waiting for a connection since the pool opened.
+    """
+    pool = getattr(connections[alias], 'pool', None)
+    if pool is None:
+        return None
+    stats = pool.get_stats()
+    size = stats.get('pool_size', 0)
+    available = stats.get('pool_available', 0)
+    requests = stats.get('requests_num', 0)
+    wait_ms = stats.get('requests_wait_ms', 0)
+    return {
+        'min_size': stats.get('pool_min', 0),
+        'max_size': stats.get('pool_max', 0),
+        'size': size,
+        'checked_out': size - available,
+        'available': available,
+        'waiting': stats.get('requests_waiting', 0),
+        'requests': requests,
+        'queued': stats.get('requests_queued', 0),
+        'wait_ms': wait_ms,
+        'average_wait_ms': wait_ms / requests if requests else 0,
+        # Timeouts and other failures to get a connection
+        'errors': stats.get('requests_errors', 0),
+    }
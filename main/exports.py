@@ -0,0 +1,203 @@
+"""
+CSV and XLSX exports of admissions, students, parents and contact messages,
+for the admin actions and ``manage.py export_data``.
+
+Rows come from ``values_list(...).iterator(chunk_size=...)``: tuples, never
+model instances, fetched a chunk at a time, so memory stays flat however
+many rows there are. CSV is written as it is read, a chunk per write or
+per streamed response chunk. XLSX can only be sent once the workbook is
+complete, so it is written with openpyxl's write-only mode (which keeps
+rows on disk, not in memory) to a temporary file that is then streamed.
+"""
+import csv
+import io
+import re
+import tempfile
+from datetime import datetime
+
+from django.conf import settings
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.http import content_disposition_header
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+
+from .models import Admission, ContactMessage, Parent, Student
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# A signed number or phone number: digits, spaces, dots, dashes and brackets
+_NUMBER_RE = re.compile(r'[+-][\d\s().-]*\d[\d\s().-]*$')
+
+
+class Export:
+    """
+    The columns of one export: ``(lookup, header)`` pairs, where lookups may
+    follow foreign keys (``user__username``).
+    """
+
+    def __init__(self, model, columns):
+        self.model = model
+        self.columns = columns
+
+    @property
+    def headers(self):
+        return [header for _, header in self.columns]
+
+    def rows(self, queryset=None, chunk_size=None):
+        """
+        The rows of ``queryset`` (default: every row), oldest first, as tuples.
+        """
+        if queryset is None:
+            queryset = self.model._default_manager.all()
+        lookups = [lookup for lookup, _ in self.columns]
+        return queryset.order_by('pk').values_list(*lookups).iterator(
+            chunk_size=chunk_size or settings.EXPORT_CHUNK_SIZE,
+        )
+
+
+EXPORTS = {
+    'admissions': Export(Admission, [
+        ('pk', 'ID'),
+        ('date_submitted', 'Submitted'),
+        ('status', 'Status'),
+        ('applicant_name', 'Applicant'),
+        ('date_of_birth', 'Date of birth'),
+        ('applying_for_grade', 'Grade'),
+        ('parent_guardian_name', 'Parent/guardian'),
+        ('contact_email', 'Email'),
+        ('contact_phone', 'Phone'),
+        ('previous_school', 'Previous school'),
+        ('previous_report_card', 'Report card'),
+        ('application_essay', 'Essay'),
+    ]),
+    'students': Export(Student, [
+        ('pk', 'ID'),
+        ('student_id', 'Student ID'),
+        ('first_name', 'First name'),
+        ('last_name', 'Last name'),
+        ('date_of_birth', 'Date of birth'),
+        ('phone_number', 'Phone'),
+        ('address', 'Address'),
+        ('city', 'City'),
+        ('zip_code', 'ZIP code'),
+        ('faculty', 'Faculty'),
+        ('department', 'Department'),
+        ('enrollment_date', 'Enrolled'),
+        ('user__username', 'Username'),
+    ]),
+    'parents': Export(Parent, [
+        ('pk', 'ID'),
+        ('first_name', 'First name'),
+        ('last_name', 'Last name'),
+        ('email', 'Email'),
+        ('phone', 'Phone'),
+        ('address', 'Address'),
+        ('user__username', 'Username'),
+    ]),
+    'contact-messages': Export(ContactMessage, [
+        ('pk', 'ID'),
+        ('date_sent', 'Sent'),
+        ('is_read', 'Read'),
+        ('name', 'Name'),
+        ('email', 'Email'),
+        ('subject', 'Subject'),
+        ('message', 'Message'),
+    ]),
+}
+
+
+def export_for_model(model):
+    for name, export in EXPORTS.items():
+        if export.model is model:
+            return name, export
+    raise LookupError(f"No export for {model._meta.label}")
+
+
+# ---------------------------
+# CSV
+# ---------------------------
+def _csv_value(value):
+    if isinstance(value, datetime):
+        return timezone.localtime(value).isoformat(sep=' ', timespec='seconds')
+    # Most of these fields come from public forms; a leading =, +, - or @
+    # would make a spreadsheet run the cell as a formula. Numbers and phone
+    # numbers (+977 1-4123456) call no functions and are left as they are.
+    if isinstance(value, str) and value[:1] in ('=', '+', '-', '@', '\t', '\r') and not _NUMBER_RE.match(value):
+        return "'" + value
+    return value
+
+
+def iter_csv(export, queryset=None, chunk_size=None):
+    """
+    The CSV of ``export`` as strings of up to ``chunk_size`` rows each.
+    """
+    chunk_size = chunk_size or settings.EXPORT_CHUNK_SIZE
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(export.headers)
+    for i, row in enumerate(export.rows(queryset, chunk_size), 1):
+        writer.writerow([_csv_value(value) for value in row])
+        if i % chunk_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def write_csv(export, file, queryset=None, chunk_size=None):
+    for chunk in iter_csv(export, queryset, chunk_size):
+        file.write(chunk)
+
+
+# ---------------------------
+# XLSX
+# ---------------------------
+def _xlsx_value(value, sheet):
+    if isinstance(value, datetime):
+        # Excel has no time zones
+        return timezone.localtime(value).replace(tzinfo=None)
+    if isinstance(value, str):
+        value = ILLEGAL_CHARACTERS_RE.sub('', value)
+        if value.startswith('='):
+            # Text, not a formula
+            cell = WriteOnlyCell(sheet, value)
+            cell.data_type = 's'
+            return cell
+    return value
+
+
+def write_xlsx(export, file, queryset=None, chunk_size=None):
+    """
+    Write the XLSX workbook of ``export`` to ``file`` (a path or a binary
+    file object).
+    """
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(str(export.model._meta.verbose_name_plural).title()[:31])
+    sheet.append(export.headers)
+    for row in export.rows(queryset, chunk_size):
+        sheet.append([_xlsx_value(value, sheet) for value in row])
+    workbook.save(file)
+
+
+# ---------------------------
+# Responses
+# ---------------------------
+def _filename(name, extension):
+    return f'{name}-{timezone.localdate():%Y-%m-%d}.{extension}'
+
+
+def csv_response(name, queryset=None):
+    response = StreamingHttpResponse(iter_csv(EXPORTS[name], queryset), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = content_disposition_header(True, _filename(name, 'csv'))
+    return response
+
+
+def xlsx_response(name, queryset=None):
+    # Unnamed, so the file disappears once the response has been sent
+    file = tempfile.TemporaryFile()
+    write_xlsx(EXPORTS[name], file, queryset)
+    file.seek(0)
+    return FileResponse(file, as_attachment=True, filename=_filename(name, 'xlsx'), content_type=XLSX_CONTENT_TYPE)
@@ -6,7 +6,8 @@ from .models import (
     Staff, Announcement, Event,
     News, Gallery, GalleryImage
 )
-from django.core.exceptions import ValidationError
+from django.core.exceptions import SuspiciousFileOperation, ValidationError
+from django.core.files.storage import default_storage
 from django.utils import timezone
 import re
 from phonenumber_field.formfields import PhoneNumberField
@@ -289,12 +290,16 @@ class LoginForm(AuthenticationForm):
     )
 
     from django import forms
-from .models import Admission
+from .models import Admission, ChunkedUpload
 
 class AdmissionForm(forms.ModelForm):
     """
     A form for students to apply for school admission.
     """
+    # Filled in by the page's script when the report card was sent through
+    # the chunked upload endpoints instead of with this form
+    report_card_upload = forms.UUIDField(required=False, widget=forms.HiddenInput)
+
     class Meta:
         model = Admission
         fields = [
@@ -304,4 +309,74 @@ class AdmissionForm(forms.ModelForm):
         ]
         widgets = {
             'date_of_birth': forms.DateInput(attrs={'type': 'date'}),
-        }
\ No newline at end of file
+            'previous_report_card': forms.ClearableFileInput(attrs={
+                'data-chunked-upload': 'admission_document',
+                'data-upload-field': 'report_card_upload',
+            }),
+        }
+
+    def __init__(self, *args, uploads=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Required unless it arrived as a chunked upload; checked in clean()
+        self.fields['previous_report_card'].required = False
+        # The chunked uploads the applicant may attach: their own
+        self.uploads = uploads if uploads is not None else ChunkedUpload.objects.none()
+
+    def clean(self):
+        cleaned_data = super().clean()
+        upload_id = cleaned_data.get('report_card_upload')
+        if upload_id:
+            upload = self.uploads.filter(
+                pk=upload_id, purpose='admission_document', status='complete'
+            ).first()
+            if upload is None:
+                self.add_error('previous_report_card', 'The uploaded report card could not be found. Please upload it again.')
+            else:
+                self.instance.previous_report_card = upload.stored_name
+        elif not cleaned_data.get('previous_report_card'):
+            self.add_error('previous_report_card', 'This field is required.')
+        return cleaned_data
+
+# -----------------------------
+# Bulk import (see main/imports.py)
+# -----------------------------
+class ImportUserForm(UserRegistrationForm):
+    """
+    The account of an imported row. The password may be left blank, and the
+    account then gets an unusable one until it is reset.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['password1'].required = False
+        self.fields['password2'].required = False
+
+    def clean_password1(self):
+        if not self.cleaned_data.get('password1'):
+            return ''
+        return super().clean_password1()
+
+
+class StaffImportForm(StaffForm):
+    """
+    StaffForm for an imported row, with the photo given as the name of a
+    file already in MEDIA_ROOT (e.g. "staff/photos/ram.jpg").
+    """
+    photo = forms.CharField(max_length=100)
+
+    def clean_photo(self):
+        name = self.cleaned_data['photo'].replace('\\', '/')
+        try:
+            if name.startswith('/') or '..' in name.split('/'):
+                raise SuspiciousFileOperation(name)
+            exists = default_storage.exists(name)
+        except SuspiciousFileOperation:
+            raise forms.ValidationError("Give the photo's path inside the media folder, without '..'.")
+        if not exists:
+            raise forms.ValidationError(f"There is no file {name} in the media folder.")
+        return name
+
+
+class CSVImportForm(forms.Form):
+    file = forms.FileField()
+    dry_run = forms.BooleanField(required=False, help_text="Only check the rows; save nothing.")
@@ -0,0 +1,176 @@
+import hashlib
+import io
+import os
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import caches
+from django.core.files.base import ContentFile
+from PIL import ExifTags, Image, ImageOps
+
+
+# (model label, field name) of every upload that gets resized derivatives
+DERIVATIVE_FIELDS = [
+    ('main.Gallery', 'cover_image'),
+    ('main.GalleryImage', 'image'),
+    ('main.Staff', 'photo'),
+    ('main.Student', 'photo'),
+]
+
+_FORMATS = {
+    '.jpg': 'JPEG',
+    '.jpeg': 'JPEG',
+    '.jfif': 'JPEG',
+    '.png': 'PNG',
+    '.gif': 'GIF',
+    '.webp': 'WEBP',
+}
+
+
+def derivative_widths():
+    return sorted(settings.IMAGE_DERIVATIVE_WIDTHS)
+
+
+def derivative_name(name, width, webp=False):
+    """
+    ``gallery/images/a.jpg`` -> ``gallery/images/a.640w.jpg`` (or ``.640w.webp``).
+    """
+    root, ext = os.path.splitext(name)
+    return f"{root}.{width}w{'.webp' if webp else ext.lower()}"
+
+
+def derivative_names(name):
+    for width in derivative_widths():
+        yield derivative_name(name, width)
+        yield derivative_name(name, width, webp=True)
+
+
+def is_derivative(name):
+    root = os.path.splitext(name)[0]
+    return any(root.endswith(f'.{width}w') for width in derivative_widths())
+
+
+def _cache_key(name):
+    # The widths are part of the key: changing them leaves every image short
+    key = f'{name}:{derivative_widths()}'
+    return 'main:derivatives:' + hashlib.md5(key.encode()).hexdigest()
+
+
+def _remember_derivatives(name, names, complete=False):
+    caches[settings.IMAGE_DERIVATIVE_CACHE_ALIAS].set(
+        _cache_key(name), (set(names), complete), settings.IMAGE_DERIVATIVE_CACHE_TIMEOUT,
+    )
+
+
+def existing_derivatives(fieldfile):
+    """
+    The names of the derivatives of ``fieldfile`` in its storage, as recorded
+    when they were generated; looked up in the storage on a cache miss.
+    """
+    recorded = caches[settings.IMAGE_DERIVATIVE_CACHE_ALIAS].get(_cache_key(fieldfile.name))
+    if recorded is None:
+        names = {name for name in derivative_names(fieldfile.name) if fieldfile.storage.exists(name)}
+        _remember_derivatives(fieldfile.name, names)
+        return names
+    return recorded[0]
+
+
+def has_all_derivatives(fieldfile):
+    """
+    Whether generate_derivatives last left ``fieldfile`` with every
+    derivative it should have.
+    """
+    recorded = caches[settings.IMAGE_DERIVATIVE_CACHE_ALIAS].get(_cache_key(fieldfile.name))
+    return recorded is not None and recorded[1]
+
+
+def _encode(image, image_format):
+    buffer = io.BytesIO()
+    if image_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    options = {'quality': settings.IMAGE_DERIVATIVE_QUALITY} if image_format in ('JPEG', 'WEBP') else {}
+    image.save(buffer, image_format, **options)
+    return ContentFile(buffer.getvalue())
+
+
+def generate_derivatives(fieldfile, force=False):
+    """
+    Write a resized copy of ``fieldfile`` for every configured width narrower
+    than the original, in the original format and as WebP, next to the
+    original in the same storage. Returns the names written.
+
+    Only the image's header is read unless a copy is missing (or ``force``):
+    decoding the whole original is the expensive part.
+    """
+    if not fieldfile or is_derivative(fieldfile.name):
+        return []
+    image_format = _FORMATS.get(os.path.splitext(fieldfile.name)[1].lower())
+    if image_format is None:
+        return []
+
+    storage = fieldfile.storage
+    if not storage.exists(fieldfile.name):
+        return []
+    written = []
+    with storage.open(fieldfile.name, 'rb') as original:
+        with Image.open(original) as image:
+            width, height = image.size
+            if image.getexif().get(ExifTags.Base.Orientation) in (5, 6, 7, 8):
+                # Rotated a quarter turn by exif_transpose
+                width, height = height, width
+            sizes = [(w, round(height * w / width)) for w in derivative_widths() if w < width]
+            present = [derivative_name(fieldfile.name, w, webp=webp) for w, _ in sizes for webp in (False, True)]
+            missing = set(present) if force else {name for name in present if not storage.exists(name)}
+            if missing:
+                image = ImageOps.exif_transpose(image)
+            for size in sizes:
+                resized = None
+                for webp in (False, True):
+                    name = derivative_name(fieldfile.name, size[0], webp=webp)
+                    if name not in missing:
+                        continue
+                    if resized is None:
+                        resized = image.resize(size, Image.LANCZOS)
+                    if storage.exists(name):
+                        storage.delete(name)
+                    storage.save(name, _encode(resized, 'WEBP' if webp else image_format))
+                    written.append(name)
+    _remember_derivatives(fieldfile.name, present, complete=True)
+    return written
+
+
+def generate_missing_derivatives(fieldfile):
+    """
+    generate_derivatives, skipped without opening the file when the cache
+    says nothing is missing: what a save that didn't touch the image needs.
+    """
+    if fieldfile and has_all_derivatives(fieldfile):
+        return []
+    return generate_derivatives(fieldfile)
+
+
+def delete_derivatives(name, storage):
+    for derivative in derivative_names(name):
+        if storage.exists(derivative):
+            storage.delete(derivative)
+    caches[settings.IMAGE_DERIVATIVE_CACHE_ALIAS].delete(_cache_key(name))
+
+
+def srcset_candidates(fieldfile, webp=False):
+    """
+    ``[(url, width), ...]`` for the derivatives of ``fieldfile`` that exist.
+    """
+    if not fieldfile:
+        return []
+    existing = existing_derivatives(fieldfile)
+    candidates = []
+    for width in derivative_widths():
+        name = derivative_name(fieldfile.name, width, webp=webp)
+        if name in existing:
+            candidates.append((fieldfile.storage.url(name), width))
+    return candidates
+
+
+def derivative_models():
+    for label, field_name in DERIVATIVE_FIELDS:
+        yield apps.get_model(label), field_name
@@ -0,0 +1,260 @@
+"""
+Bulk CSV import of students, parents and staff, for ``manage.py import_data``
+and the admin's "Import CSV" pages.
+
+The file is read one row at a time and each row is validated with the forms
+the site's own registration uses. Valid rows are written IMPORT_BATCH_SIZE
+at a time, each batch with bulk_create in one transaction (accounts first,
+then the rows that point at them). Password hashing is deliberately slow, so
+the batch's passwords are hashed in a process pool while the next batch is
+being validated. Rows without a password get an unusable one.
+
+Invalid rows are skipped and reported with their line number; the rest are
+imported. bulk_create sends no post_save, so the resized copies of imported
+photos (see main/images.py) are made after each batch.
+"""
+import csv
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import django
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import DatabaseError, transaction
+
+from .forms import ImportUserForm, ParentRegistrationForm, StaffImportForm, StudentRegistrationForm
+from .images import derivative_models, generate_missing_derivatives
+from .models import Parent, Staff, Student
+from .pagecache import purge
+
+logger = logging.getLogger(__name__)
+
+
+class ImportFileError(ValueError):
+    pass
+
+
+class ImportResult:
+    def __init__(self, dry_run=False):
+        self.dry_run = dry_run
+        self.valid = 0
+        self.created = 0
+        self.errors = []  # (line, [message, ...])
+
+    def add_error(self, line, errors):
+        messages = []
+        for field, field_errors in errors.items():
+            prefix = '' if field == '__all__' else f'{field}: '
+            messages.extend(prefix + str(error) for error in field_errors)
+        self.errors.append((line, messages))
+
+
+class Importer:
+    """
+    How rows of one model are validated: ``form_class`` for the model's own
+    columns and, if ``accounts`` is set, ImportUserForm for the ``username``,
+    ``email`` and ``password`` columns of the User it belongs to.
+    ``unique`` lists columns that must not repeat within the file, which the
+    forms can't see since earlier rows aren't saved yet.
+    """
+
+    def __init__(self, model, form_class, accounts=False, unique=()):
+        self.model = model
+        self.form_class = form_class
+        self.accounts = accounts
+        self.unique = unique
+
+    @property
+    def columns(self):
+        account = ['username', 'email', 'password'] if self.accounts else []
+        return account + [name for name in self.form_class.base_fields if name not in account]
+
+    @property
+    def required_columns(self):
+        account = ['username', 'email'] if self.accounts else []
+        return account + [
+            name for name, field in self.form_class.base_fields.items() if field.required and name not in account
+        ]
+
+    def validate(self, row):
+        """
+        ``(instance, user, password, errors)`` for one row; ``instance`` and
+        ``user`` are unsaved.
+        """
+        form = self.form_class(row)
+        errors = {} if form.is_valid() else dict(form.errors)
+        user = password = None
+        if self.accounts:
+            password = row.get('password') or ''
+            user_form = ImportUserForm({
+                'username': row.get('username', ''),
+                'email': row.get('email', ''),
+                'password1': password,
+                'password2': password,
+            })
+            if user_form.is_valid():
+                user = User(username=user_form.cleaned_data['username'], email=user_form.cleaned_data['email'])
+            else:
+                for field, field_errors in user_form.errors.items():
+                    errors.setdefault('password' if field.startswith('password') else field, []).extend(field_errors)
+        if errors:
+            return None, None, None, errors
+        return form.save(commit=False), user, password, None
+
+
+IMPORTERS = {
+    'students': Importer(Student, StudentRegistrationForm, accounts=True, unique=('student_id',)),
+    'parents': Importer(Parent, ParentRegistrationForm, accounts=True),
+    'staff': Importer(Staff, StaffImportForm),
+}
+
+
+def _hash_passwords(passwords):
+    return [make_password(password) for password in passwords]
+
+
+def _hash_later(pool, passwords, workers):
+    """
+    Start hashing ``passwords`` (blank ones become unusable) over ``workers``
+    processes, or hash them here and now if ``workers`` is 0, and return a
+    function that waits for the hashes.
+    """
+    usable = [p for p in passwords if p]
+    if workers:
+        size = max(len(usable) // workers, 1)
+        futures = [pool().submit(_hash_passwords, usable[i:i + size]) for i in range(0, len(usable), size)]
+    else:
+        hashed = _hash_passwords(usable)
+
+    def result():
+        hashes = iter([h for future in futures for h in future.result()] if workers else hashed)
+        return [next(hashes) if p else make_password(None) for p in passwords]
+    return result
+
+
+def _write_batch(importer, batch, hashes, result):
+    instances = [instance for _, instance, _ in batch]
+    try:
+        with transaction.atomic():
+            if importer.accounts:
+                users = [user for _, _, user in batch]
+                for user, password in zip(users, hashes()):
+                    user.password = password
+                User.objects.bulk_create(users)
+                for instance, user in zip(instances, users):
+                    instance.user = user
+            importer.model.objects.bulk_create(instances)
+    except DatabaseError as e:
+        # e.g. a username taken since its row was validated
+        for line, _, _ in batch:
+            result.add_error(line, {'__all__': [f"Not saved, with the rest of its batch: {e}"]})
+        return
+    result.created += len(batch)
+    _generate_derivatives(importer.model, instances)
+
+
+def _generate_derivatives(model, instances):
+    for derivative_model, field_name in derivative_models():
+        if derivative_model is model:
+            # Imported rows often share a photo; resize each file once
+            fieldfiles = {fieldfile.name: fieldfile for fieldfile in (getattr(i, field_name) for i in instances)}
+            for name, fieldfile in fieldfiles.items():
+                try:
+                    generate_missing_derivatives(fieldfile)
+                except (OSError, ValueError):
+                    logger.exception("Could not generate derivatives for %s", name)
+
+
+def count_rows(file):
+    """
+    ``(rows, passwords)``: the number of data rows in the CSV text file
+    ``file`` and how many of them set a password. Rewinds ``file``.
+    """
+    rows = passwords = 0
+    reader = csv.DictReader(file)
+    if reader.fieldnames is not None:
+        reader.fieldnames = [name.strip().lower() for name in reader.fieldnames]
+        for row in reader:
+            rows += 1
+            passwords += bool(row.get('password'))
+    file.seek(0)
+    return rows, passwords
+
+
+def import_csv(importer, file, batch_size=None, dry_run=False, hash_workers=None):
+    """
+    Import the CSV rows in the text file ``file`` with ``importer``. Returns
+    an ImportResult; with ``dry_run`` nothing is written. Passwords are
+    hashed by ``hash_workers`` processes (default IMPORT_HASH_WORKERS), or
+    in this process if it is 0.
+    """
+    batch_size = batch_size or settings.IMPORT_BATCH_SIZE
+    hash_workers = settings.IMPORT_HASH_WORKERS if hash_workers is None else hash_workers
+    reader = csv.DictReader(file)
+    if reader.fieldnames is None:
+        raise ImportFileError("The file is empty.")
+    reader.fieldnames = [name.strip().lower() for name in reader.fieldnames]
+    missing = [name for name in importer.required_columns if name not in reader.fieldnames]
+    if missing:
+        raise ImportFileError(f"Missing columns: {', '.join(missing)}")
+
+    result = ImportResult(dry_run)
+    # Values of the unique columns in the valid rows so far: {column: {value: line}}
+    seen = {name: {} for name in (('username', 'email') if importer.accounts else ()) + importer.unique}
+    executor = None
+
+    def pool():
+        nonlocal executor
+        if executor is None:
+            # Not forked: the children mustn't share the parent's database connections
+            executor = ProcessPoolExecutor(hash_workers, mp_context=get_context('spawn'), initializer=django.setup)
+        return executor
+
+    batch = []
+    pending = None  # the previous batch and its hashes, written once the next batch is ready
+
+    def flush():
+        nonlocal batch, pending
+        hashes = _hash_later(pool, [password for *_, password in batch], hash_workers) if importer.accounts else None
+        if pending:
+            _write_batch(importer, *pending, result)
+        pending = ([row[:3] for row in batch], hashes)
+        batch = []
+
+    try:
+        for row in reader:
+            line = reader.line_num
+            row = {
+                key: (value or '') if key == 'password' else (value or '').strip()
+                for key, value in row.items() if key
+            }
+            instance, user, password, errors = importer.validate(row)
+            errors = errors or {}
+            for name, values in seen.items():
+                value = row.get(name, '').lower()
+                if value in values:
+                    errors.setdefault(name, []).append(f"Already used on line {values[value]} of this file.")
+            if errors:
+                result.add_error(line, errors)
+                continue
+            for name, values in seen.items():
+                if row.get(name):
+                    values[row[name].lower()] = line
+            result.valid += 1
+            if not dry_run:
+                batch.append((line, instance, user, password))
+                if len(batch) >= batch_size:
+                    flush()
+        if batch:
+            flush()
+        if pending:
+            _write_batch(importer, *pending, result)
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+    if result.created:
+        # bulk_create sends no post_save, so purge the cached pages here
+        purge(importer.model)
+    return result
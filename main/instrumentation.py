@@ -0,0 +1,201 @@
+"""
+Per-view request timings, collected by main.middleware.RequestTimingMiddleware.
+
+Every request's wall time, response size and database queries are added to
+its view's totals; a REQUEST_TIMING_SAMPLE_RATE share of requests also times
+the template rendering. Requests slower than REQUEST_TIMING_SLOW_MS are
+logged to this module's logger as one line of JSON, with their slowest
+queries. The totals are per process; ``request_stats()`` returns a
+snapshot. The wall times also feed the latency histogram in main.metrics.
+
+Queries are timed by ``time_query``, an execute wrapper put on every
+connection as it opens, rather than one added per request with
+``connection.execute_wrapper()``: async views run their queries on other
+threads, which have their own connection objects.
+"""
+import heapq
+import json
+import logging
+import random
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+
+from django.conf import settings
+from django.template.backends import django as django_backend
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+STAT_FIELDS = (
+    'requests', 'slow', 'wall_ms', 'max_wall_ms', 'bytes', 'sampled', 'queries', 'db_ms', 'render_ms',
+)
+
+_current = ContextVar('request_timing', default=None)
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+class RequestTiming:
+    """
+    Query timings of one request, and its render time if ``sampled``.
+    """
+
+    def __init__(self, sampled=False):
+        self.sampled = sampled
+        self.queries = 0
+        self.db_ms = 0.0
+        self.render_ms = 0.0
+        self.rendering = False
+        self._slowest = []  # min-heap of (ms, n, sql)
+
+    def time_query(self, execute, sql, params, many, context):
+        start = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            ms = (perf_counter() - start) * 1000
+            self.queries += 1
+            self.db_ms += ms
+            entry = (ms, self.queries, sql)
+            if len(self._slowest) < settings.REQUEST_TIMING_SLOW_QUERIES:
+                heapq.heappush(self._slowest, entry)
+            else:
+                heapq.heappushpop(self._slowest, entry)
+
+    def slowest_queries(self):
+        return [
+            {'ms': round(ms, 3), 'sql': sql[:1000]}
+            for ms, _, sql in sorted(self._slowest, reverse=True)
+        ]
+
+    @contextmanager
+    def collect(self):
+        """
+        Time the queries and template renders of this thread or async task,
+        including the threads its sync_to_async calls run on.
+        """
+        token = _current.set(self)
+        try:
+            yield self
+        finally:
+            _current.reset(token)
+
+
+def time_query(execute, sql, params, many, context):
+    timing = _current.get()
+    if timing is None:
+        return execute(sql, params, many, context)
+    return timing.time_query(execute, sql, params, many, context)
+
+
+def install_query_timer(connection):
+    if time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_query)
+
+
+def start_timing():
+    """
+    A new RequestTiming, sampled for REQUEST_TIMING_SAMPLE_RATE of requests.
+    """
+    return RequestTiming(sampled=random.random() < settings.REQUEST_TIMING_SAMPLE_RATE)
+
+
+def _response_size(response):
+    if response.streaming:
+        return int(response.get('Content-Length') or 0)
+    return len(response.content)
+
+
+def record(request, response, wall, timing):
+    """
+    Add a finished request, ``wall`` seconds long, to its view's totals and
+    log it if it was slow.
+    """
+    match = request.resolver_match
+    view = match.view_name if match is not None else '<unresolved>'
+    wall_ms = wall * 1000
+    size = _response_size(response)
+    slow = wall_ms >= settings.REQUEST_TIMING_SLOW_MS
+    metrics.observe_request(view, wall)
+
+    with _stats_lock:
+        stats = _stats.get(view)
+        if stats is None:
+            stats = _stats[view] = dict.fromkeys(STAT_FIELDS, 0)
+        stats['requests'] += 1
+        stats['slow'] += slow
+        stats['wall_ms'] += wall_ms
+        stats['max_wall_ms'] = max(stats['max_wall_ms'], wall_ms)
+        stats['bytes'] += size
+        stats['queries'] += timing.queries
+        stats['db_ms'] += timing.db_ms
+        if timing.sampled:
+            stats['sampled'] += 1
+            stats['render_ms'] += timing.render_ms
+
+    if slow:
+        entry = {
+            'event': 'slow_request',
+            'view': view,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'wall_ms': round(wall_ms, 3),
+            'bytes': size,
+            'sampled': timing.sampled,
+            'queries': timing.queries,
+            'db_ms': round(timing.db_ms, 3),
+            'slowest_queries': timing.slowest_queries(),
+        }
+        if timing.sampled:
+            entry['render_ms'] = round(timing.render_ms, 3)
+        logger.warning(json.dumps(entry))
+
+
+def request_stats():
+    """
+    ``{view_name: {field: total}}`` for the requests this process has served.
+    ``render_ms`` covers the ``sampled`` ones only.
+    """
+    with _stats_lock:
+        return {view: dict(stats) for view, stats in _stats.items()}
+
+
+def reset_request_stats():
+    with _stats_lock:
+        _stats.clear()
+
+
+# ---------------------------
+# Template render timing
+# ---------------------------
+class Template(django_backend.Template):
+    def render(self, context=None, request=None):
+        timing = _current.get()
+        # Only the outermost render counts; templates rendered while
+        # rendering another are already inside its time
+        if timing is None or not timing.sampled or timing.rendering:
+            return super().render(context, request)
+        timing.rendering = True
+        start = perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            timing.render_ms += (perf_counter() - start) * 1000
+            timing.rendering = False
+
+
+class DjangoTemplates(django_backend.DjangoTemplates):
+    """
+    The Django template engine, with render times added to the timing of
+    sampled requests. Queries run from templates count in both.
+    """
+
+    def from_string(self, template_code):
+        return Template(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        return Template(super().get_template(template_name).template, self)
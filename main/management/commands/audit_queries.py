@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from main.queryaudit import audit
+
+
+class Command(BaseCommand):
+    help = (
+        "EXPLAIN the app's hot queries (main/queryaudit.py) and fail if any "
+        "of them reads a whole table."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--plans', action='store_true', help="Print every query plan, not just failing ones.")
+
+    def handle(self, *args, **options):
+        failures = 0
+        unchecked = 0
+        for name, plan, scanned in audit():
+            if scanned is None:
+                unchecked += 1
+                status = self.style.WARNING('unchecked')
+            elif scanned:
+                failures += 1
+                status = self.style.ERROR(f"full scan of {', '.join(scanned)}")
+            else:
+                status = self.style.SUCCESS('ok')
+            self.stdout.write(f"{name}: {status}")
+            if options['plans'] or scanned:
+                self.stdout.write(''.join(f"    {line}\n" for line in plan.splitlines()))
+
+        if unchecked:
+            self.stdout.write(self.style.WARNING(
+                f"{unchecked} plans not checked: only SQLite and PostgreSQL plans are understood."
+            ))
+        if failures:
+            raise CommandError(f"{failures} hot queries read whole tables.")
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from main.images import derivative_models, generate_derivatives
+
+
+class Command(BaseCommand):
+    help = "Generate resized and WebP derivatives for images uploaded before the pipeline existed."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force', action='store_true',
+            help="Regenerate derivatives that already exist.",
+        )
+
+    def handle(self, *args, **options):
+        total = 0
+        for model, field_name in derivative_models():
+            queryset = model.objects.exclude(**{field_name: ''}).exclude(**{f'{field_name}__isnull': True})
+            for instance in queryset.only('pk', field_name).iterator():
+                fieldfile = getattr(instance, field_name)
+                try:
+                    written = generate_derivatives(fieldfile, force=options['force'])
+                except (OSError, ValueError) as e:
+                    self.stderr.write(f"Skipping {fieldfile.name}: {e}")
+                    continue
+                total += len(written)
+                if written and options['verbosity'] > 1:
+                    self.stdout.write(f"{fieldfile.name}: {len(written)} derivatives")
+        self.stdout.write(self.style.SUCCESS(f"Wrote {total} image derivatives."))
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from main.exports import EXPORTS, write_csv, write_xlsx
+
+
+class Command(BaseCommand):
+    help = "Export admissions, students, parents or contact messages as CSV or Excel, streaming the rows."
+
+    def add_arguments(self, parser):
+        parser.add_argument('export', choices=sorted(EXPORTS))
+        parser.add_argument('--format', choices=['csv', 'xlsx'], default='csv')
+        parser.add_argument(
+            '--output', '-o',
+            help="File to write. CSV goes to standard output if this is left out; Excel needs a file.",
+        )
+        parser.add_argument('--chunk-size', type=int, default=None, help="Rows per query (default EXPORT_CHUNK_SIZE).")
+
+    def handle(self, *args, **options):
+        export = EXPORTS[options['export']]
+        output = options['output']
+        if options['format'] == 'xlsx':
+            if not output:
+                raise CommandError("--output is required for Excel exports.")
+            write_xlsx(export, output, chunk_size=options['chunk_size'])
+        elif output:
+            with open(output, 'w', newline='', encoding='utf-8') as file:
+                write_csv(export, file, chunk_size=options['chunk_size'])
+        else:
+            write_csv(export, self.stdout, chunk_size=options['chunk_size'])
+        if output:
+            self.stderr.write(f"Wrote {output}.")
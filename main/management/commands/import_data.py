@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from main.imports import IMPORTERS, ImportFileError, import_csv
+
+
+class Command(BaseCommand):
+    help = (
+        "Import students, parents or staff from a CSV file with a header row. "
+        "Invalid rows are reported and skipped; the rest are imported."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('importer', choices=sorted(IMPORTERS))
+        parser.add_argument('file')
+        parser.add_argument('--dry-run', action='store_true', help="Validate the rows without saving anything.")
+        parser.add_argument('--batch-size', type=int, default=None, help="Rows per transaction (default IMPORT_BATCH_SIZE).")
+
+    def handle(self, *args, **options):
+        importer = IMPORTERS[options['importer']]
+        try:
+            with open(options['file'], newline='', encoding='utf-8-sig') as file:
+                result = import_csv(importer, file, batch_size=options['batch_size'], dry_run=options['dry_run'])
+        except ImportFileError as e:
+            raise CommandError(str(e))
+
+        for line, messages in result.errors:
+            for message in messages:
+                self.stdout.write(f"Line {line}: {message}")
+        if result.dry_run:
+            summary = f"{result.valid} valid rows, {len(result.errors)} with errors. Nothing was saved."
+        else:
+            summary = f"Imported {result.created} {importer.model._meta.verbose_name_plural}, {len(result.errors)} rows with errors."
+        self.stdout.write(self.style.WARNING(summary) if result.errors else self.style.SUCCESS(summary))
@@ -0,0 +1,43 @@
+import os
+
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+
+from main.images import generate_derivatives
+from main.models import Gallery, GalleryImage
+from main.uploads import DESTINATIONS, add_gallery_images
+
+
+class Command(BaseCommand):
+    help = "Add every image in a folder to a gallery, in file name order, after its existing images."
+
+    def add_arguments(self, parser):
+        parser.add_argument('gallery_id', type=int)
+        parser.add_argument('folder')
+        parser.add_argument('--batch-size', type=int, default=None)
+
+    def handle(self, *args, **options):
+        try:
+            gallery = Gallery.objects.get(pk=options['gallery_id'])
+        except Gallery.DoesNotExist:
+            raise CommandError(f"Gallery {options['gallery_id']} does not exist")
+        directory, extensions, field = DESTINATIONS['gallery_image']
+        folder = options['folder']
+        if not os.path.isdir(folder):
+            raise CommandError(f"{folder} is not a directory")
+
+        names = []
+        for filename in sorted(os.listdir(folder)):
+            if os.path.splitext(filename)[1].lower() not in extensions:
+                continue
+            with open(os.path.join(folder, filename), 'rb') as f:
+                name = default_storage.save(directory + filename, File(f), max_length=field.max_length)
+            try:
+                generate_derivatives(GalleryImage(image=name).image)
+            except (OSError, ValueError) as e:
+                self.stderr.write(f"No derivatives for {name}: {e}")
+            names.append(name)
+
+        images = add_gallery_images(gallery, names, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Added {len(images)} images to {gallery}."))
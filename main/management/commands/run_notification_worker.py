@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from main.notifications import get_backend, process_jobs
+
+
+class Command(BaseCommand):
+    help = "Deliver queued OTP and notification messages, retrying failures with backoff."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50)
+        parser.add_argument(
+            '--sleep', type=float, default=1.0,
+            help="Seconds to wait when the queue is empty.",
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help="Process a single batch and exit.",
+        )
+
+    def handle(self, *args, **options):
+        # One backend for the worker's lifetime keeps provider connections warm.
+        backend = get_backend()
+        try:
+            while True:
+                sent, failed = process_jobs(batch_size=options['batch_size'], backend=backend)
+                if sent or failed:
+                    self.stdout.write(f"Sent {sent}, failed {failed}")
+                if options['once']:
+                    break
+                if not (sent or failed):
+                    time.sleep(options['sleep'])
+        finally:
+            backend.close()
@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from main.models import OTP
+
+
+def delete_in_batches(queryset, batch_size):
+    """
+    Delete ``queryset`` a bounded batch at a time so no single statement
+    holds locks on, or materialises, the whole table. Returns rows deleted.
+    """
+    total = 0
+    while True:
+        ids = list(queryset.values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return total
+        total += OTP.objects.filter(pk__in=ids).delete()[0]
+
+
+class Command(BaseCommand):
+    help = "Delete verified and expired OTPs. Run it from cron, or with --interval as a long-lived process."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--interval', type=float, default=0,
+            help="Repeat every INTERVAL seconds instead of exiting after one sweep.",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            verified = delete_in_batches(OTP.objects.filter(is_verified=True), options['batch_size'])
+            expired = delete_in_batches(
+                OTP.objects.filter(is_verified=False, created_at__lte=OTP.expiry_cutoff()),
+                options['batch_size'],
+            )
+            self.stdout.write(f"Deleted {verified} verified and {expired} expired OTPs.")
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from main.uploads import delete_stale_uploads
+
+
+class Command(BaseCommand):
+    help = "Delete chunked uploads older than CHUNKED_UPLOAD_EXPIRY that were never finished or used."
+
+    def handle(self, *args, **options):
+        deleted = delete_stale_uploads()
+        self.stdout.write(f"Deleted {deleted} stale uploads.")
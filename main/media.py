@@ -0,0 +1,155 @@
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import (
+    FileResponse, Http404, HttpResponse, HttpResponseNotModified, StreamingHttpResponse,
+)
+from django.utils._os import safe_join
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+from django.views.static import was_modified_since
+
+from .models import Admission, Student
+
+CHUNK_SIZE = 64 * 1024
+
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def _owns_admission_document(user, path):
+    return Admission.objects.filter(user=user, previous_report_card=path).exists()
+
+
+def _owns_id_document(user, path):
+    return Student.objects.filter(user=user, id_document=path).exists()
+
+
+# Upload folders that aren't public. Staff can read everything; other
+# signed-in users only files attached to their own records.
+PRIVATE_MEDIA = {
+    'admission_documents/': _owns_admission_document,
+    'id_documents/': _owns_id_document,
+    'students/id_docs/': _owns_id_document,
+}
+
+
+def _private_check(path):
+    for prefix, check in PRIVATE_MEDIA.items():
+        if path.startswith(prefix):
+            return check
+    return None
+
+
+def _can_read(request, check, path):
+    user = request.user
+    if not user.is_authenticated:
+        return False
+    return user.is_staff or check(user, path)
+
+
+def _cache_control(private):
+    # Never immutable: upload names are chosen by whoever uploads them, and
+    # a replaced file's name (and its derivatives') can come back with new
+    # content
+    if private:
+        return 'private, no-cache'
+    return f'public, max-age={settings.MEDIA_CACHE_MAX_AGE}'
+
+
+def _read_range(fullpath, start, length):
+    with open(fullpath, 'rb') as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def _parse_range(header, size):
+    """
+    ``(start, end)`` inclusive for a single ``bytes=`` range, ``None`` to
+    serve the whole file (no header, or a multi-range we don't support),
+    or ``False`` if the range can't be satisfied.
+    """
+    match = _RANGE_RE.match(header.strip()) if header else None
+    if not match:
+        return None
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    elif last:
+        # Suffix range: the final N bytes
+        start = max(size - int(last), 0)
+        end = size - 1
+    else:
+        return None
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+@require_safe
+def serve_media(request, path):
+    """
+    Serve an upload from MEDIA_ROOT in chunks, with Range and
+    If-Modified-Since support. Private folders need a signed-in owner or
+    staff user. With MEDIA_SENDFILE set, the file transfer itself is handed
+    to the front proxy.
+    """
+    try:
+        fullpath = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404('Not found')
+    if not os.path.isfile(fullpath):
+        raise Http404('Not found')
+    # The path as safe_join resolved it: "gallery/../id_documents/x" must
+    # meet the same access check as "id_documents/x"
+    path = os.path.relpath(fullpath, os.path.abspath(settings.MEDIA_ROOT)).replace(os.sep, '/')
+
+    check = _private_check(path)
+    if check is not None and not _can_read(request, check, path):
+        # Don't reveal that the file exists
+        raise Http404('Not found')
+
+    stat = os.stat(fullpath)
+    if not was_modified_since(request.headers.get('If-Modified-Since'), stat.st_mtime):
+        return HttpResponseNotModified()
+
+    content_type, encoding = mimetypes.guess_type(fullpath)
+    content_type = content_type or 'application/octet-stream'
+
+    if settings.MEDIA_SENDFILE:
+        response = HttpResponse(content_type=content_type)
+        if settings.MEDIA_SENDFILE == 'x-accel-redirect':
+            response['X-Accel-Redirect'] = settings.MEDIA_ACCEL_PREFIX + quote(path)
+        else:
+            response['X-Sendfile'] = fullpath
+    else:
+        byte_range = _parse_range(request.headers.get('Range'), stat.st_size)
+        if byte_range is False:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{stat.st_size}'
+            return response
+        if byte_range is None:
+            response = FileResponse(open(fullpath, 'rb'), content_type=content_type)
+        else:
+            start, end = byte_range
+            response = StreamingHttpResponse(
+                _read_range(fullpath, start, end - start + 1), status=206, content_type=content_type,
+            )
+            response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+            response['Content-Length'] = str(end - start + 1)
+        response['Accept-Ranges'] = 'bytes'
+
+    if encoding:
+        response['Content-Encoding'] = encoding
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    response['Cache-Control'] = _cache_control(private=check is not None)
+    return response
@@ -0,0 +1,132 @@
+"""
+Prometheus metrics for the web tier, served by the ``metrics`` view.
+
+Under gunicorn each worker process keeps its own metrics. Set the
+PROMETHEUS_MULTIPROC_DIR environment variable to an empty directory shared
+by the workers (and the notification worker, on the same host) and they
+write their values there, so whichever process answers a scrape reports
+the sum over all of them. gunicorn.conf.py empties the directory when
+gunicorn starts and drops a worker's gauges when it exits.
+"""
+import os
+import time
+
+from django.db.models import Count
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest,
+)
+from prometheus_client.core import GaugeMetricFamily
+from prometheus_client.multiprocess import MultiProcessCollector
+
+from .dbpool import pool_stats
+from .models import Admission
+
+# ---------------------------
+# Metrics
+# ---------------------------
+REQUEST_LATENCY = Histogram(
+    'school_http_request_duration_seconds', 'Time to answer a request, by URL name.', ['view'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+PAGE_CACHE_REQUESTS = Counter(
+    'school_page_cache_requests', 'Requests for cacheable public pages, by page cache outcome.', ['outcome'],
+)
+RATELIMIT_REQUESTS = Counter(
+    'school_ratelimit_requests', 'Throttled requests, by rate limit scope and outcome.', ['scope', 'outcome'],
+)
+OTP_SENDS = Counter(
+    'school_otp_sends', 'OTPs sent during the request (OTP_DELIVERY = "inline"), by channel and outcome.',
+    ['channel', 'outcome'],
+)
+NOTIFICATION_SENDS = Counter(
+    'school_notification_sends',
+    'Queued notifications sent by the worker, by kind (otp or announcement), channel and outcome.',
+    ['kind', 'channel', 'outcome'],
+)
+
+# Pool gauges are summed over live processes; the cumulative ones restart
+# with each worker's pool.
+DB_POOL_CONNECTIONS = Gauge(
+    'school_db_pool_connections', 'Pooled database connections, by state.', ['state'], multiprocess_mode='livesum',
+)
+DB_POOL_MAX_CONNECTIONS = Gauge(
+    'school_db_pool_max_connections', 'Most connections the pools may open.', multiprocess_mode='livesum',
+)
+DB_POOL_WAITING = Gauge(
+    'school_db_pool_waiting', 'Requests waiting for a pooled connection.', multiprocess_mode='livesum',
+)
+DB_POOL_REQUESTS = Gauge(
+    'school_db_pool_requests', 'Connections handed out since the pools opened.', multiprocess_mode='livesum',
+)
+DB_POOL_WAIT_SECONDS = Gauge(
+    'school_db_pool_wait_seconds', 'Time spent waiting for a connection since the pools opened.',
+    multiprocess_mode='livesum',
+)
+DB_POOL_ERRORS = Gauge(
+    'school_db_pool_errors', 'Failures to get a connection since the pools opened.', multiprocess_mode='livesum',
+)
+
+# Reading the pool's counters takes its lock, so each process copies them
+# into the gauges at most this often (and on every scrape it answers)
+DB_POOL_UPDATE_INTERVAL = 5
+_pool_updated_at = 0.0
+
+
+def update_pool_metrics():
+    global _pool_updated_at
+    _pool_updated_at = time.monotonic()
+    stats = pool_stats()
+    if stats is None:
+        return
+    DB_POOL_CONNECTIONS.labels('checked_out').set(stats['checked_out'])
+    DB_POOL_CONNECTIONS.labels('available').set(stats['available'])
+    DB_POOL_MAX_CONNECTIONS.set(stats['max_size'])
+    DB_POOL_WAITING.set(stats['waiting'])
+    DB_POOL_REQUESTS.set(stats['requests'])
+    DB_POOL_WAIT_SECONDS.set(stats['wait_ms'] / 1000)
+    DB_POOL_ERRORS.set(stats['errors'])
+
+
+def observe_request(view, seconds):
+    REQUEST_LATENCY.labels(view).observe(seconds)
+    if time.monotonic() - _pool_updated_at >= DB_POOL_UPDATE_INTERVAL:
+        update_pool_metrics()
+
+
+# ---------------------------
+# Exposition
+# ---------------------------
+class AdmissionCollector:
+    """
+    Admissions by status, counted in the database when scraped, so every
+    process reports the same numbers.
+    """
+
+    def collect(self):
+        gauge = GaugeMetricFamily('school_admissions', 'Admission applications, by status.', labels=['status'])
+        counts = dict(Admission.objects.order_by().values_list('status').annotate(count=Count('pk')))
+        for status, _ in Admission.STATUS_CHOICES:
+            gauge.add_metric([status], counts.get(status, 0))
+        yield gauge
+
+
+def registry():
+    """
+    A registry of every metric: all processes' when PROMETHEUS_MULTIPROC_DIR
+    is set, otherwise this process's.
+    """
+    registry = CollectorRegistry()
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        MultiProcessCollector(registry)
+    else:
+        registry.register(REGISTRY)
+    registry.register(AdmissionCollector())
+    return registry
+
+
+def exposition():
+    """
+    ``(content, content_type)`` of all metrics in the text exposition format.
+    """
+    update_pool_metrics()
+    return generate_latest(registry()), CONTENT_TYPE_LATEST
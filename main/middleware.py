@@ -0,0 +1,77 @@
+from time import perf_counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from whitenoise.middleware import WhiteNoiseMiddleware as BaseWhiteNoiseMiddleware
+
+from . import instrumentation
+
+
+class WhiteNoiseMiddleware(BaseWhiteNoiseMiddleware):
+    """
+    WhiteNoise that can run natively under ASGI.
+
+    Stock WhiteNoiseMiddleware is sync-only, and one sync middleware makes
+    Django push every async request through a thread and back, serialising
+    the async views behind it. Looking up a static file is a dict lookup
+    (unless autorefresh is on), so it is safe to do on the event loop.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, *args, **kwargs):
+        super().__init__(get_response, *args, **kwargs)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return self.serve(static_file, request)
+        return await self.get_response(request)
+
+
+class RequestTimingMiddleware:
+    """
+    Time each request for main.instrumentation: wall time, response size and
+    database queries always, template rendering for a sample.
+
+    Place it below WhiteNoise so static files aren't counted, and above the
+    rest so their work (sessions, auth, messages) is.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_TIMING_ENABLE:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timing = instrumentation.start_timing()
+        start = perf_counter()
+        with timing.collect():
+            response = self.get_response(request)
+        instrumentation.record(request, response, perf_counter() - start, timing)
+        return response
+
+    async def __acall__(self, request):
+        timing = instrumentation.start_timing()
+        start = perf_counter()
+        with timing.collect():
+            response = await self.get_response(request)
+        instrumentation.record(request, response, perf_counter() - start, timing)
+        return response
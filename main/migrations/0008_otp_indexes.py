@@ -0,0 +1,21 @@
+# Generated by Django 5.2.4 on 2026-10-18 19:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0007_notificationjob'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='otp',
+            index=models.Index(fields=['email', 'phone_number', 'is_verified', 'created_at'], name='otp_lookup_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='otp',
+            index=models.Index(fields=['is_verified', 'created_at'], name='otp_sweep_idx'),
+        ),
+    ]
@@ -0,0 +1,89 @@
+# Generated by Django 5.2.4 on 2026-10-18 19:53
+
+from django.db import migrations, models
+
+# The inverted index over SearchDocument.title/body, per database. Other
+# backends have none and main.search falls back to LIKE queries.
+FORWARD_SQL = {
+    'sqlite': [
+        """
+        CREATE VIRTUAL TABLE main_searchdocument_fts USING fts5(
+            title, body, content='main_searchdocument', content_rowid='id',
+            tokenize='porter unicode61 remove_diacritics 2'
+        )
+        """,
+        # External-content FTS5 tables are kept in step by triggers
+        """
+        CREATE TRIGGER main_searchdocument_fts_insert AFTER INSERT ON main_searchdocument BEGIN
+            INSERT INTO main_searchdocument_fts(rowid, title, body) VALUES (new.id, new.title, new.body);
+        END
+        """,
+        """
+        CREATE TRIGGER main_searchdocument_fts_delete AFTER DELETE ON main_searchdocument BEGIN
+            INSERT INTO main_searchdocument_fts(main_searchdocument_fts, rowid, title, body)
+            VALUES ('delete', old.id, old.title, old.body);
+        END
+        """,
+        """
+        CREATE TRIGGER main_searchdocument_fts_update AFTER UPDATE ON main_searchdocument BEGIN
+            INSERT INTO main_searchdocument_fts(main_searchdocument_fts, rowid, title, body)
+            VALUES ('delete', old.id, old.title, old.body);
+            INSERT INTO main_searchdocument_fts(rowid, title, body) VALUES (new.id, new.title, new.body);
+        END
+        """,
+    ],
+    'postgresql': [
+        """
+        ALTER TABLE main_searchdocument ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+            setweight(to_tsvector('english', title), 'A') || setweight(to_tsvector('english', body), 'B')
+        ) STORED
+        """,
+        "CREATE INDEX main_searchdocument_vector_idx ON main_searchdocument USING GIN (search_vector)",
+    ],
+}
+
+REVERSE_SQL = {
+    'sqlite': [
+        "DROP TRIGGER main_searchdocument_fts_update",
+        "DROP TRIGGER main_searchdocument_fts_delete",
+        "DROP TRIGGER main_searchdocument_fts_insert",
+        "DROP TABLE main_searchdocument_fts",
+    ],
+    'postgresql': [
+        "DROP INDEX main_searchdocument_vector_idx",
+        "ALTER TABLE main_searchdocument DROP COLUMN search_vector",
+    ],
+}
+
+
+def _run(statements):
+    def run(apps, schema_editor):
+        for statement in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0010_chunkedupload'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('announcement', 'Announcement'), ('event', 'Event'), ('gallery', 'Gallery'), ('news', 'News'), ('notice', 'Notice')], max_length=20)),
+                ('object_id', models.PositiveBigIntegerField()),
+                ('title', models.CharField(max_length=200)),
+                ('body', models.TextField(blank=True)),
+                ('url', models.CharField(max_length=200)),
+                ('date', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('kind', 'object_id'), name='searchdocument_source_unique')],
+            },
+        ),
+        migrations.RunPython(_run(FORWARD_SQL), _run(REVERSE_SQL)),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.4 on 2026-10-18 20:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0011_searchdocument'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['start_date', 'end_date', 'event_type'], name='event_window_idx'),
+        ),
+    ]
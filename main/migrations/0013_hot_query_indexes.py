@@ -0,0 +1,47 @@
+# Generated by Django 5.2.4 on 2026-10-18 20:22
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0012_event_window_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='admission',
+            index=models.Index(fields=['status', 'date_submitted'], name='admission_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='announcement',
+            index=models.Index(condition=models.Q(('important', True)), fields=['date_posted'], name='announcement_important_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contactmessage',
+            index=models.Index(condition=models.Q(('is_read', False)), fields=['date_sent'], name='contactmessage_unread_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['event_type', 'start_date', 'id'], name='event_type_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='gallery',
+            index=models.Index(condition=models.Q(('is_published', True)), fields=['date_created', 'id'], name='gallery_published_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='galleryimage',
+            index=models.Index(fields=['gallery', 'order'], name='galleryimage_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='news',
+            index=models.Index(condition=models.Q(('is_published', True)), fields=['date_posted', 'id'], name='news_published_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='staff',
+            index=models.Index(fields=['department', 'join_date', 'id'], name='staff_department_idx'),
+        ),
+    ]
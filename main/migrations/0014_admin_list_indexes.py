@@ -0,0 +1,59 @@
+# Generated by Django 5.2.4 on 2026-10-18 21:24
+
+from django.conf import settings
+from django.db import migrations, models
+
+# Columns the admin's prefix searches (``^field``, i.e. istartswith) look at.
+# Django compares them case-insensitively, which a plain index can't serve:
+# SQLite's LIKE needs a NOCASE index, PostgreSQL an index on UPPER(column)
+# with pattern ops. Other backends get none.
+SEARCH_COLUMNS = {
+    'main_admission': ['applicant_name', 'parent_guardian_name', 'contact_email'],
+    'main_announcement': ['title'],
+    'main_contactmessage': ['email', 'name', 'subject'],
+    'main_event': ['title'],
+    'main_galleryimage': ['caption'],
+    'main_parent': ['last_name', 'first_name', 'email'],
+    'main_staff': ['last_name', 'first_name'],
+    'main_student': ['student_id', 'last_name', 'first_name'],
+}
+
+INDEX_SQL = {
+    'sqlite': 'CREATE INDEX {table}_{column}_search ON {table} ({column} COLLATE NOCASE)',
+    'postgresql': 'CREATE INDEX {table}_{column}_search ON {table} (UPPER({column}::text) text_pattern_ops)',
+}
+
+
+def create_search_indexes(apps, schema_editor):
+    sql = INDEX_SQL.get(schema_editor.connection.vendor)
+    if sql:
+        for table, columns in SEARCH_COLUMNS.items():
+            for column in columns:
+                schema_editor.execute(sql.format(table=table, column=column))
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor in INDEX_SQL:
+        for table, columns in SEARCH_COLUMNS.items():
+            for column in columns:
+                schema_editor.execute(f'DROP INDEX {table}_{column}_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0013_hot_query_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['faculty', 'department'], name='student_faculty_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['department'], name='student_department_idx'),
+        ),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
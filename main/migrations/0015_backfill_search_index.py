@@ -0,0 +1,20 @@
+from django.db import migrations
+
+from main.search import rebuild_index
+
+
+def backfill(apps, schema_editor):
+    # 0011 created an empty index; rows saved before it never went through
+    # the post_save signal that indexes them
+    rebuild_index(apps=apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0014_admin_list_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.4 on 2026-10-18 21:52
+
+from django.db import migrations, models
+
+# main.notifications.OTP_EMAIL_SUBJECT when this migration was written
+OTP_EMAIL_SUBJECT = "Your OTP Code for Registration"
+
+
+def label_announcements(apps, schema_editor):
+    # Jobs queued before the field existed: OTP emails all carry the same
+    # subject and OTP texts have none, so any other email is an announcement
+    NotificationJob = apps.get_model('main', 'NotificationJob')
+    NotificationJob.objects.filter(channel='email').exclude(subject=OTP_EMAIL_SUBJECT).update(kind='announcement')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0015_backfill_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notificationjob',
+            name='kind',
+            field=models.CharField(choices=[('otp', 'OTP'), ('announcement', 'Announcement')], default='otp', max_length=20),
+        ),
+        migrations.RunPython(label_announcements, migrations.RunPython.noop),
+    ]
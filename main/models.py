@@ -84,6 +84,7 @@ class Announcement(models.Model):
     content = models.TextField()
     author = models.ForeignKey(User, on_delete=models.CASCADE)
     date_posted = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     important = models.BooleanField(default=False)
     target_audience = models.CharField(
         max_length=10,
@@ -97,11 +98,22 @@ class Announcement(models.Model):
     def get_absolute_url(self):
         return reverse('announcement-detail', kwargs={'pk': self.pk})
 
+    class Meta:
+        indexes = [
+            # Keyset pagination seeks on (date_posted, id)
+            models.Index(fields=['date_posted', 'id'], name='announcement_posted_idx'),
+            # Home page: latest important announcements. Boolean filters are
+            # partial indexes: Django filters on the bare column ("WHERE
+            # important"), which can't seek a (important, ...) index.
+            models.Index(fields=['date_posted'], condition=models.Q(important=True), name='announcement_important_idx'),
+        ]
+
 
 class AnnouncementAttachment(models.Model):
     announcement = models.ForeignKey(Announcement, related_name='attachments', on_delete=models.CASCADE)
     file = models.FileField(upload_to='announcements/attachments/')
     uploaded_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     
     @property
     def filename(self):
@@ -146,6 +158,13 @@ class Staff(models.Model):
     
     def __str__(self):
         return f"{self.full_name} ({self.position})"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['join_date', 'id'], name='staff_join_date_idx'),
+            # Staff directory filtered by department
+            models.Index(fields=['department', 'join_date', 'id'], name='staff_department_idx'),
+        ]
     
 
 
@@ -191,6 +210,13 @@ class Student(models.Model):
     def __str__(self):
         return f"{self.first_name} {self.last_name} ({self.student_id})"
 
+    class Meta:
+        indexes = [
+            # Admin change list filters
+            models.Index(fields=['faculty', 'department'], name='student_faculty_idx'),
+            models.Index(fields=['department'], name='student_department_idx'),
+        ]
+
 class Parent(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, default=1)  
     first_name = models.CharField(max_length=30)
@@ -261,6 +287,7 @@ class Event(models.Model):
         ]
     )
     participants = models.ManyToManyField(Student, blank=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     
     def __str__(self):
         return self.title
@@ -269,6 +296,15 @@ class Event(models.Model):
     def is_upcoming(self):
         return self.start_date > timezone.now()
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['start_date', 'id'], name='event_start_idx'),
+            # Calendar windows: start_date < end AND end_date > start [AND event_type = ...]
+            models.Index(fields=['start_date', 'end_date', 'event_type'], name='event_window_idx'),
+            # Event list filtered by type, and related events
+            models.Index(fields=['event_type', 'start_date', 'id'], name='event_type_start_idx'),
+        ]
+
 from django.db import models
 from django.urls import reverse
 
@@ -284,6 +320,7 @@ class Gallery(models.Model):
     description = models.TextField(blank=True)
     cover_image = models.ImageField(upload_to='gallery/covers/')
     date_created = models.DateTimeField(auto_now_add=True)  # ✅ fix
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     event = models.ForeignKey('Event', on_delete=models.SET_NULL, null=True, blank=True)
     is_published = models.BooleanField(default=True)
     
@@ -296,6 +333,13 @@ class Gallery(models.Model):
     class Meta:
         verbose_name_plural = "Galleries"
         ordering = ['-date_created']
+        indexes = [
+            models.Index(fields=['date_created', 'id'], name='gallery_created_idx'),
+            # Published galleries, newest first
+            models.Index(
+                fields=['date_created', 'id'], condition=models.Q(is_published=True), name='gallery_published_idx',
+            ),
+        ]
 
 
 class GalleryImage(models.Model):
@@ -303,10 +347,15 @@ class GalleryImage(models.Model):
     image = models.ImageField(upload_to='gallery/images/')
     caption = models.CharField(max_length=200, blank=True)
     uploaded_at = models.DateTimeField(auto_now_add=True)  # ✅ fix
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     order = models.PositiveIntegerField(default=0)
     
     class Meta:
         ordering = ['order']
+        indexes = [
+            # A gallery's images in order
+            models.Index(fields=['gallery', 'order'], name='galleryimage_order_idx'),
+        ]
     
     @property
     def filename(self):
@@ -325,6 +374,7 @@ class News(models.Model):
     title = models.CharField(max_length=200)
     content = models.TextField()
     date_posted = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     author = models.ForeignKey(Staff, on_delete=models.CASCADE)
     featured_image = models.ImageField(upload_to='news/images/')
     is_published = models.BooleanField(default=True)
@@ -335,6 +385,13 @@ class News(models.Model):
     def get_absolute_url(self):
         return reverse('news-detail', kwargs={'pk': self.pk})
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['date_posted', 'id'], name='news_posted_idx'),
+            # Home page: latest published news
+            models.Index(fields=['date_posted', 'id'], condition=models.Q(is_published=True), name='news_published_idx'),
+        ]
+
 class ContactMessage(models.Model):
     name = models.CharField(max_length=100)
     email = models.EmailField()
@@ -345,6 +402,12 @@ class ContactMessage(models.Model):
     
     def __str__(self):
         return f"Message from {self.name} - {self.subject}"
+
+    class Meta:
+        indexes = [
+            # Unread messages, newest first
+            models.Index(fields=['date_sent'], condition=models.Q(is_read=False), name='contactmessage_unread_idx'),
+        ]
     
 
 
@@ -358,8 +421,26 @@ class OTP(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     is_verified = models.BooleanField(default=False)
 
+    LIFETIME = timedelta(minutes=10)
+
+    class Meta:
+        indexes = [
+            # Verification lookup: unverified, unexpired code for an email/phone pair
+            models.Index(
+                fields=['email', 'phone_number', 'is_verified', 'created_at'],
+                name='otp_lookup_idx',
+            ),
+            # Sweeper: verified rows, then expired unverified rows by age
+            models.Index(fields=['is_verified', 'created_at'], name='otp_sweep_idx'),
+        ]
+
     def is_expired(self):
-        return timezone.now() > self.created_at + timedelta(minutes=10)
+        return timezone.now() > self.created_at + self.LIFETIME
+
+    @classmethod
+    def expiry_cutoff(cls):
+        """OTPs created at or before this moment have expired."""
+        return timezone.now() - cls.LIFETIME
 
     @classmethod
     def generate_otp(cls, email=None, phone_number=None):
@@ -406,6 +487,12 @@ class Admission(models.Model):
     def __str__(self):
         return f"Admission Application for {self.applicant_name}"
 
+    class Meta:
+        indexes = [
+            # Applications by status, newest first
+            models.Index(fields=['status', 'date_submitted'], name='admission_status_idx'),
+        ]
+
 
 class Notice (models.Model):
     title = models.CharField(max_length=150)
@@ -430,4 +517,108 @@ class Program(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
-        return self.title
\ No newline at end of file
+        return self.title
+
+class NotificationJob(models.Model):
+    """
+    An outgoing email/SMS/WhatsApp message waiting for the notification worker.
+    """
+    CHANNEL_CHOICES = [
+        ('email', 'Email'),
+        ('sms', 'SMS'),
+        ('whatsapp', 'WhatsApp'),
+    ]
+    KIND_CHOICES = [
+        ('otp', 'OTP'),
+        ('announcement', 'Announcement'),
+    ]
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, default='otp')
+    channel = models.CharField(max_length=10, choices=CHANNEL_CHOICES)
+    recipient = models.CharField(max_length=254)
+    subject = models.CharField(max_length=200, blank=True)
+    body = models.TextField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    available_at = models.DateTimeField(default=timezone.now)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # The worker polls for due pending jobs
+            models.Index(fields=['status', 'available_at'], name='notificationjob_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_channel_display()} to {self.recipient} ({self.status})"
+
+
+class ChunkedUpload(models.Model):
+    """
+    A file arriving in pieces (see main/uploads.py). Bytes are appended to a
+    partial file under CHUNKED_UPLOAD_DIR; once all ``size`` bytes are in,
+    it is moved into storage and ``stored_name`` is set.
+    """
+    PURPOSE_CHOICES = [
+        ('admission_document', 'Admission document'),
+        ('gallery_image', 'Gallery image'),
+    ]
+    STATUS_CHOICES = [
+        ('uploading', 'Uploading'),
+        ('complete', 'Complete'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
+    purpose = models.CharField(max_length=20, choices=PURPOSE_CHOICES)
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    received = models.PositiveBigIntegerField(default=0)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='uploading')
+    # Name in default storage once complete; a plain string so deleting the
+    # row never deletes the file it was handed on to
+    stored_name = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.filename} ({self.received}/{self.size})"
+
+
+class SearchDocument(models.Model):
+    """
+    One searchable page (see main/search.py), kept in step with its source
+    row by signals. The full-text index over ``title`` and ``body`` lives
+    outside the ORM: an FTS5 table on SQLite, a ``tsvector`` column with a
+    GIN index on PostgreSQL (migration 0011).
+    """
+    KIND_CHOICES = [
+        ('announcement', 'Announcement'),
+        ('event', 'Event'),
+        ('gallery', 'Gallery'),
+        ('news', 'News'),
+        ('notice', 'Notice'),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    object_id = models.PositiveBigIntegerField()
+    title = models.CharField(max_length=200)
+    body = models.TextField(blank=True)
+    url = models.CharField(max_length=200)
+    date = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'object_id'], name='searchdocument_source_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()}: {self.title}"
@@ -0,0 +1,341 @@
+import logging
+import smtplib
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from twilio.http.http_client import TwilioHttpClient
+from twilio.rest import Client
+
+from .metrics import NOTIFICATION_SENDS, OTP_SENDS
+from .models import NotificationJob, Parent
+
+logger = logging.getLogger(__name__)
+
+OTP_EMAIL_SUBJECT = 'Your OTP Code for Registration'
+OTP_MESSAGE = 'Your OTP code is: {otp_code}. It will expire in 10 minutes.'
+
+
+# ---------------------------
+# Backends
+# ---------------------------
+Message = namedtuple('Message', ['channel', 'recipient', 'subject', 'body'])
+
+
+class BaseBackend:
+    """
+    ``send_many`` fans messages out over at most NOTIFICATION_CONCURRENCY
+    threads and returns, in input order, ``None`` for each message that was
+    delivered or the exception that stopped it.
+    """
+
+    def send(self, channel, recipient, subject, body):
+        raise NotImplementedError
+
+    def _send_or_error(self, message):
+        try:
+            self.send(*message)
+        except Exception as e:
+            return e
+        return None
+
+    def send_many(self, messages):
+        messages = list(messages)
+        if len(messages) <= 1:
+            return [self._send_or_error(m) for m in messages]
+        workers = min(settings.NOTIFICATION_CONCURRENCY, len(messages))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(self._send_or_error, messages))
+
+    def close(self):
+        pass
+
+
+class ProviderBackend(BaseBackend):
+    """
+    Delivers through SMTP (Django's email settings) and Twilio.
+
+    One SMTP connection and one pooled HTTP session are opened lazily and
+    reused for every message this backend sends, so a long-running worker
+    doesn't reconnect per message.
+    """
+
+    def __init__(self):
+        self._smtp = None
+        self._smtp_lock = threading.Lock()
+        self._twilio = None
+
+    @property
+    def twilio(self):
+        if self._twilio is None:
+            self._twilio = Client(
+                settings.TWILIO_ACCOUNT_SID,
+                settings.TWILIO_AUTH_TOKEN,
+                http_client=TwilioHttpClient(pool_connections=True, timeout=settings.NOTIFICATION_TIMEOUT),
+            )
+        return self._twilio
+
+    def _send_email(self, messages):
+        # smtplib connections aren't thread-safe; emails share one connection in turn.
+        with self._smtp_lock:
+            if self._smtp is None:
+                self._smtp = get_connection(fail_silently=False, timeout=settings.NOTIFICATION_TIMEOUT)
+            results = []
+            if messages:
+                # An explicitly opened connection stays open across send() calls.
+                try:
+                    self._smtp.open()
+                except Exception as e:
+                    # Unreachable server: every email in the batch fails (and is retried)
+                    self._smtp.close()
+                    return [e] * len(messages)
+            for message in messages:
+                email = EmailMessage(
+                    message.subject, message.body, settings.DEFAULT_FROM_EMAIL,
+                    [message.recipient], connection=self._smtp,
+                )
+                try:
+                    try:
+                        email.send()
+                    except smtplib.SMTPServerDisconnected:
+                        # The server dropped an idle connection; reconnect once.
+                        self._smtp.close()
+                        self._smtp.open()
+                        email.send()
+                except Exception as e:
+                    results.append(e)
+                else:
+                    results.append(None)
+            return results
+
+    def send(self, channel, recipient, subject, body):
+        if channel == 'email':
+            error = self._send_email([Message(channel, recipient, subject, body)])[0]
+            if error is not None:
+                raise error
+            return None
+
+        if channel == 'whatsapp':
+            message = self.twilio.messages.create(
+                body=body,
+                from_=settings.TWILIO_WHATSAPP_NUMBER,  # Twilio sandbox WhatsApp number
+                to=f"whatsapp:{recipient}",
+            )
+        else:
+            message = self.twilio.messages.create(
+                body=body,
+                from_=settings.TWILIO_PHONE_NUMBER,  # Twilio SMS-enabled number
+                to=recipient,
+            )
+        return message.sid
+
+    def send_many(self, messages):
+        messages = list(messages)
+        results = [None] * len(messages)
+        email_indexes = [i for i, m in enumerate(messages) if m.channel == 'email']
+        other_indexes = [i for i, m in enumerate(messages) if m.channel != 'email']
+        for i, error in zip(other_indexes, super().send_many(messages[i] for i in other_indexes)):
+            results[i] = error
+        for i, error in zip(email_indexes, self._send_email([messages[i] for i in email_indexes])):
+            results[i] = error
+        return results
+
+    def close(self):
+        with self._smtp_lock:
+            if self._smtp is not None:
+                self._smtp.close()
+                self._smtp = None
+
+
+class LocMemBackend(BaseBackend):
+    """
+    Keeps sent messages in ``LocMemBackend.outbox`` instead of contacting
+    any provider, for tests, offline development and benchmarks. Recipients
+    listed in ``failing_recipients`` raise so retry handling can be
+    exercised, and ``latency`` (seconds) simulates a provider round trip.
+    """
+    outbox = []
+    failing_recipients = set()
+    latency = 0
+
+    def send(self, channel, recipient, subject, body):
+        if self.latency:
+            time.sleep(self.latency)
+        if recipient in self.failing_recipients:
+            raise ConnectionError(f"Delivery to {recipient} failed")
+        self.outbox.append({
+            'channel': channel,
+            'recipient': recipient,
+            'subject': subject,
+            'body': body,
+        })
+        return None
+
+
+def get_backend():
+    return import_string(settings.NOTIFICATION_BACKEND)()
+
+
+def otp_messages(otp):
+    """
+    The OTP as one message per channel it can reach.
+    """
+    body = OTP_MESSAGE.format(otp_code=otp.otp_code)
+    messages = []
+    if otp.email:
+        messages.append(Message('email', otp.email, OTP_EMAIL_SUBJECT, body))
+    if otp.phone_number:
+        messages.append(Message('whatsapp', otp.phone_number, '', body))
+        messages.append(Message('sms', otp.phone_number, '', body))
+    return messages
+
+
+# ---------------------------
+# Sending in the request
+# ---------------------------
+def send_otp(otp, backend=None):
+    """
+    Send the OTP over all its channels at once, for OTP_DELIVERY = "inline".
+
+    Returns ``(message, error)`` pairs: ``error`` is None when the channel
+    delivered, or the exception it raised, or a TimeoutError if it didn't
+    finish within OTP_SEND_TIMEOUT seconds. A channel that times out is
+    left to finish in the background; the request doesn't wait for it.
+    """
+    backend = backend or get_backend()
+    messages = otp_messages(otp)
+    executor = ThreadPoolExecutor(max_workers=max(len(messages), 1))
+    futures = [executor.submit(backend._send_or_error, message) for message in messages]
+    # The channels start together, so one deadline is a timeout per channel
+    done, not_done = wait(futures, timeout=settings.OTP_SEND_TIMEOUT)
+    executor.shutdown(wait=False, cancel_futures=True)
+    if not not_done:
+        backend.close()
+
+    results = []
+    for message, future in zip(messages, futures):
+        if future in done:
+            error = future.result()
+            outcome = 'sent' if error is None else 'failed'
+        else:
+            error = TimeoutError(f"No answer after {settings.OTP_SEND_TIMEOUT:g} seconds")
+            outcome = 'timeout'
+        OTP_SENDS.labels(message.channel, outcome).inc()
+        if error is not None:
+            logger.warning("Sending the OTP to %s by %s failed: %s", message.recipient, message.channel, error)
+        results.append((message, error))
+    return results
+
+
+# ---------------------------
+# Queue
+# ---------------------------
+def enqueue_otp(otp):
+    """
+    Queue the OTP for every channel it can reach. The worker does the sending.
+    """
+    return NotificationJob.objects.bulk_create(
+        NotificationJob(kind='otp', channel=m.channel, recipient=m.recipient, subject=m.subject, body=m.body)
+        for m in otp_messages(otp)
+    )
+
+
+def enqueue_announcement(announcement):
+    """
+    Queue an email of ``announcement`` to every parent it is addressed to.
+    """
+    if announcement.target_audience not in ('all', 'parents'):
+        return []
+    subject = announcement.title
+    body = announcement.content
+    recipients = (
+        Parent.objects.exclude(email='').values_list('email', flat=True).distinct().iterator()
+    )
+    return NotificationJob.objects.bulk_create(
+        (
+            NotificationJob(kind='announcement', channel='email', recipient=email, subject=subject, body=body)
+            for email in recipients
+        ),
+        batch_size=500,
+    )
+
+
+def claim_jobs(batch_size):
+    """
+    Mark up to ``batch_size`` due jobs as ``sending`` and return them.
+
+    Jobs stuck in ``sending`` longer than NOTIFICATION_CLAIM_TIMEOUT (a
+    worker died mid-send) become claimable again.
+    """
+    now = timezone.now()
+    stale = now - timedelta(seconds=settings.NOTIFICATION_CLAIM_TIMEOUT)
+    due = (
+        Q(status='pending', available_at__lte=now)
+        | Q(status='sending', claimed_at__lt=stale)
+    )
+    with transaction.atomic():
+        ids = list(
+            NotificationJob.objects.select_for_update(skip_locked=True)
+            .filter(due)
+            .order_by('available_at')
+            .values_list('pk', flat=True)[:batch_size]
+        )
+        NotificationJob.objects.filter(pk__in=ids).update(status='sending', claimed_at=now)
+    return list(NotificationJob.objects.filter(pk__in=ids).order_by('available_at'))
+
+
+def retry_delay(attempts):
+    return timedelta(seconds=settings.NOTIFICATION_RETRY_BACKOFF * 2 ** (attempts - 1))
+
+
+def record_result(job, error):
+    job.attempts += 1
+    if error is not None:
+        job.last_error = str(error)
+        if job.attempts >= settings.NOTIFICATION_MAX_ATTEMPTS:
+            job.status = 'failed'
+            logger.error("Giving up on %s after %d attempts: %s", job, job.attempts, error)
+        else:
+            job.status = 'pending'
+            job.available_at = timezone.now() + retry_delay(job.attempts)
+    else:
+        job.status = 'sent'
+        job.sent_at = timezone.now()
+        job.last_error = ''
+    job.claimed_at = None
+    job.save(update_fields=['status', 'attempts', 'last_error', 'available_at', 'claimed_at', 'sent_at'])
+    NOTIFICATION_SENDS.labels(job.kind, job.channel, 'retry' if job.status == 'pending' else job.status).inc()
+    return job.status == 'sent'
+
+
+def process_jobs(batch_size=50, backend=None):
+    """
+    Deliver one batch of due jobs over a single backend's connections.
+    Returns ``(sent, failed)`` counts.
+    """
+    backend = backend or get_backend()
+    jobs = claim_jobs(batch_size)
+    try:
+        results = backend.send_many(
+            Message(job.channel, job.recipient, job.subject, job.body) for job in jobs
+        )
+    except Exception as e:
+        # Still record every claimed job, so each backs off (or gives up)
+        # instead of sitting in "sending" until the claim times out
+        logger.exception("Sending a batch of %d notifications failed", len(jobs))
+        results = [e] * len(jobs)
+    sent = failed = 0
+    for job, error in zip(jobs, results):
+        if record_result(job, error):
+            sent += 1
+        else:
+            failed += 1
+    return sent, failed
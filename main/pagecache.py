@@ -0,0 +1,150 @@
+import hashlib
+import time
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+
+from .cache import increment
+from .metrics import PAGE_CACHE_REQUESTS
+
+
+def _cache():
+    return caches[settings.PAGE_CACHE_ALIAS]
+
+
+def _generation_key(label):
+    return f'pagecache:gen:{label}'
+
+
+def model_generations(labels):
+    """
+    Current generation of each model label. A missing generation (never set,
+    or evicted) starts at a fresh timestamp so it can't match old entries.
+    """
+    cache = _cache()
+    keys = [_generation_key(label) for label in labels]
+    found = cache.get_many(keys)
+    for key in keys:
+        if key not in found:
+            cache.add(key, time.time_ns(), None)
+            found[key] = cache.get(key)
+    return [found[key] for key in keys]
+
+
+def purge(model):
+    """
+    Invalidate every cached page that depends on ``model``.
+    """
+    _cache().set(_generation_key(model._meta.label_lower), time.time_ns(), None)
+
+
+def is_cacheable_request(request):
+    """
+    Anonymous GET/HEAD requests with no pending flash messages. Requests
+    without a session cookie are answered without loading the session.
+    """
+    if request.method not in ('GET', 'HEAD'):
+        return False
+    if request.COOKIES.get('messages'):
+        return False
+    if request.COOKIES.get(settings.SESSION_COOKIE_NAME):
+        if request.user.is_authenticated or request.session.get('_messages'):
+            return False
+    return True
+
+
+def _page_key(request, labels, params):
+    # Only the parameters the view reads: any other (``?x=1``, ``?utm_source``)
+    # would let each client mint as many entries as it likes
+    query = '&'.join(f'{name}={value}' for name in params for value in request.GET.getlist(name))
+    digest = hashlib.md5(f'{request.path}?{query}'.encode(), usedforsecurity=False).hexdigest()
+    generations = '.'.join(str(g) for g in model_generations(labels))
+    return f'pagecache:page:{digest}:{generations}'
+
+
+def page_cache_counters():
+    cache = _cache()
+    return {
+        outcome: cache.get(f'pagecache:count:{outcome}', 0)
+        for outcome in ('hit', 'miss', 'bypass')
+    }
+
+
+def _lookup(request, labels, params):
+    """
+    ``(key, cached)`` for this request: ``key`` is None when the request
+    must bypass the cache, ``cached`` is None on a miss.
+    """
+    cache = _cache()
+    if not settings.PAGE_CACHE_ENABLE or not is_cacheable_request(request):
+        increment(cache, 'pagecache:count:bypass')
+        PAGE_CACHE_REQUESTS.labels('bypass').inc()
+        return None, None
+    key = _page_key(request, labels, params)
+    cached = cache.get(key)
+    outcome = 'hit' if cached is not None else 'miss'
+    increment(cache, f'pagecache:count:{outcome}')
+    PAGE_CACHE_REQUESTS.labels(outcome).inc()
+    return key, cached
+
+
+def _hit(cached):
+    content, content_type = cached
+    response = HttpResponse(content, content_type=content_type)
+    response['X-Page-Cache'] = 'hit'
+    return response
+
+
+def _store(request, key, response, params):
+    if hasattr(response, 'render') and callable(response.render):
+        response.render()
+    # Anything that sets a cookie (including a fresh CSRF token, which
+    # CsrfViewMiddleware adds later) is specific to this visitor. Pages
+    # asked for with other parameters may echo them (pagination links), so
+    # they are served from the cache but never stored.
+    personal = response.cookies or request.META.get('CSRF_COOKIE_NEEDS_UPDATE')
+    extra = any(name not in params for name in request.GET)
+    if response.status_code == 200 and not response.streaming and not personal and not extra:
+        _cache().set(key, (response.content, response['Content-Type']), settings.PAGE_CACHE_TIMEOUT)
+    response['X-Page-Cache'] = 'miss'
+    return response
+
+
+def anonymous_page_cache(*models, query=()):
+    """
+    Cache a view's full response for anonymous visitors until PAGE_CACHE_TIMEOUT
+    passes or any of ``models`` is saved or deleted. ``query`` names the GET
+    parameters the view reads; pages are cached per value of those only.
+    Works on sync and async views.
+    """
+    labels = sorted(model._meta.label_lower for model in models)
+    params = tuple(query)
+
+    def decorator(view_func):
+        if iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def wrapped(request, *args, **kwargs):
+                # The session and cache lookups are sync, so they're made in
+                # one hop off the event loop rather than one per call
+                key, cached = await sync_to_async(_lookup)(request, labels, params)
+                if key is None:
+                    return await view_func(request, *args, **kwargs)
+                if cached is not None:
+                    return _hit(cached)
+                response = await view_func(request, *args, **kwargs)
+                return await sync_to_async(_store)(request, key, response, params)
+            return wrapped
+
+        @wraps(view_func)
+        def wrapped(request, *args, **kwargs):
+            key, cached = _lookup(request, labels, params)
+            if key is None:
+                return view_func(request, *args, **kwargs)
+            if cached is not None:
+                return _hit(cached)
+            return _store(request, key, view_func(request, *args, **kwargs), params)
+        return wrapped
+    return decorator
@@ -0,0 +1,252 @@
+import asyncio
+import base64
+import binascii
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.paginator import InvalidPage, Paginator
+from django.db import connections
+from django.db.models import Q
+from django.http import Http404
+from django.utils.functional import cached_property
+
+
+class KeysetPage:
+    """
+    A page of results fetched by cursor instead of by offset.
+
+    Exposes ``has_next``/``has_previous`` like Django's ``Page`` plus the
+    querystrings for the neighbouring pages, so templates can link to them
+    without knowing how cursors are encoded.
+    """
+
+    def __init__(self, object_list, next_cursor, previous_cursor, params, cursor_param):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self._params = params
+        self._cursor_param = cursor_param
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    def _query_for(self, cursor):
+        params = self._params.copy()
+        params[self._cursor_param] = cursor
+        return params.urlencode()
+
+    @property
+    def next_query(self):
+        return self._query_for(self.next_cursor) if self.next_cursor else ''
+
+    @property
+    def previous_query(self):
+        return self._query_for(self.previous_cursor) if self.previous_cursor else ''
+
+
+class KeysetPaginationMixin:
+    """
+    ListView mixin that pages on an indexed ordering instead of OFFSET.
+
+    ``keyset_ordering`` must end in a unique field (normally ``pk``) so every
+    row has a distinct position. Page-number pagination is used unless
+    ``LIST_PAGINATION_MODE`` is set to ``"keyset"``.
+    """
+    keyset_ordering = ('-pk',)
+    cursor_param = 'cursor'
+
+    def keyset_enabled(self):
+        return getattr(settings, 'LIST_PAGINATION_MODE', 'page') == 'keyset'
+
+    def paginate_queryset(self, queryset, page_size):
+        if not self.keyset_enabled():
+            return super().paginate_queryset(queryset, page_size)
+        rows_queryset, fields, cursor, backwards = self._keyset_rows(queryset, page_size)
+        return self._keyset_page(list(rows_queryset), page_size, fields, cursor, backwards)
+
+    async def apaginate_queryset(self, queryset, page_size):
+        """
+        ``paginate_queryset`` with the async ORM, for async views. Numbered
+        pages fetch their rows alongside the COUNT instead of after it.
+        """
+        if not self.keyset_enabled():
+            return await self._apaginate_numbered(queryset, page_size)
+        rows_queryset, fields, cursor, backwards = self._keyset_rows(queryset, page_size)
+        rows = [row async for row in rows_queryset]
+        return self._keyset_page(rows, page_size, fields, cursor, backwards)
+
+    async def _apaginate_numbered(self, queryset, page_size):
+        paginator = self.get_paginator(
+            queryset, page_size,
+            orphans=self.get_paginate_orphans(),
+            allow_empty_first_page=self.get_allow_empty(),
+        )
+        page = self.kwargs.get(self.page_kwarg) or self.request.GET.get(self.page_kwarg) or 1
+        try:
+            number = int(page)
+        except ValueError:
+            if page != 'last':
+                raise Http404('Page is not “last”, nor can it be converted to an int.')
+            number = None
+
+        async def fetch_rows(number):
+            # Enough rows for the page plus any orphans it may absorb
+            bottom = (number - 1) * paginator.per_page
+            return [row async for row in queryset[bottom:bottom + paginator.per_page + paginator.orphans]]
+
+        if number is None:
+            paginator.count = await queryset.acount()
+            number = paginator.num_pages
+            rows = await fetch_rows(number)
+        else:
+            paginator.count, rows = await asyncio.gather(queryset.acount(), fetch_rows(max(number, 1)))
+        try:
+            number = paginator.validate_number(number)
+        except InvalidPage as e:
+            raise Http404(f'Invalid page ({number}): {e}')
+        bottom = (number - 1) * paginator.per_page
+        top = bottom + paginator.per_page
+        if top + paginator.orphans >= paginator.count:
+            top = paginator.count
+        page = paginator._get_page(rows[:top - bottom], number, paginator)
+        return (paginator, page, page.object_list, page.has_other_pages())
+
+    def _keyset_rows(self, queryset, page_size):
+        fields = [self._parse_ordering(item) for item in self.keyset_ordering]
+        cursor = self.request.GET.get(self.cursor_param)
+        backwards = False
+        if cursor:
+            values, backwards = self._decode_cursor(cursor, queryset.model, fields)
+            queryset = queryset.filter(self._after(fields, values, reverse=backwards))
+
+        ordering = [
+            ('-' if descending != backwards else '') + name
+            for name, descending in fields
+        ]
+        return queryset.order_by(*ordering)[:page_size + 1], fields, cursor, backwards
+
+    def _keyset_page(self, rows, page_size, fields, cursor, backwards):
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if backwards:
+            rows.reverse()
+
+        next_cursor = previous_cursor = None
+        if rows:
+            if has_more or backwards:
+                next_cursor = self._encode_cursor(rows[-1], fields, backwards=False)
+            if (has_more and backwards) or (cursor and not backwards):
+                previous_cursor = self._encode_cursor(rows[0], fields, backwards=True)
+
+        params = self.request.GET.copy()
+        params.pop('page', None)
+        page = KeysetPage(rows, next_cursor, previous_cursor, params, self.cursor_param)
+        return (None, page, rows, page.has_other_pages())
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['cursor_pagination'] = self.keyset_enabled()
+        return context
+
+    @staticmethod
+    def _parse_ordering(item):
+        return (item[1:], True) if item.startswith('-') else (item, False)
+
+    @staticmethod
+    def _after(fields, values, reverse=False):
+        """
+        Build ``(a, b, c) > (x, y, z)`` as nested ORs, honouring each
+        field's direction, so the database can seek on the index.
+        """
+        condition = Q()
+        for i, (name, descending) in enumerate(fields):
+            lookup = 'lt' if descending != reverse else 'gt'
+            term = Q(**{f'{name}__{lookup}': values[i]})
+            for (prev_name, _), prev_value in zip(fields[:i], values[:i]):
+                term &= Q(**{prev_name: prev_value})
+            condition |= term
+        # The OR chain alone hides the range from some planners (SQLite
+        # included); an inclusive bound on the leading column lets them seek.
+        name, descending = fields[0]
+        bound = 'lte' if descending != reverse else 'gte'
+        return Q(**{f'{name}__{bound}': values[0]}) & condition
+
+    def _encode_cursor(self, obj, fields, backwards):
+        values = []
+        for name, _ in fields:
+            value = getattr(obj, name)
+            values.append(value.isoformat() if hasattr(value, 'isoformat') else value)
+        payload = json.dumps({'v': values, 'b': backwards}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def _decode_cursor(self, cursor, model, fields):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            raw_values = payload['v']
+            if len(raw_values) != len(fields):
+                raise ValueError
+            values = []
+            for (name, _), raw in zip(fields, raw_values):
+                field = model._meta.pk if name == 'pk' else model._meta.get_field(name)
+                values.append(field.to_python(raw))
+            return values, bool(payload.get('b'))
+        except (binascii.Error, KeyError, TypeError, ValueError, ValidationError):
+            raise Http404('Invalid cursor.')
+
+
+def estimated_count(queryset):
+    """
+    The database's cheap guess at the number of rows in ``queryset``'s
+    table, or None if it has none or ``queryset`` is filtered.
+
+    PostgreSQL's guess is the planner's row count from the last ANALYZE or
+    autovacuum. SQLite keeps no count, so its guess is the largest rowid,
+    which is exact until rows are deleted and otherwise too high.
+    """
+    query = queryset.query
+    if query.where or query.combinator or query.is_sliced or query.distinct:
+        return None
+    connection = connections[queryset.db]
+    table = connection.ops.quote_name(queryset.model._meta.db_table)
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(%s)', [table])
+        elif connection.vendor == 'sqlite':
+            cursor.execute(f'SELECT MAX(rowid) FROM {table}')
+        else:
+            return None
+        row = cursor.fetchone()
+    # -1 on PostgreSQL: never analyzed
+    if row is None or row[0] is None or row[0] < 0:
+        return None
+    return row[0]
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator for admin change lists of big tables: unfiltered, it takes
+    the row count from ``estimated_count`` instead of a COUNT(*) over the
+    whole table. Tables estimated at under ADMIN_ESTIMATED_COUNT_THRESHOLD
+    rows, and filtered or searched lists, are still counted exactly.
+    """
+
+    @cached_property
+    def count(self):
+        estimate = estimated_count(self.object_list)
+        if estimate is not None and estimate >= settings.ADMIN_ESTIMATED_COUNT_THRESHOLD:
+            return estimate
+        return super().count
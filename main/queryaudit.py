@@ -0,0 +1,192 @@
+"""
+The app's hot queries, and an EXPLAIN check that each one can use an index.
+
+Add a query here whenever a page or job starts filtering or ordering on
+something new; ``manage.py audit_queries`` (and the test suite) then fails
+if it would read a whole table.
+"""
+import re
+from datetime import timedelta
+
+from django.contrib import admin
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .calendars import events_in_window
+from .models import (
+    OTP, Admission, Announcement, ChunkedUpload, ContactMessage, Event, Gallery, GalleryImage, News,
+    NotificationJob, Parent, Staff, Student,
+)
+
+HOT_QUERIES = {}
+
+
+def hot_query(name):
+    """
+    Register a function returning a hot queryset under ``name``.
+    """
+    def decorator(func):
+        HOT_QUERIES[name] = func
+        return func
+    return decorator
+
+
+# ---------------------------
+# Public pages
+# ---------------------------
+@hot_query('home: important announcements')
+def _home_announcements():
+    return Announcement.objects.filter(important=True).order_by('-date_posted')[:3]
+
+
+@hot_query('home: upcoming events')
+def _home_events():
+    return Event.objects.filter(start_date__gte=timezone.now()).order_by('start_date')[:3]
+
+
+@hot_query('home: latest news')
+def _home_news():
+    return News.objects.filter(is_published=True).order_by('-date_posted')[:3]
+
+
+@hot_query('announcements: list page')
+def _announcement_list():
+    return Announcement.objects.order_by('-date_posted', '-pk')[:11]
+
+
+@hot_query('events: list page of one type')
+def _event_list_by_type():
+    return Event.objects.filter(event_type='sports', start_date__gte=timezone.now()).order_by('start_date', 'pk')[:11]
+
+
+@hot_query('events: related events')
+def _related_events():
+    return Event.objects.filter(event_type='sports').exclude(pk=1)[:3]
+
+
+@hot_query('calendar: six-week window')
+def _calendar_window():
+    start = timezone.now()
+    return events_in_window(start, start + timedelta(days=42), 'sports')
+
+
+@hot_query('news: list page')
+def _news_list():
+    return News.objects.order_by('-date_posted', '-pk')[:6]
+
+
+@hot_query('gallery: list page')
+def _gallery_list():
+    return Gallery.objects.filter(is_published=True).order_by('-date_created', '-pk')[:13]
+
+
+@hot_query('gallery: images of one gallery')
+def _gallery_images():
+    return GalleryImage.objects.filter(gallery_id=1).order_by('order')
+
+
+@hot_query('staff: directory of one department')
+def _staff_by_department():
+    return Staff.objects.filter(department='teaching').order_by('-join_date', '-pk')[:13]
+
+
+# ---------------------------
+# Admin and background jobs
+# ---------------------------
+@hot_query('admin: admissions by status')
+def _admissions_by_status():
+    return Admission.objects.filter(status='Pending').order_by('-date_submitted')[:100]
+
+
+@hot_query('admin: unread contact messages')
+def _unread_messages():
+    return ContactMessage.objects.filter(is_read=False).order_by('-date_sent')[:100]
+
+
+@hot_query('admin: students by department')
+def _students_by_department():
+    return Student.objects.filter(department='physics').order_by('-pk')[:100]
+
+
+def _admin_search(model):
+    """
+    A change list search with ``model``'s ModelAdmin, as main/admin.py
+    defines it.
+    """
+    model_admin = admin.site.get_model_admin(model)
+    queryset, _ = model_admin.get_search_results(None, model._default_manager.all(), 'rai')
+    return queryset.order_by('-pk')[:100]
+
+
+for _model in (Admission, Announcement, ContactMessage, Event, GalleryImage, Parent, Staff, Student):
+    hot_query(f'admin: {_model._meta.verbose_name} search')(lambda model=_model: _admin_search(model))
+
+
+@hot_query('otp: verification lookup')
+def _otp_lookup():
+    return OTP.objects.filter(
+        email='parent@example.com', phone_number='+9779800000000', otp_code='123456',
+        is_verified=False, created_at__gt=OTP.expiry_cutoff(),
+    ).order_by('-created_at')[:1]
+
+
+@hot_query('otp: sweep expired')
+def _otp_sweep():
+    return OTP.objects.filter(is_verified=False, created_at__lte=OTP.expiry_cutoff()).values_list('pk')[:5000]
+
+
+@hot_query('notifications: claim due jobs')
+def _due_jobs():
+    now = timezone.now()
+    due = Q(status='pending', available_at__lte=now) | Q(status='sending', claimed_at__lt=now)
+    return NotificationJob.objects.filter(due).order_by('available_at').values_list('pk')[:50]
+
+
+@hot_query('uploads: sweep stale')
+def _stale_uploads():
+    return ChunkedUpload.objects.filter(created_at__lt=timezone.now())
+
+
+# ---------------------------
+# Checking plans
+# ---------------------------
+# SQLite: "SCAN main_event" reads the table; "SCAN main_event USING INDEX ..."
+# walks an index (in order, normally stopping at a LIMIT) and is fine.
+_SQLITE_SCAN_RE = re.compile(r'\bSCAN (\w+)(?! USING)(?:\s|$)')
+_POSTGRES_SCAN_RE = re.compile(r'Seq Scan on (\w+)')
+
+
+def explain(queryset):
+    """
+    ``(plan, scanned_tables)`` for ``queryset`` on the default database.
+
+    PostgreSQL plans with sequential scans disabled: on small development
+    tables a seq scan is always cheapest, so the question asked is whether
+    an index could be used at all.
+    """
+    if connection.vendor == 'postgresql':
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+            plan = queryset.explain()
+        return plan, _POSTGRES_SCAN_RE.findall(plan)
+    plan = queryset.explain()
+    if connection.vendor == 'sqlite':
+        return plan, _SQLITE_SCAN_RE.findall(plan)
+    return plan, None
+
+
+def audit(names=None):
+    """
+    ``[(name, plan, scanned_tables)]`` for the registered hot queries, or
+    just ``names``. ``scanned_tables`` is None where the database's plans
+    can't be checked.
+    """
+    results = []
+    for name, func in HOT_QUERIES.items():
+        if names and name not in names:
+            continue
+        plan, scanned = explain(func())
+        results.append((name, plan, scanned))
+    return results
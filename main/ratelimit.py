@@ -0,0 +1,131 @@
+import logging
+import re
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+
+from .cache import increment
+from .metrics import RATELIMIT_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+_PERIODS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 24 * 60 * 60}
+_RATE_RE = re.compile(r'^(\d+)/(\d*)([smhd])$')
+
+
+def parse_rate(rate):
+    """
+    ``"5/10m"`` -> ``(5, 600)``: five requests per ten minutes.
+    """
+    match = _RATE_RE.match(rate)
+    if not match:
+        raise ValueError(f"Invalid rate {rate!r}; expected e.g. '5/m' or '20/10m'")
+    count, multiplier, unit = match.groups()
+    return int(count), int(multiplier or 1) * _PERIODS[unit]
+
+
+def _cache():
+    return caches[settings.RATELIMIT_CACHE_ALIAS]
+
+
+def client_ip(request):
+    header = settings.RATELIMIT_IP_HEADER
+    if header and request.META.get(header):
+        # X-Forwarded-For style headers list the original client first
+        return request.META[header].split(',')[0].strip()
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def request_identities(request, keys):
+    """
+    The values a request is bucketed by. Keys without a value for this
+    request (no session cookie yet, no email posted) are skipped.
+    """
+    identities = []
+    for key in keys:
+        if key == 'ip':
+            values = [client_ip(request)]
+        elif key == 'session':
+            values = [request.COOKIES.get(settings.SESSION_COOKIE_NAME)]
+        elif key == 'identity':
+            # Whoever the OTP/message is addressed to. Read from the form
+            # only: loading the session here would cost a database query.
+            values = [request.POST.get('email'), request.POST.get('phone')]
+        else:
+            raise ValueError(f"Unknown rate limit key {key!r}")
+        identities.extend(f'{key}:{value.lower()}' for value in values if value)
+    return identities
+
+
+def take_token(bucket, capacity, period):
+    """
+    Token bucket holding ``capacity`` tokens, refilled evenly over ``period``
+    seconds. Returns ``(allowed, retry_after_seconds)``.
+
+    Concurrent requests can race between get and set and both be let
+    through; that is an acceptable overshoot for abuse throttling.
+    """
+    cache = _cache()
+    now = time.time()
+    tokens, stamp = cache.get(bucket, (capacity, now))
+    tokens = min(capacity, tokens + (now - stamp) * capacity / period)
+    if tokens < 1:
+        cache.set(bucket, (tokens, now), period)
+        return False, (1 - tokens) * period / capacity
+    cache.set(bucket, (tokens - 1, now), period)
+    return True, 0
+
+
+def _count(scope, outcome):
+    increment(_cache(), f'ratelimit:count:{scope}:{outcome}')
+    RATELIMIT_REQUESTS.labels(scope, outcome).inc()
+
+
+def ratelimit_counters(scope):
+    """
+    ``{'allowed': n, 'blocked': n}`` requests for ``scope`` since the cache
+    was last cleared.
+    """
+    cache = _cache()
+    return {
+        outcome: cache.get(f'ratelimit:count:{scope}:{outcome}', 0)
+        for outcome in ('allowed', 'blocked')
+    }
+
+
+def ratelimit(scope, keys=('ip',), methods=('POST',)):
+    """
+    Throttle a view with the ``RATELIMITS[scope]`` rate, one token bucket per
+    key in ``keys`` ("ip", "session", "identity"). Over-limit requests get
+    an immediate 429 before the view runs.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapped(request, *args, **kwargs):
+            if not settings.RATELIMIT_ENABLE or (methods and request.method not in methods):
+                return view_func(request, *args, **kwargs)
+
+            capacity, period = parse_rate(settings.RATELIMITS[scope])
+            retry_after = 0
+            for identity in request_identities(request, keys):
+                allowed, wait = take_token(f'ratelimit:{scope}:{identity}', capacity, period)
+                if not allowed:
+                    retry_after = max(retry_after, wait)
+
+            if retry_after:
+                _count(scope, 'blocked')
+                logger.warning("Rate limit %s exceeded by %s", scope, client_ip(request))
+                response = HttpResponse(
+                    'Too many requests. Please try again later.',
+                    status=429, content_type='text/plain',
+                )
+                response['Retry-After'] = str(int(retry_after) + 1)
+                return response
+
+            _count(scope, 'allowed')
+            return view_func(request, *args, **kwargs)
+        return wrapped
+    return decorator
@@ -0,0 +1,233 @@
+import heapq
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import F, Q
+from django.urls import reverse
+from django.utils.html import strip_tags
+
+from .models import Announcement, Event, Gallery, News, Notice, SearchDocument
+
+_TERM_RE = re.compile(r'\w+')
+
+
+# ---------------------------
+# What gets indexed
+# ---------------------------
+# Only fields and reverse(), no model methods: rebuild_index also runs on the
+# historical models of a data migration.
+def _announcement(announcement):
+    url = reverse('announcement-detail', kwargs={'pk': announcement.pk})
+    return announcement.title, announcement.content, announcement.date_posted, url
+
+
+def _event(event):
+    body = f"{event.description}\n{event.location}"
+    return event.title, body, event.start_date, reverse('event-detail', kwargs={'pk': event.pk})
+
+
+def _gallery(gallery):
+    if not gallery.is_published:
+        return None
+    url = reverse('gallery-detail', kwargs={'pk': gallery.pk})
+    return gallery.title, gallery.description, gallery.date_created, url
+
+
+def _news(news):
+    if not news.is_published:
+        return None
+    url = reverse('news-detail', kwargs={'pk': news.pk})
+    return news.title, news.content, news.date_posted, url
+
+
+def _notice(notice):
+    # Notices have no page of their own; they're shown on the home page
+    return notice.title, notice.paragraph, notice.published, reverse('home')
+
+
+# model -> (SearchDocument.kind, function giving (title, body, date, url) or
+# None when the row shouldn't be findable, the field that date comes from)
+SEARCHABLE = {
+    Announcement: ('announcement', _announcement, 'date_posted'),
+    Event: ('event', _event, 'start_date'),
+    Gallery: ('gallery', _gallery, 'date_created'),
+    News: ('news', _news, 'date_posted'),
+    Notice: ('notice', _notice, 'published'),
+}
+
+
+def _document(instance, model=None):
+    kind, fields, _ = SEARCHABLE[model or type(instance)]
+    values = fields(instance)
+    if values is None:
+        return kind, None
+    title, body, date, url = values
+    return kind, {'title': title, 'body': strip_tags(body or ''), 'date': date, 'url': url}
+
+
+def index_instance(instance):
+    kind, document = _document(instance)
+    if document is None:
+        remove_instance(instance)
+    else:
+        SearchDocument.objects.update_or_create(kind=kind, object_id=instance.pk, defaults=document)
+
+
+def remove_instance(instance):
+    kind = SEARCHABLE[type(instance)][0]
+    SearchDocument.objects.filter(kind=kind, object_id=instance.pk).delete()
+
+
+def _documents_by_date(model, rows, document_model, batch_size):
+    date_field = SEARCHABLE[model][2]
+    ordering = (F(date_field).asc(nulls_first=True), 'pk')
+    for instance in rows.objects.order_by(*ordering).iterator(chunk_size=batch_size):
+        kind, document = _document(instance, model)
+        if document is not None:
+            yield document_model(kind=kind, object_id=instance.pk, **document)
+
+
+def _date_order(document):
+    # Undated documents first
+    return (document.date is not None, document.date or 0)
+
+
+def rebuild_index(batch_size=1000, apps=None):
+    """
+    Re-index every searchable row from scratch. Returns the number indexed.
+    A migration passes its ``apps`` to index through the historical models.
+
+    Documents of all kinds are written oldest first, so their ids (which
+    bound SearchResults' window) follow their dates.
+    """
+    document_model = apps.get_model('main', 'SearchDocument') if apps else SearchDocument
+    document_model.objects.all().delete()
+    documents = heapq.merge(
+        *(
+            _documents_by_date(model, apps.get_model(model._meta.label) if apps else model, document_model, batch_size)
+            for model in SEARCHABLE
+        ),
+        key=_date_order,
+    )
+    total = 0
+    batch = []
+    for document in documents:
+        batch.append(document)
+        if len(batch) >= batch_size:
+            total += len(document_model.objects.bulk_create(batch))
+            batch = []
+    total += len(document_model.objects.bulk_create(batch))
+    return total
+
+
+# ---------------------------
+# Querying
+# ---------------------------
+def _fts5_query(terms):
+    # Quote every term so user input can't use FTS5 syntax. The porter
+    # tokenizer already matches other forms of each word ("exams", "exam").
+    return ' '.join(f'"{term}"' for term in terms)
+
+
+class SearchResults:
+    """
+    Documents matching every word of ``query``, best match first.
+
+    Only the SEARCH_RANK_WINDOW most recently indexed matches (the highest
+    ids) are ranked and returned: scoring every document that contains a
+    very common word is what makes full-text search slow on large tables.
+    rebuild_index writes documents in date order, and new rows are indexed
+    as they are saved, so these are the newest matches by date except for
+    rows saved with a back-dated date since the last rebuild.
+
+    Behaves enough like a QuerySet for ``Paginator``: ``count()`` is one
+    bounded COUNT over the index and each page slice is one ranked query
+    for that page's ids plus one to load them.
+    """
+
+    def __init__(self, query):
+        self.query = query
+        self.terms = _TERM_RE.findall(query.lower())
+        self._count = None
+        self._oldest_ranked = None
+
+    def _like_queryset(self):
+        queryset = SearchDocument.objects.all()
+        for term in self.terms:
+            queryset = queryset.filter(Q(title__icontains=term) | Q(body__icontains=term))
+        return queryset.order_by('-date', '-pk')
+
+    def _fetch(self, sql, params):
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+
+    def _match_count(self, limit):
+        # Counting stops at ``limit``: past the window the exact number of
+        # matches doesn't matter, and finding it means reading every doclist
+        if connection.vendor == 'sqlite':
+            sql = (
+                "SELECT count(*) FROM (SELECT rowid FROM main_searchdocument_fts "
+                "WHERE main_searchdocument_fts MATCH %s LIMIT %s)"
+            )
+            return self._fetch(sql, [_fts5_query(self.terms), limit])[0][0]
+        if connection.vendor == 'postgresql':
+            sql = (
+                "SELECT count(*) FROM (SELECT id FROM main_searchdocument "
+                "WHERE search_vector @@ plainto_tsquery('english', %s) LIMIT %s) matches"
+            )
+            return self._fetch(sql, [' '.join(self.terms), limit])[0][0]
+        return self._like_queryset()[:limit].count()
+
+    def count(self):
+        if self._count is None:
+            self._count = self._match_count(settings.SEARCH_RANK_WINDOW) if self.terms else 0
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def _sqlite_ids(self, offset, limit):
+        match = _fts5_query(self.terms)
+        sql = "SELECT rowid FROM main_searchdocument_fts WHERE main_searchdocument_fts MATCH %s"
+        params = [match]
+        if self.count() == settings.SEARCH_RANK_WINDOW:
+            # bm25() can only be computed inside the MATCH query, so the window
+            # is a rowid bound, which FTS5 applies while reading the index.
+            if self._oldest_ranked is None:
+                rows = self._fetch(sql + " ORDER BY rowid DESC LIMIT 1 OFFSET %s", [match, settings.SEARCH_RANK_WINDOW - 1])
+                self._oldest_ranked = rows[0][0]
+            sql += " AND rowid >= %s"
+            params.append(self._oldest_ranked)
+        # Title matches weigh ten times body matches
+        sql += " ORDER BY bm25(main_searchdocument_fts, 10.0, 1.0) LIMIT %s OFFSET %s"
+        return [row[0] for row in self._fetch(sql, params + [limit, offset])]
+
+    def _postgresql_ids(self, offset, limit):
+        sql = (
+            "SELECT id FROM ("
+            "  SELECT id, search_vector FROM main_searchdocument"
+            "  WHERE search_vector @@ plainto_tsquery('english', %s) ORDER BY id DESC LIMIT %s"
+            ") candidates "
+            "ORDER BY ts_rank(search_vector, plainto_tsquery('english', %s)) DESC, id DESC LIMIT %s OFFSET %s"
+        )
+        query = ' '.join(self.terms)
+        return [row[0] for row in self._fetch(sql, [query, settings.SEARCH_RANK_WINDOW, query, limit, offset])]
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            return self[key:key + 1][0]
+        offset = key.start or 0
+        limit = min(key.stop if key.stop is not None else self.count(), self.count()) - offset
+        if limit <= 0:
+            return []
+
+        if connection.vendor == 'sqlite':
+            ids = self._sqlite_ids(offset, limit)
+        elif connection.vendor == 'postgresql':
+            ids = self._postgresql_ids(offset, limit)
+        else:
+            return list(self._like_queryset()[offset:offset + limit])
+        documents = SearchDocument.objects.in_bulk(ids)
+        return [documents[pk] for pk in ids if pk in documents]
@@ -0,0 +1,66 @@
+import logging
+
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django_cleanup.signals import cleanup_post_delete
+
+from .cache import invalidate_school_info
+from .images import delete_derivatives, derivative_models, generate_missing_derivatives
+from .instrumentation import install_query_timer
+from .models import SchoolInfo
+from .pagecache import purge
+from .search import SEARCHABLE, index_instance, remove_instance
+
+logger = logging.getLogger(__name__)
+
+
+@receiver([post_save, post_delete], sender=SchoolInfo)
+def school_info_changed(sender, **kwargs):
+    invalidate_school_info()
+
+
+def image_uploaded(sender, instance, **kwargs):
+    for model, field_name in derivative_models():
+        if model is sender:
+            fieldfile = getattr(instance, field_name)
+            try:
+                generate_missing_derivatives(fieldfile)
+            except (OSError, ValueError):
+                logger.exception("Could not generate derivatives for %s", fieldfile.name)
+
+
+@receiver(connection_created)
+def time_queries(sender, connection, **kwargs):
+    install_query_timer(connection)
+
+
+@receiver([post_save, post_delete])
+def purge_cached_pages(sender, **kwargs):
+    if sender._meta.app_label == 'main':
+        purge(sender)
+
+
+for _model, _field_name in derivative_models():
+    post_save.connect(image_uploaded, sender=_model, dispatch_uid=f'derivatives-{_model._meta.label}')
+
+
+def search_document_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        index_instance(instance)
+
+
+def search_document_deleted(sender, instance, **kwargs):
+    remove_instance(instance)
+
+
+for _model in SEARCHABLE:
+    post_save.connect(search_document_saved, sender=_model, dispatch_uid=f'search-{_model._meta.label}')
+    post_delete.connect(search_document_deleted, sender=_model, dispatch_uid=f'search-{_model._meta.label}')
+
+
+@receiver(cleanup_post_delete)
+def image_file_deleted(sender, file_name, file, success, **kwargs):
+    # django_cleanup removed a replaced or deleted upload; drop its resizes too.
+    if success:
+        delete_derivatives(file_name, file.storage)
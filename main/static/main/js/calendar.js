@@ -0,0 +1,91 @@
+// Month grid for the calendar page. Each month's events come from the
+// calendar JSON API (main.views.calendar_events), one request per month.
+(function () {
+    const root = document.querySelector('.calendar');
+    if (!root) {
+        return;
+    }
+    const eventsUrl = root.dataset.eventsUrl;
+    const body = root.querySelector('tbody');
+    const title = document.querySelector('.calendar-title');
+    const typeSelect = document.getElementById('calendar-type');
+    let month = new Date();
+    month = new Date(month.getFullYear(), month.getMonth(), 1);
+
+    function isoDate(date) {
+        const pad = n => String(n).padStart(2, '0');
+        return `${date.getFullYear()}-${pad(date.getMonth() + 1)}-${pad(date.getDate())}`;
+    }
+
+    function dayKey(date) {
+        return isoDate(date);
+    }
+
+    async function render() {
+        // Whole weeks, Sunday to Saturday, covering the month
+        const first = new Date(month.getFullYear(), month.getMonth(), 1 - month.getDay());
+        const last = new Date(month.getFullYear(), month.getMonth() + 1, 1);
+        const end = new Date(last.getFullYear(), last.getMonth(), last.getDate() + (7 - last.getDay()) % 7);
+        title.textContent = month.toLocaleDateString(undefined, { month: 'long', year: 'numeric' });
+
+        const params = new URLSearchParams({ start: isoDate(first), end: isoDate(end) });
+        if (typeSelect.value) {
+            params.set('type', typeSelect.value);
+        }
+        const response = await fetch(`${eventsUrl}?${params}`);
+        const data = await response.json();
+
+        const byDay = {};
+        for (const event of data.events || []) {
+            const day = new Date(event.start);
+            const stop = new Date(event.end);
+            day.setHours(0, 0, 0, 0);
+            // Multi-day events show on every day they cover
+            while (day < stop || dayKey(day) === dayKey(new Date(event.start))) {
+                (byDay[dayKey(day)] = byDay[dayKey(day)] || []).push(event);
+                day.setDate(day.getDate() + 1);
+            }
+        }
+
+        body.innerHTML = '';
+        for (let day = new Date(first); day < end;) {
+            const row = body.insertRow();
+            for (let i = 0; i < 7; i++, day.setDate(day.getDate() + 1)) {
+                const cell = row.insertCell();
+                if (day.getMonth() !== month.getMonth()) {
+                    cell.classList.add('other-month');
+                }
+                if (dayKey(day) === dayKey(new Date())) {
+                    cell.classList.add('today');
+                }
+                const number = document.createElement('span');
+                number.className = 'day-number';
+                number.textContent = day.getDate();
+                cell.appendChild(number);
+                for (const event of byDay[dayKey(day)] || []) {
+                    const link = document.createElement('a');
+                    link.href = event.url;
+                    link.className = `event-type ${event.type}`;
+                    link.textContent = event.title;
+                    link.title = `${event.title} (${event.location})`;
+                    cell.appendChild(link);
+                }
+            }
+        }
+    }
+
+    document.querySelectorAll('[data-calendar-step]').forEach(button => {
+        button.addEventListener('click', () => {
+            month = new Date(month.getFullYear(), month.getMonth() + Number(button.dataset.calendarStep), 1);
+            render();
+        });
+    });
+    typeSelect.addEventListener('change', render);
+
+    // webcal:// opens the feed in the visitor's calendar app as a subscription
+    document.querySelectorAll('[data-subscribe]').forEach(link => {
+        link.href = link.href.replace(/^https?:/, 'webcal:');
+    });
+
+    render();
+})();
@@ -0,0 +1,139 @@
+// Chunked, resumable uploads (see main/uploads.py).
+//
+// Files go up in slices of the size the server asks for. A slice that fails
+// is retried after asking the server how much it already has, so a dropped
+// connection only costs the slice in flight.
+(function () {
+    const script = document.currentScript;
+    const startUrl = script.dataset.uploadUrl;
+    const MAX_RETRIES = 5;
+
+    function csrfToken(form) {
+        const input = (form || document).querySelector('[name=csrfmiddlewaretoken]');
+        return input ? input.value : '';
+    }
+
+    function sleep(ms) {
+        return new Promise(resolve => setTimeout(resolve, ms));
+    }
+
+    async function json(response) {
+        const data = await response.json().catch(() => ({}));
+        if (!response.ok && response.status !== 409) {
+            throw new Error(data.error || `Upload failed (${response.status})`);
+        }
+        return data;
+    }
+
+    async function uploadFile(file, purpose, token, onProgress) {
+        const body = new FormData();
+        body.append('purpose', purpose);
+        body.append('filename', file.name);
+        body.append('size', file.size);
+        let state = await json(await fetch(startUrl, {
+            method: 'POST',
+            headers: { 'X-CSRFToken': token },
+            body: body,
+        }));
+        const chunkUrl = `${startUrl}${state.id}/`;
+
+        let retries = 0;
+        while (!state.complete) {
+            const end = Math.min(state.offset + state.chunk_size, file.size) - 1;
+            try {
+                state = await json(await fetch(chunkUrl, {
+                    method: 'PUT',
+                    headers: {
+                        'X-CSRFToken': token,
+                        'Content-Type': 'application/octet-stream',
+                        'Content-Range': `bytes ${state.offset}-${end}/${file.size}`,
+                    },
+                    body: file.slice(state.offset, end + 1),
+                }));
+                retries = 0;
+            } catch (error) {
+                if (++retries > MAX_RETRIES) {
+                    throw error;
+                }
+                await sleep(1000 * 2 ** retries);
+                state = await json(await fetch(chunkUrl));
+            }
+            if (onProgress) {
+                onProgress(state.offset / file.size);
+            }
+        }
+        return state.id;
+    }
+
+    // A file input marked with data-chunked-upload="<purpose>" is sent in
+    // chunks before its form submits; the upload id goes into the hidden
+    // field named by data-upload-field.
+    function setupFormFields() {
+        document.querySelectorAll('input[type=file][data-chunked-upload]').forEach(input => {
+            const form = input.form;
+            form.addEventListener('submit', async event => {
+                if (!input.files.length) {
+                    return;
+                }
+                event.preventDefault();
+                const button = form.querySelector('[type=submit]');
+                const label = button.textContent;
+                button.disabled = true;
+                try {
+                    const id = await uploadFile(input.files[0], input.dataset.chunkedUpload, csrfToken(form), progress => {
+                        button.textContent = `Uploading… ${Math.round(progress * 100)}%`;
+                    });
+                    form.elements[input.dataset.uploadField].value = id;
+                    input.value = '';
+                    form.submit();
+                } catch (error) {
+                    alert(error.message);
+                    button.disabled = false;
+                    button.textContent = label;
+                }
+            });
+        });
+    }
+
+    // The staff gallery page: every image in the chosen folder, in file name
+    // order, then one request adding them all to the gallery.
+    function setupGalleryUpload() {
+        const form = document.querySelector('[data-gallery-upload]');
+        if (!form) {
+            return;
+        }
+        const input = form.querySelector('input[type=file]');
+        const status = form.querySelector('.upload-status');
+        const token = csrfToken(form);
+
+        form.addEventListener('submit', async event => {
+            event.preventDefault();
+            const files = Array.from(input.files)
+                .filter(file => file.type.startsWith('image/'))
+                .sort((a, b) => (a.webkitRelativePath || a.name).localeCompare(b.webkitRelativePath || b.name));
+            const ids = [];
+            try {
+                for (const [index, file] of files.entries()) {
+                    ids.push(await uploadFile(file, 'gallery_image', token, progress => {
+                        status.textContent = `Uploading ${index + 1} of ${files.length}: ${file.name} (${Math.round(progress * 100)}%)`;
+                    }));
+                }
+                const body = new FormData();
+                ids.forEach(id => body.append('uploads', id));
+                const result = await json(await fetch(form.action, {
+                    method: 'POST',
+                    headers: { 'X-CSRFToken': token },
+                    body: body,
+                }));
+                window.location = result.url;
+            } catch (error) {
+                status.textContent = error.message;
+            }
+        });
+    }
+
+    document.addEventListener('DOMContentLoaded', function () {
+        setupFormFields();
+        setupGalleryUpload();
+    });
+})();
@@ -0,0 +1,39 @@
+from django import template
+from django.utils.html import format_html
+
+from ..images import srcset_candidates
+
+register = template.Library()
+
+
+def _srcset(fieldfile, webp=False):
+    return ', '.join(f'{url} {width}w' for url, width in srcset_candidates(fieldfile, webp=webp))
+
+
+@register.simple_tag
+def srcset(fieldfile, webp=False):
+    """
+    ``{% srcset gallery.cover_image %}`` -> ``"/media/...320w.jpg 320w, ..."``
+    """
+    return _srcset(fieldfile, webp=webp)
+
+
+@register.simple_tag
+def responsive_image(fieldfile, alt='', sizes='100vw', css_class=''):
+    """
+    Render ``fieldfile`` as a ``<picture>`` offering the WebP derivatives,
+    then the same-format derivatives, falling back to the original.
+    """
+    if not fieldfile:
+        return ''
+    webp_srcset = _srcset(fieldfile, webp=True)
+    img_srcset = _srcset(fieldfile)
+    source = format_html(
+        '<source type="image/webp" srcset="{}" sizes="{}">', webp_srcset, sizes
+    ) if webp_srcset else ''
+    srcset_attrs = format_html(' srcset="{}" sizes="{}"', img_srcset, sizes) if img_srcset else ''
+    class_attr = format_html(' class="{}"', css_class) if css_class else ''
+    return format_html(
+        '<picture>{}<img src="{}"{} alt="{}"{} loading="lazy"></picture>',
+        source, fieldfile.url, srcset_attrs, alt, class_attr,
+    )
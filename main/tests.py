@@ -1,3 +1,1550 @@
-from django.test import TestCase
+import asyncio
+import csv
+import importlib
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import Permission, User
+from django.core import mail
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.migrations.loader import MigrationLoader
+from django.template import Context, Template
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import clear_url_caches, resolve, reverse
+from django.utils import timezone
+
+from openpyxl import load_workbook
+from PIL import Image as PILImage
+from prometheus_client import REGISTRY
+
+from . import calendars, metrics, urls as main_urls
+from .cache import get_school_info
+from .checks import check_shared_cache
+from .images import derivative_name, existing_derivatives, generate_derivatives, srcset_candidates
+from .models import (
+    OTP, Admission, Announcement, ChunkedUpload, ContactMessage, Event, Gallery, GalleryImage, News,
+    Notice, NotificationJob, Parent, SchoolInfo, SearchDocument, Staff, Student,
+)
+from .imports import IMPORTERS, import_csv
+from .instrumentation import request_stats, reset_request_stats
+from .notifications import (
+    LocMemBackend, Message, ProviderBackend, enqueue_announcement, process_jobs, send_otp,
+)
+from .pagecache import page_cache_counters
+from .queryaudit import HOT_QUERIES
+from .ratelimit import ratelimit_counters, take_token
+from .search import SearchResults
+from .uploads import append_chunk
+
+
+def create_school_info(**kwargs):
+    defaults = {
+        'name': 'Test School',
+        'address': 'Kathmandu',
+        'phone': '0123456789',
+        'email': 'info@example.com',
+        'logo': 'school/logo/logo.png',
+        'established_date': date(2000, 1, 1),
+    }
+    defaults.update(kwargs)
+    return SchoolInfo.objects.create(**defaults)
+
+
+class SchoolInfoCacheTests(TestCase):
+    def setUp(self):
+        caches['default'].clear()
+        self.school_info = create_school_info()
+
+    def schoolinfo_queries(self, queries):
+        table = SchoolInfo._meta.db_table
+        return [q['sql'] for q in queries if table in q['sql']]
+
+    def test_warm_cache_page_render_makes_no_school_info_queries(self):
+        self.client.get(reverse('mission'))
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('mission'))
+        self.assertContains(response, 'Test School')
+        self.assertEqual(self.schoolinfo_queries(ctx.captured_queries), [])
+
+    def test_save_invalidates_cache(self):
+        get_school_info()
+        self.school_info.name = 'Renamed School'
+        self.school_info.save()
+        self.assertEqual(get_school_info().name, 'Renamed School')
+
+    def test_delete_invalidates_cache(self):
+        get_school_info()
+        self.school_info.delete()
+        self.assertIsNone(get_school_info())
+
+    def test_per_process_cache_is_refused_without_debug(self):
+        locmem = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+        with override_settings(DEBUG=False, CACHES=locmem):
+            self.assertEqual([e.id for e in check_shared_cache(None)], ['main.E001'])
+        with override_settings(DEBUG=True, CACHES=locmem):
+            self.assertEqual(check_shared_cache(None), [])
+        self.assertEqual(check_shared_cache(None), [])
+
+
+@override_settings(LIST_PAGINATION_MODE='keyset')
+class KeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_school_info()
+        author = User.objects.create(username='author')
+        cls.announcements = [
+            Announcement.objects.create(title=f'Announcement {i}', content='...', author=author)
+            for i in range(25)
+        ]
+
+    def titles(self, response):
+        return [a.title for a in response.context['announcements']]
+
+    def test_walks_forward_and_back_without_count(self):
+        expected = [a.title for a in reversed(self.announcements)]
+        with CaptureQueriesContext(connection) as ctx:
+            first = self.client.get(reverse('announcements'))
+        self.assertFalse(any('COUNT(*)' in q['sql'] for q in ctx.captured_queries))
+        self.assertEqual(self.titles(first), expected[:10])
+        self.assertFalse(first.context['page_obj'].has_previous())
+
+        second = self.client.get(reverse('announcements'), {'cursor': first.context['page_obj'].next_cursor})
+        third = self.client.get(reverse('announcements'), {'cursor': second.context['page_obj'].next_cursor})
+        self.assertEqual(self.titles(second), expected[10:20])
+        self.assertEqual(self.titles(third), expected[20:])
+        self.assertFalse(third.context['page_obj'].has_next())
+
+        back = self.client.get(reverse('announcements'), {'cursor': third.context['page_obj'].previous_cursor})
+        self.assertEqual(self.titles(back), expected[10:20])
+        self.assertTrue(back.context['page_obj'].has_next())
+
+    def test_invalid_cursor_is_404(self):
+        response = self.client.get(reverse('announcements'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 404)
+
+
+class GalleryQueryCountTests(TestCase):
+    def setUp(self):
+        caches['default'].clear()
+        create_school_info()
+        get_school_info()
+
+    def create_gallery(self, images=0, **kwargs):
+        event = Event.objects.create(
+            title='Sports Day', description='...', location='Ground', event_type='sports',
+            start_date=timezone.now(), end_date=timezone.now(),
+        )
+        gallery = Gallery.objects.create(
+            title='Sports Day', cover_image='gallery/covers/cover.jpg', event=event, **kwargs
+        )
+        GalleryImage.objects.bulk_create(
+            GalleryImage(gallery=gallery, image=f'gallery/images/{i}.jpg', order=i)
+            for i in range(images)
+        )
+        return gallery
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_list_query_count_is_constant(self):
+        self.create_gallery(images=1)
+        # Freshness aggregates for Gallery, GalleryImage and Event, the
+        # paginator COUNT and one annotated, joined page query
+        self.assertEqual(self.count_queries(reverse('gallery')), 5)
+        for _ in range(11):
+            self.create_gallery(images=5)
+        self.assertEqual(self.count_queries(reverse('gallery')), 5)
+
+    def test_detail_query_count_is_constant(self):
+        small = self.create_gallery(images=1)
+        large = self.create_gallery(images=50)
+        # Freshness aggregates (3, cached after the first request), then the
+        # gallery with its event, prefetched images and related galleries
+        self.assertEqual(self.count_queries(reverse('gallery-detail', args=[small.pk])), 6)
+        self.assertEqual(self.count_queries(reverse('gallery-detail', args=[large.pk])), 3)
+
+    def test_list_shows_image_count(self):
+        self.create_gallery(images=3)
+        response = self.client.get(reverse('gallery'))
+        self.assertEqual(response.context['galleries'][0].image_count, 3)
+
+
+class ImageDerivativeTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        override = override_settings(MEDIA_ROOT=media_root, IMAGE_DERIVATIVE_WIDTHS=[100, 200, 800])
+        override.enable()
+        self.addCleanup(override.disable)
+        self.media_root = media_root
+        caches['default'].clear()
+
+    def upload(self, width=400, height=300):
+        buffer = io.BytesIO()
+        PILImage.new('RGB', (width, height), 'red').save(buffer, 'JPEG')
+        return SimpleUploadedFile('photo.jpg', buffer.getvalue(), content_type='image/jpeg')
+
+    def create_gallery(self):
+        return Gallery.objects.create(title='Album', cover_image=self.upload())
+
+    def test_upload_generates_narrower_widths_and_webp(self):
+        gallery = self.create_gallery()
+        name = gallery.cover_image.name
+        storage = gallery.cover_image.storage
+        for width in (100, 200):
+            self.assertTrue(storage.exists(derivative_name(name, width)))
+            self.assertTrue(storage.exists(derivative_name(name, width, webp=True)))
+        # Never upscale past the original
+        self.assertFalse(storage.exists(derivative_name(name, 800)))
+        with storage.open(derivative_name(name, 200)) as f, PILImage.open(f) as image:
+            self.assertEqual(image.size, (200, 150))
+
+    def test_template_tag_renders_srcset(self):
+        gallery = self.create_gallery()
+        html = Template(
+            '{% load responsive_images %}{% responsive_image gallery.cover_image alt="Album" %}'
+        ).render(Context({'gallery': gallery}))
+        self.assertIn('type="image/webp"', html)
+        self.assertIn('.200w.webp 200w', html)
+        self.assertIn('.100w.jpg 100w', html)
+        self.assertIn(f'src="{gallery.cover_image.url}"', html)
+
+    def test_srcset_does_not_ask_the_storage(self):
+        gallery = self.create_gallery()
+        storage_class = type(gallery.cover_image.storage._wrapped)
+        with mock.patch.object(storage_class, 'exists') as exists:
+            candidates = srcset_candidates(gallery.cover_image, webp=True)
+        exists.assert_not_called()
+        self.assertEqual([width for _, width in candidates], [100, 200])
+
+        # Known again from the storage once forgotten, then remembered
+        caches['default'].clear()
+        self.assertEqual(len(srcset_candidates(gallery.cover_image)), 2)
+        with mock.patch.object(storage_class, 'exists') as exists:
+            srcset_candidates(gallery.cover_image)
+        exists.assert_not_called()
+
+    def test_saves_that_keep_the_image_do_not_decode_it(self):
+        gallery = self.create_gallery()
+        gallery.title = 'Renamed'
+        with mock.patch('main.images.Image.open') as image_open:
+            gallery.save()
+        image_open.assert_not_called()
+
+        # With the cache gone, only the header is read to see nothing is missing
+        caches['default'].clear()
+        with mock.patch('main.images.ImageOps.exif_transpose') as transpose:
+            self.assertEqual(generate_derivatives(gallery.cover_image), [])
+        transpose.assert_not_called()
+
+    def test_deleting_upload_removes_derivatives(self):
+        gallery = self.create_gallery()
+        name = gallery.cover_image.name
+        storage = gallery.cover_image.storage
+        with self.captureOnCommitCallbacks(execute=True):
+            gallery.delete()
+        self.assertFalse(storage.exists(name))
+        self.assertFalse(storage.exists(derivative_name(name, 100, webp=True)))
+        self.assertEqual(existing_derivatives(gallery.cover_image), set())
+
+    def test_backfill_command(self):
+        gallery = self.create_gallery()
+        name = gallery.cover_image.name
+        storage = gallery.cover_image.storage
+        storage.delete(derivative_name(name, 100))
+        call_command('backfill_image_derivatives', stdout=io.StringIO())
+        self.assertTrue(storage.exists(derivative_name(name, 100)))
+        self.assertIn(derivative_name(name, 100), existing_derivatives(gallery.cover_image))
+
+
+@override_settings(MEDIA_SENDFILE='', MEDIA_CACHE_MAX_AGE=3600)
+class MediaServingTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        override = override_settings(MEDIA_ROOT=media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.media_root = media_root
+        self.write('gallery/images/photo.jpg', bytes(range(256)) * 4)
+        self.write('id_documents/passport.pdf', b'%PDF-1.4 secret')
+
+    def write(self, name, content):
+        path = os.path.join(self.media_root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(content)
+
+    def get(self, name, **headers):
+        response = self.client.get(f'/media/{name}', headers=headers)
+        if response.streaming:
+            response.content_bytes = b''.join(response.streaming_content)
+            response.close()
+        return response
+
+    def test_serves_whole_file(self):
+        response = self.get('gallery/images/photo.jpg')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content_bytes, bytes(range(256)) * 4)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=3600')
+        self.assertIn('Last-Modified', response)
+
+    def test_range_requests(self):
+        response = self.get('gallery/images/photo.jpg', Range='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.content_bytes, bytes(range(10, 20)))
+        self.assertEqual(response['Content-Range'], 'bytes 10-19/1024')
+        self.assertEqual(response['Content-Length'], '10')
+
+        response = self.get('gallery/images/photo.jpg', Range='bytes=-4')
+        self.assertEqual(response.content_bytes, bytes(range(252, 256)))
+
+        response = self.get('gallery/images/photo.jpg', Range='bytes=5000-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */1024')
+
+    def test_if_modified_since(self):
+        last_modified = self.get('gallery/images/photo.jpg')['Last-Modified']
+        response = self.get('gallery/images/photo.jpg', If_Modified_Since=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+    def test_hash_like_names_are_not_immutable(self):
+        # Upload names are the uploader's, so a hex-looking one proves nothing
+        self.write('gallery/images/photo.3f2a9c1b7d4e.jpg', b'x')
+        response = self.get('gallery/images/photo.3f2a9c1b7d4e.jpg')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=3600')
+
+    def test_missing_and_traversal_paths_404(self):
+        self.assertEqual(self.get('gallery/images/nope.jpg').status_code, 404)
+        self.assertEqual(self.get('../settings.py').status_code, 404)
+
+    def test_private_documents_need_owner_or_staff(self):
+        owner = User.objects.create_user('owner', password='pw')
+        User.objects.create_user('other', password='pw')
+        User.objects.create_user('admin', password='pw', is_staff=True)
+        Student.objects.create(
+            user=owner, first_name='A', last_name='B', date_of_birth=date(2010, 1, 1),
+            phone_number='1', address='x', city='x', zip_code='1', student_id='S1',
+            faculty='science', department='physics', enrollment_date=date(2024, 1, 1),
+            id_document='id_documents/passport.pdf',
+        )
+        self.assertEqual(self.get('id_documents/passport.pdf').status_code, 404)
+        for username, status in (('other', 404), ('owner', 200), ('admin', 200)):
+            self.client.login(username=username, password='pw')
+            response = self.get('id_documents/passport.pdf')
+            self.assertEqual(response.status_code, status, username)
+        self.assertEqual(response['Cache-Control'], 'private, no-cache')
+
+    def test_private_check_sees_the_resolved_path(self):
+        for name in ('./id_documents/passport.pdf', 'gallery/../id_documents/passport.pdf',
+                     '%2E/id_documents/passport.pdf', 'id_documents//passport.pdf'):
+            self.assertEqual(self.get(name).status_code, 404, name)
+        User.objects.create_user('admin', password='pw', is_staff=True)
+        self.client.login(username='admin', password='pw')
+        response = self.get('gallery/../id_documents/passport.pdf')
+        self.assertEqual(response['Cache-Control'], 'private, no-cache')
+
+    @override_settings(MEDIA_SENDFILE='x-accel-redirect', MEDIA_ACCEL_PREFIX='/protected-media/')
+    def test_accel_redirect_offload(self):
+        response = self.get('gallery/images/photo.jpg')
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/gallery/images/photo.jpg')
+        self.assertEqual(response.content, b'')
+
+
+@override_settings(CHUNKED_UPLOAD_MAX_CHUNK=1000, IMAGE_DERIVATIVE_WIDTHS=[100])
+class ChunkedUploadTests(TestCase):
+    def setUp(self):
+        caches['default'].clear()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        override = override_settings(MEDIA_ROOT=media_root, CHUNKED_UPLOAD_DIR=os.path.join(media_root, 'partial'))
+        override.enable()
+        self.addCleanup(override.disable)
+        self.media_root = media_root
+
+    def start(self, filename, size, purpose='admission_document'):
+        return self.client.post(reverse('upload-start'), {'purpose': purpose, 'filename': filename, 'size': size})
+
+    def put(self, upload_id, content, start, total):
+        return self.client.put(
+            reverse('upload-chunk', args=[upload_id]), content, content_type='application/octet-stream',
+            headers={'Content-Range': f'bytes {start}-{start + len(content) - 1}/{total}'},
+        )
+
+    def upload(self, filename, content, purpose='admission_document'):
+        upload_id = self.start(filename, len(content), purpose).json()['id']
+        for start in range(0, len(content), 1000):
+            response = self.put(upload_id, content[start:start + 1000], start, len(content))
+        self.assertTrue(response.json()['complete'])
+        return upload_id
+
+    def jpeg(self, color):
+        buffer = io.BytesIO()
+        PILImage.new('RGB', (300, 200), color).save(buffer, 'JPEG')
+        return buffer.getvalue()
+
+    def test_resumable_upload_is_assembled_into_storage(self):
+        content = os.urandom(2500)
+        response = self.start('report card.pdf', len(content))
+        self.assertEqual(response.status_code, 201)
+        upload_id = response.json()['id']
+
+        self.assertEqual(self.put(upload_id, content[:1000], 0, 2500).json()['offset'], 1000)
+        # A chunk past what has arrived is refused with the offset to resume from
+        response = self.put(upload_id, content[2000:], 2000, 2500)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['offset'], 1000)
+        self.assertEqual(self.client.get(reverse('upload-chunk', args=[upload_id])).json()['offset'], 1000)
+
+        self.put(upload_id, content[1000:2000], 1000, 2500)
+        response = self.put(upload_id, content[2000:], 2000, 2500)
+        self.assertTrue(response.json()['complete'])
+
+        upload = ChunkedUpload.objects.get(pk=upload_id)
+        self.assertEqual(upload.stored_name, 'admission_documents/report_card.pdf')
+        with open(os.path.join(self.media_root, upload.stored_name), 'rb') as f:
+            self.assertEqual(f.read(), content)
+        self.assertEqual(os.listdir(os.path.join(self.media_root, 'partial')), [])
+
+    def test_long_names_are_shortened_to_fit_the_field(self):
+        upload_id = self.upload('r' * 196 + '.pdf', b'%PDF-1.4')
+        stored_name = ChunkedUpload.objects.get(pk=upload_id).stored_name
+        self.assertLessEqual(len(stored_name), Admission._meta.get_field('previous_report_card').max_length)
+        self.assertTrue(stored_name.startswith('admission_documents/rrr') and stored_name.endswith('.pdf'))
+        self.assertEqual(self.start('r' * 300 + '.pdf', 10).status_code, 400)
+
+    def test_chunk_is_read_before_the_row_is_locked(self):
+        upload = ChunkedUpload.objects.get(pk=self.start('scan.pdf', 10).json()['id'])
+        # The test's own transactions are savepoints too; count any deeper ones
+        depth = len(connection.savepoint_ids)
+        depths = []
+
+        class Stream(io.BytesIO):
+            def read(self, size=-1):
+                depths.append(len(connection.savepoint_ids))
+                return super().read(size)
+
+        with mock.patch('main.uploads.CHUNK_SIZE', 4):
+            upload = append_chunk(upload, Stream(b'0123456789'), 'bytes 0-9/10')
+        self.assertEqual(upload.status, 'complete')
+        self.assertEqual(depths, [depth] * 3)
+
+    def test_rejects_oversized_chunks_and_wrong_types(self):
+        upload_id = self.start('scan.pdf', 5000).json()['id']
+        self.assertEqual(self.put(upload_id, b'x' * 1001, 0, 5000).status_code, 413)
+        self.assertEqual(self.start('script.exe', 10).status_code, 400)
+        self.assertEqual(self.start('photo.jpg', 10, purpose='gallery_image').status_code, 403)
+
+    def test_admission_with_chunked_report_card(self):
+        upload_id = self.upload('card.pdf', b'%PDF-1.4 report card')
+        response = self.client.post(reverse('admissions'), {
+            'applicant_name': 'Sita', 'date_of_birth': '2015-05-01', 'applying_for_grade': '3',
+            'previous_school': 'Elsewhere', 'parent_guardian_name': 'Ram',
+            'contact_email': 'ram@example.com', 'contact_phone': '9800000000',
+            'report_card_upload': upload_id,
+        })
+        self.assertRedirects(response, reverse('admission-success'), fetch_redirect_response=False)
+        self.assertEqual(Admission.objects.get().previous_report_card.name, 'admission_documents/card.pdf')
+        self.assertFalse(ChunkedUpload.objects.exists())
+
+    def test_only_the_uploader_can_use_an_upload(self):
+        upload_id = self.upload('card.pdf', b'%PDF-1.4 report card')
+        self.client = self.client_class()
+        self.assertEqual(self.client.get(reverse('upload-chunk', args=[upload_id])).status_code, 404)
+        response = self.client.post(reverse('admissions'), {
+            'applicant_name': 'Hari', 'date_of_birth': '2015-05-01', 'applying_for_grade': '3',
+            'previous_school': 'Elsewhere', 'parent_guardian_name': 'Gita',
+            'contact_email': 'gita@example.com', 'contact_phone': '9800000000',
+            'report_card_upload': upload_id,
+        })
+        self.assertContains(response, 'The uploaded report card could not be found.')
+        self.assertFalse(Admission.objects.exists())
+
+    def test_folder_upload_appends_images_in_order(self):
+        staff = User.objects.create_user('staff', password='pw', is_staff=True)
+        self.client.force_login(staff)
+        gallery = Gallery.objects.create(title='Sports day', cover_image='gallery/covers/c.jpg')
+        GalleryImage.objects.create(gallery=gallery, image='gallery/images/old.jpg', order=4)
+        first = self.upload('b.jpg', self.jpeg('red'), purpose='gallery_image')
+        second = self.upload('a.jpg', self.jpeg('blue'), purpose='gallery_image')
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('gallery-upload', args=[gallery.pk]), {'uploads': [first, second]})
+        self.assertEqual(response.json()['created'], 2)
+        inserts = [q['sql'] for q in queries.captured_queries if q['sql'].startswith('INSERT')]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(
+            list(gallery.images.values_list('image', 'order')),
+            [('gallery/images/old.jpg', 4), ('gallery/images/b.jpg', 5), ('gallery/images/a.jpg', 6)],
+        )
+        self.assertTrue(os.path.exists(os.path.join(self.media_root, 'gallery/images/a.100w.webp')))
+        self.assertFalse(ChunkedUpload.objects.exists())
+
+    def test_import_gallery_folder_command(self):
+        gallery = Gallery.objects.create(title='Trip', cover_image='gallery/covers/c.jpg')
+        folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, folder)
+        for name in ('2.jpg', '1.jpg', 'notes.txt'):
+            with open(os.path.join(folder, name), 'wb') as f:
+                f.write(self.jpeg('green'))
+        call_command('import_gallery_folder', gallery.pk, folder, stdout=io.StringIO())
+        self.assertEqual(
+            list(gallery.images.values_list('image', 'order')),
+            [('gallery/images/1.jpg', 0), ('gallery/images/2.jpg', 1)],
+        )
+
+
+@override_settings(
+    NOTIFICATION_BACKEND='main.notifications.LocMemBackend',
+    NOTIFICATION_MAX_ATTEMPTS=3,
+    NOTIFICATION_RETRY_BACKOFF=30,
+)
+class NotificationQueueTests(TestCase):
+    def setUp(self):
+        caches['default'].clear()
+        create_school_info()
+        LocMemBackend.outbox = []
+        LocMemBackend.failing_recipients = set()
+
+    def start_registration(self, email='parent@example.com', phone='+9779800000000'):
+        session = self.client.session
+        session['registration_email'] = email
+        session['registration_phone'] = phone
+        session.save()
+
+    def test_resend_otp_only_enqueues(self):
+        self.start_registration()
+        self.client.get(reverse('resend_otp'))
+        self.assertEqual(LocMemBackend.outbox, [])
+        self.assertEqual(
+            sorted(NotificationJob.objects.values_list('channel', flat=True)),
+            ['email', 'sms', 'whatsapp'],
+        )
+
+    def test_worker_delivers_queued_jobs(self):
+        self.start_registration()
+        self.client.get(reverse('resend_otp'))
+        call_command('run_notification_worker', once=True, stdout=io.StringIO())
+        otp = OTP.objects.get()
+        self.assertEqual(len(LocMemBackend.outbox), 3)
+        self.assertTrue(all(otp.otp_code in m['body'] for m in LocMemBackend.outbox))
+        self.assertFalse(NotificationJob.objects.exclude(status='sent').exists())
+
+    def test_failed_job_backs_off_then_gives_up(self):
+        LocMemBackend.failing_recipients = {'+9779800000000'}
+        job = NotificationJob.objects.create(channel='sms', recipient='+9779800000000', body='123456')
+
+        self.assertEqual(process_jobs(), (0, 1))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('pending', 1))
+        self.assertGreater(job.available_at, timezone.now() + timedelta(seconds=25))
+        # Not due yet, so the next poll leaves it alone
+        self.assertEqual(process_jobs(), (0, 0))
+
+        with self.assertLogs('main.notifications', 'ERROR'):
+            for attempt in (2, 3):
+                NotificationJob.objects.filter(pk=job.pk).update(available_at=timezone.now())
+                process_jobs()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('failed', 3))
+        self.assertIn('failed', job.last_error)
+
+    @override_settings(OTP_DELIVERY='inline')
+    def test_inline_delivery_sends_channels_concurrently(self):
+        self.start_registration()
+        with mock.patch.object(LocMemBackend, 'latency', 0.3):
+            start = time.perf_counter()
+            response = self.client.get(reverse('resend_otp'))
+            elapsed = time.perf_counter() - start
+        self.assertLess(elapsed, 0.6)
+        self.assertEqual(sorted(m['channel'] for m in LocMemBackend.outbox), ['email', 'sms', 'whatsapp'])
+        self.assertFalse(NotificationJob.objects.exists())
+        self.assertNotContains(response, 'OTP failed')
+
+    @override_settings(OTP_DELIVERY='inline', OTP_SEND_TIMEOUT=0.2)
+    def test_inline_delivery_reports_failed_and_slow_channels(self):
+        LocMemBackend.failing_recipients = {'+9779800000000'}
+        self.start_registration()
+        with mock.patch.object(LocMemBackend, 'latency', 0.1), self.assertLogs('main.notifications', 'WARNING'):
+            response = self.client.get(reverse('resend_otp'))
+        self.assertContains(response, 'WhatsApp OTP failed: Delivery to +9779800000000 failed')
+        self.assertContains(response, 'SMS OTP failed')
+        self.assertNotContains(response, 'Email OTP failed')
+
+        self.start_registration(phone=None)
+        with mock.patch.object(LocMemBackend, 'latency', 0.4), self.assertLogs('main.notifications', 'WARNING'):
+            response = self.client.get(reverse('resend_otp'))
+            self.assertContains(response, 'Email OTP failed: No answer after 0.2 seconds')
+            # Let the abandoned send finish before the next test
+            time.sleep(0.3)
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class ProviderBackendTests(TestCase):
+    def test_email_batch_reuses_one_connection(self):
+        backend = ProviderBackend()
+        messages = [Message('email', f'parent{i}@example.com', 'Notice', 'Hello') for i in range(5)]
+        self.assertEqual(backend.send_many(messages), [None] * 5)
+        self.assertEqual(len(mail.outbox), 5)
+        connection = backend._smtp
+        backend.send('email', 'late@example.com', 'Notice', 'Hello')
+        self.assertIs(backend._smtp, connection)
+
+    @override_settings(
+        EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend', EMAIL_HOST='127.0.0.1', EMAIL_PORT=1,
+        EMAIL_USE_TLS=False, EMAIL_USE_SSL=False,
+        NOTIFICATION_BACKEND='main.notifications.ProviderBackend',
+    )
+    def test_unreachable_smtp_fails_the_emails_not_the_worker(self):
+        email = NotificationJob.objects.create(channel='email', recipient='parent@example.com', body='Hello')
+        sms = NotificationJob.objects.create(channel='sms', recipient='+9779800000000', body='123456')
+        with mock.patch.object(ProviderBackend, 'twilio') as twilio:
+            self.assertEqual(process_jobs(), (1, 1))
+        twilio.messages.create.assert_called_once()
+        email.refresh_from_db()
+        sms.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), ('pending', 1))
+        self.assertIn('refused', email.last_error.lower())
+        self.assertEqual(sms.status, 'sent')
+
+    def test_worker_records_jobs_when_the_backend_raises(self):
+        job = NotificationJob.objects.create(channel='sms', recipient='+9779800000000', body='123456')
+        backend = LocMemBackend()
+        with mock.patch.object(backend, 'send_many', side_effect=RuntimeError('boom')), \
+                self.assertLogs('main.notifications', 'ERROR'):
+            self.assertEqual(process_jobs(backend=backend), (0, 1))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.last_error), ('pending', 1, 'boom'))
+
+    def test_announcement_broadcast_is_queued_per_parent(self):
+        author = User.objects.create(username='author')
+        for i in range(3):
+            Parent.objects.create(
+                user=author, first_name='P', last_name=str(i), phone='1',
+                email=f'parent{i}@example.com', address='...',
+            )
+        announcement = Announcement.objects.create(
+            title='Holiday', content='School closed', author=author, target_audience='parents'
+        )
+        self.assertEqual(len(enqueue_announcement(announcement)), 3)
+        sent = REGISTRY.get_sample_value(
+            'school_notification_sends_total', {'kind': 'announcement', 'channel': 'email', 'outcome': 'sent'},
+        ) or 0
+        with override_settings(NOTIFICATION_BACKEND='main.notifications.ProviderBackend'):
+            self.assertEqual(process_jobs(), (3, 0))
+        self.assertEqual(REGISTRY.get_sample_value(
+            'school_notification_sends_total', {'kind': 'announcement', 'channel': 'email', 'outcome': 'sent'},
+        ), sent + 3)
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox), [f'parent{i}@example.com' for i in range(3)])
+
+
+class OTPTests(TestCase):
+    def setUp(self):
+        caches['default'].clear()
+        caches['ratelimit'].clear()
+        create_school_info()
+        session = self.client.session
+        session['registration_email'] = 'parent@example.com'
+        session['registration_phone'] = None
+        session.save()
+
+    def create_otp(self, age=timedelta(0), **kwargs):
+        otp = OTP.generate_otp(email='parent@example.com')
+        OTP.objects.filter(pk=otp.pk).update(created_at=timezone.now() - age, **kwargs)
+        otp.refresh_from_db()
+        return otp
+
+    def verify(self, code):
+        return self.client.post(reverse('parent_register'), {'verify_otp': '1', 'otp_code': code})
+
+    def test_expired_code_is_rejected(self):
+        otp = self.create_otp(age=timedelta(minutes=11))
+        response = self.verify(otp.otp_code)
+        self.assertContains(response, 'OTP has expired')
+        otp.refresh_from_db()
+        self.assertFalse(otp.is_verified)
+
+    def test_unknown_code_is_rejected(self):
+        self.create_otp()
+        self.assertContains(self.verify('000000x'), 'Invalid OTP code')
+
+    def test_fresh_code_is_verified(self):
+        otp = self.create_otp()
+        self.verify(otp.otp_code)
+        otp.refresh_from_db()
+        self.assertTrue(otp.is_verified)
+
+    def test_sweeper_deletes_expired_and_verified_in_batches(self):
+        fresh = self.create_otp()
+        for _ in range(5):
+            self.create_otp(age=timedelta(minutes=30))
+        self.create_otp(is_verified=True)
+        out = io.StringIO()
+        call_command('sweep_otps', batch_size=2, stdout=out)
+        self.assertEqual(list(OTP.objects.values_list('pk', flat=True)), [fresh.pk])
+        self.assertIn('Deleted 1 verified and 5 expired', out.getvalue())
+
+
+@override_settings(RATELIMITS={'otp': '2/m', 'contact': '3/h'})
+class RateLimitTests(TestCase):
+    def setUp(self):
+        caches['default'].clear()
+        caches['ratelimit'].clear()
+        create_school_info()
+
+    def post_contact(self, email='visitor@example.com', ip='10.0.0.1'):
+        # Left incomplete so the form re-renders; throttling applies either way.
+        return self.client.post(
+            reverse('contact'), {'name': 'Visitor', 'email': email}, REMOTE_ADDR=ip,
+        )
+
+    def test_blocks_after_burst_without_touching_the_database(self):
+        for _ in range(3):
+            self.post_contact()
+        with self.assertNumQueries(0), self.assertLogs('main.ratelimit', 'WARNING'):
+            response = self.post_contact()
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+        self.assertEqual(ratelimit_counters('contact'), {'allowed': 3, 'blocked': 1})
+
+    def test_email_bucket_applies_across_ips(self):
+        for i in range(3):
+            self.post_contact(ip=f'10.0.0.{i}')
+        with self.assertLogs('main.ratelimit', 'WARNING'):
+            self.assertEqual(self.post_contact(ip='10.0.0.99').status_code, 429)
+        self.assertNotEqual(self.post_contact(email='other@example.com', ip='10.0.0.98').status_code, 429)
+
+    def test_resend_otp_is_throttled(self):
+        with self.assertLogs('main.ratelimit', 'WARNING'):
+            statuses = [self.client.get(reverse('resend_otp')).status_code for _ in range(3)]
+        self.assertEqual(statuses, [200, 200, 429])
+
+    def test_tokens_refill_over_time(self):
+        with mock.patch('main.ratelimit.time.time', return_value=1000.0):
+            self.assertEqual(take_token('bucket', 2, 60), (True, 0))
+            self.assertEqual(take_token('bucket', 2, 60), (True, 0))
+            self.assertFalse(take_token('bucket', 2, 60)[0])
+        with mock.patch('main.ratelimit.time.time', return_value=1031.0):
+            self.assertTrue(take_token('bucket', 2, 60)[0])
+
+
+class BaseFragmentCacheTests(TestCase):
+    def setUp(self):
+        caches['default'].clear()
+        self.school_info = create_school_info()
+
+    def test_school_info_change_refreshes_cached_chrome(self):
+        self.assertContains(self.client.get(reverse('mission')), '<h1>Test School</h1>')
+        self.school_info.name = 'Renamed School'
+        self.school_info.save()
+        response = self.client.get(reverse('mission'))
+        self.assertContains(response, '<h1>Renamed School</h1>')
+        self.assertNotContains(response, 'Test School')
+
+    def test_auth_links_are_not_cached(self):
+        self.assertContains(self.client.get(reverse('mission')), 'Register</a>')
+        self.client.force_login(User.objects.create(username='parent'))
+        response = self.client.get(reverse('mission'))
+        self.assertContains(response, 'My Account')
+        self.assertNotContains(response, 'Register</a>')
+
+
+class AnonymousPageCacheTests(TestCase):
+    def setUp(self):
+        caches['default'].clear()
+        create_school_info()
+        self.author = Staff.objects.create(
+            first_name='Ram', last_name='Sharma', photo='staff/photos/ram.jpg',
+            position='Teacher', department='teaching', join_date=date(2020, 1, 1),
+        )
+
+    def create_news(self, title):
+        return News.objects.create(title=title, content='...', author=self.author, featured_image='news/n.jpg')
+
+    def test_second_anonymous_request_is_served_from_cache(self):
+        self.create_news('Sports week')
+        first = self.client.get(reverse('news'))
+        self.assertEqual(first['X-Page-Cache'], 'miss')
+        with self.assertNumQueries(0):
+            second = self.client.get(reverse('news'))
+        self.assertEqual(second['X-Page-Cache'], 'hit')
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(page_cache_counters(), {'hit': 1, 'miss': 1, 'bypass': 0})
+
+    def test_saving_a_dependency_purges_only_dependent_pages(self):
+        self.client.get(reverse('news'))
+        self.client.get(reverse('mission'))
+        self.create_news('Science fair')
+        response = self.client.get(reverse('news'))
+        self.assertEqual(response['X-Page-Cache'], 'miss')
+        self.assertContains(response, 'Science fair')
+        self.assertEqual(self.client.get(reverse('mission'))['X-Page-Cache'], 'hit')
+
+    def test_only_parameters_the_view_reads_key_the_cache(self):
+        url = reverse('news')
+        # Other parameters neither get their own entry nor are stored
+        self.assertEqual(self.client.get(url, {'x': 1})['X-Page-Cache'], 'miss')
+        self.assertEqual(self.client.get(url, {'x': 2})['X-Page-Cache'], 'miss')
+        self.assertEqual(self.client.get(url)['X-Page-Cache'], 'miss')
+        self.assertEqual(self.client.get(url, {'x': 3})['X-Page-Cache'], 'hit')
+        self.assertEqual(self.client.get(url, {'page': 1})['X-Page-Cache'], 'miss')
+
+    def test_authenticated_users_bypass_the_cache(self):
+        self.client.get(reverse('news'))
+        self.client.force_login(User.objects.create(username='parent'))
+        response = self.client.get(reverse('news'))
+        self.assertNotIn('X-Page-Cache', response)
+        self.assertContains(response, 'My Account')
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        caches['default'].clear()
+        create_school_info()
+        self.author = User.objects.create(username='author')
+        self.announcement = Announcement.objects.create(title='Exams', content='...', author=self.author)
+
+    def test_unchanged_detail_returns_304_without_rendering(self):
+        url = reverse('announcement-detail', args=[self.announcement.pk])
+        first = self.client.get(url)
+        self.assertIn('ETag', first)
+        # A date can't cover deletions or logins, so there's only the ETag
+        self.assertNotIn('Last-Modified', first)
+        with self.assertTemplateNotUsed('announcements/detail.html'):
+            second = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(second.status_code, 304)
+
+    def test_edit_and_delete_change_the_etag(self):
+        url = reverse('announcements')
+        etag = self.client.get(url)['ETag']
+        self.announcement.title = 'Exams postponed'
+        self.announcement.save()
+        edited = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(edited.status_code, 200)
+        Announcement.objects.create(title='Holiday', content='...', author=self.author)
+        self.announcement.delete()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=edited['ETag']).status_code, 200)
+
+    def test_detail_etag_covers_the_author(self):
+        staff = Staff.objects.create(
+            user=self.author, first_name='Ram', last_name='Sharma', photo='staff/photos/ram.jpg',
+            position='Teacher', department='teaching', join_date=date(2020, 1, 1),
+        )
+        url = reverse('announcement-detail', args=[self.announcement.pk])
+        etag = self.client.get(url)['ETag']
+        staff.position = 'Principal'
+        staff.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Principal')
+
+    def test_etag_differs_for_signed_in_users(self):
+        url = reverse('announcements')
+        etag = self.client.get(url)['ETag']
+        self.client.force_login(self.author)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class CalendarTests(TestCase):
+    def setUp(self):
+        caches['default'].clear()
+        create_school_info()
+
+    def create_event(self, title, start, days=0, hours=2, event_type='academic', **kwargs):
+        start = timezone.make_aware(datetime.combine(start, datetime.min.time().replace(hour=9)))
+        fields = {'description': '...', 'location': 'Hall', **kwargs}
+        return Event.objects.create(
+            title=title, event_type=event_type,
+            start_date=start, end_date=start + timedelta(days=days, hours=hours), **fields,
+        )
+
+    def test_page_renders_without_loading_events(self):
+        self.create_event('Exams', date.today())
+        get_school_info()
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('calendar'))
+        self.assertContains(response, reverse('calendar-feed', args=['sports']))
+
+    def test_events_overlapping_the_window(self):
+        before = self.create_event('Before', date(2026, 9, 20))
+        spanning = self.create_event('Spanning', date(2026, 9, 29), days=3)
+        inside = self.create_event('Inside', date(2026, 10, 10))
+        sports = self.create_event('Sports day', date(2026, 10, 12), event_type='sports')
+        self.create_event('After', date(2026, 11, 1))
+
+        response = self.client.get(reverse('calendar-events'), {'start': '2026-10-01', 'end': '2026-11-01'})
+        self.assertEqual([e['id'] for e in response.json()['events']], [spanning.pk, inside.pk, sports.pk])
+        response = self.client.get(reverse('calendar-events'), {'start': '2026-10-01', 'end': '2026-11-01', 'type': 'sports'})
+        self.assertEqual([e['title'] for e in response.json()['events']], ['Sports day'])
+        self.assertNotIn(before.pk, [e['id'] for e in response.json()['events']])
+
+    def test_bad_windows_are_rejected(self):
+        url = reverse('calendar-events')
+        for params in (
+            {'start': '2026-10-01'},
+            {'start': 'soon', 'end': '2026-11-01'},
+            {'start': '2026-11-01', 'end': '2026-10-01'},
+            {'start': '2020-01-01', 'end': '2026-01-01'},
+            {'start': '2026-10-01', 'end': '2026-11-01', 'type': 'party'},
+        ):
+            self.assertEqual(self.client.get(url, params).status_code, 400, params)
+
+    @override_settings(SITE_URL='https://school.example.com')
+    def test_feed_per_type_with_etag(self):
+        exams = self.create_event('Exams; term 1, final', date.today() + timedelta(days=5), description='x' * 200)
+        self.create_event('Sports day', date.today() + timedelta(days=6), event_type='sports')
+        self.create_event('Long gone', date.today() - timedelta(days=800))
+
+        response = self.client.get(reverse('calendar-feed', args=['academic']))
+        self.assertEqual(response['Content-Type'], 'text/calendar; charset=utf-8')
+        content = response.content.decode()
+        self.assertTrue(content.startswith('BEGIN:VCALENDAR\r\n'))
+        self.assertIn(f'UID:event-{exams.pk}@school.example.com', content)
+        self.assertIn('URL:https://school.example.com/', content)
+        self.assertIn('SUMMARY:Exams\\; term 1\\, final', content)
+        self.assertNotIn('Sports day', content)
+        self.assertNotIn('Long gone', content)
+        self.assertTrue(all(len(line.encode()) <= 75 for line in content.split('\r\n')))
+
+        not_modified = self.client.get(reverse('calendar-feed', args=['academic']), headers={'if-none-match': response['ETag']})
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertIn('Sports day', self.client.get(reverse('calendar-feed', args=['all'])).content.decode())
+        self.assertEqual(self.client.get('/calendar/party.ics').status_code, 404)
+
+    def test_feed_rerenders_only_changed_events(self):
+        first = self.create_event('Exams', date.today() + timedelta(days=5))
+        self.create_event('Results', date.today() + timedelta(days=9))
+        url = reverse('calendar-feed', args=['academic'])
+        etag = self.client.get(url)['ETag']
+
+        first.title = 'Exams postponed'
+        first.save()
+        with mock.patch.object(calendars, '_vevent', wraps=calendars._vevent) as render:
+            response = self.client.get(url, headers={'if-none-match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([call.args[0].pk for call in render.call_args_list], [first.pk])
+        self.assertIn('Exams postponed', response.content.decode())
+        self.assertIn('Results', response.content.decode())
+
+    def test_feed_ignores_the_host_header(self):
+        self.create_event('Exams', date.today() + timedelta(days=5))
+        url = reverse('calendar-feed', args=['academic'])
+        content = self.client.get(url).content
+        with mock.patch.object(calendars, '_build_feed') as build:
+            response = self.client.get(url, HTTP_HOST='evil.example.com')
+        build.assert_not_called()
+        self.assertEqual(response.content, content)
+        self.assertNotIn(b'evil.example.com', content)
+
+
+@skipUnless(connection.vendor == 'sqlite', 'SQLite tuning')
+class SQLiteTuningTests(TestCase):
+    def pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_connections_are_tuned(self):
+        self.assertEqual(self.pragma('busy_timeout'), 20000)
+        self.assertEqual(self.pragma('synchronous'), 1)  # NORMAL
+        self.assertEqual(self.pragma('cache_size'), -64000)
+        self.assertEqual(connection.transaction_mode, 'IMMEDIATE')
+
+
+class DBPoolStatusTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create(username='admin', is_staff=True))
+
+    def test_unpooled_database(self):
+        self.assertEqual(self.client.get(reverse('db-pool-status')).json(), {'pooled': False})
+
+    def test_pool_counters(self):
+        pool = mock.Mock()
+        pool.get_stats.return_value = {
+            'pool_min': 2, 'pool_max': 4, 'pool_size': 4, 'pool_available': 1,
+            'requests_waiting': 3, 'requests_num': 10, 'requests_wait_ms': 250,
+        }
+        with mock.patch.object(connection, 'pool', pool, create=True):
+            stats = self.client.get(reverse('db-pool-status')).json()
+        self.assertEqual(
+            {key: stats[key] for key in ('pooled', 'checked_out', 'waiting', 'wait_ms', 'average_wait_ms')},
+            {'pooled': True, 'checked_out': 3, 'waiting': 3, 'wait_ms': 250, 'average_wait_ms': 25},
+        )
+
+
+class RequestTimingTests(TestCase):
+    def setUp(self):
+        caches['default'].clear()
+        reset_request_stats()
+        self.addCleanup(reset_request_stats)
+        create_school_info()
+
+    @override_settings(REQUEST_TIMING_SAMPLE_RATE=1)
+    def test_sampled_request(self):
+        response = self.client.get(reverse('home'))
+        stats = request_stats()['home']
+        self.assertEqual((stats['requests'], stats['sampled'], stats['slow']), (1, 1, 0))
+        self.assertGreater(stats['queries'], 0)
+        self.assertGreater(stats['db_ms'], 0)
+        self.assertGreater(stats['render_ms'], 0)
+        self.assertGreaterEqual(stats['wall_ms'], stats['render_ms'])
+        self.assertEqual(stats['bytes'], len(response.content))
+
+    @override_settings(REQUEST_TIMING_SAMPLE_RATE=0)
+    def test_unsampled_request(self):
+        self.client.get(reverse('home'))
+        self.client.get('/no-such-page/')
+        stats = request_stats()
+        self.assertEqual((stats['home']['requests'], stats['home']['sampled'], stats['home']['render_ms']), (1, 0, 0))
+        # Queries are timed whether or not the request is sampled
+        self.assertGreater(stats['home']['queries'], 0)
+        self.assertEqual(stats['<unresolved>']['requests'], 1)
+
+    @override_settings(REQUEST_TIMING_SAMPLE_RATE=0, REQUEST_TIMING_SLOW_MS=0, REQUEST_TIMING_SLOW_QUERIES=2)
+    def test_slow_request_logged_with_slowest_queries(self):
+        with self.assertLogs('main.instrumentation', 'WARNING') as logs:
+            self.client.get(reverse('announcements'))
+        entry = json.loads(logs.records[0].getMessage())
+        self.assertEqual((entry['event'], entry['view'], entry['status']), ('slow_request', 'announcements', 200))
+        self.assertEqual(len(entry['slowest_queries']), 2)
+        first, second = entry['slowest_queries']
+        self.assertGreaterEqual(first['ms'], second['ms'])
+        self.assertIn('SELECT', first['sql'])
+        self.assertNotIn('render_ms', entry)
+        self.assertEqual(request_stats()['announcements']['slow'], 1)
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        caches['default'].clear()
+        create_school_info()
+
+    def sample(self, name, **labels):
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    def test_requires_staff_or_token(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 401)
+        with override_settings(METRICS_TOKEN='secret'):
+            wrong = self.client.get(reverse('metrics'), headers={'authorization': 'Bearer wrong'})
+            scraper = self.client.get(reverse('metrics'), headers={'authorization': 'Bearer secret'})
+        self.assertEqual(wrong.status_code, 401)
+        self.assertEqual(scraper.status_code, 200)
+        self.assertTrue(scraper['Content-Type'].startswith('text/plain'))
+        self.assertContains(scraper, 'school_http_request_duration_seconds_bucket')
+        self.client.force_login(User.objects.create(username='admin', is_staff=True))
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 200)
+
+    def test_request_latency_and_page_cache(self):
+        requests = self.sample('school_http_request_duration_seconds_count', view='home')
+        hits = self.sample('school_page_cache_requests_total', outcome='hit')
+        misses = self.sample('school_page_cache_requests_total', outcome='miss')
+        self.client.get(reverse('home'))
+        self.client.get(reverse('home'))
+        self.assertEqual(self.sample('school_http_request_duration_seconds_count', view='home'), requests + 2)
+        self.assertEqual(self.sample('school_page_cache_requests_total', outcome='miss'), misses + 1)
+        self.assertEqual(self.sample('school_page_cache_requests_total', outcome='hit'), hits + 1)
+
+    def test_notification_sends(self):
+        LocMemBackend.outbox = []
+        LocMemBackend.failing_recipients = {'+9779800000000'}
+        self.addCleanup(setattr, LocMemBackend, 'failing_recipients', set())
+        sent = self.sample('school_otp_sends_total', channel='email', outcome='sent')
+        failed = self.sample('school_otp_sends_total', channel='sms', outcome='failed')
+        retries = self.sample('school_notification_sends_total', kind='otp', channel='sms', outcome='retry')
+        with self.assertLogs('main.notifications', 'WARNING'):
+            send_otp(OTP(email='parent@example.com', phone_number='+9779800000000', otp_code='123456'), LocMemBackend())
+        NotificationJob.objects.create(kind='otp', channel='sms', recipient='+9779800000000', body='123456')
+        process_jobs(backend=LocMemBackend())
+        self.assertEqual(self.sample('school_otp_sends_total', channel='email', outcome='sent'), sent + 1)
+        self.assertEqual(self.sample('school_otp_sends_total', channel='sms', outcome='failed'), failed + 1)
+        self.assertEqual(
+            self.sample('school_notification_sends_total', kind='otp', channel='sms', outcome='retry'), retries + 1,
+        )
+
+    def test_admissions_by_status(self):
+        registry = metrics.registry()
+        self.assertEqual(registry.get_sample_value('school_admissions', {'status': 'Pending'}), 0)
+
+    def test_multiprocess_totals(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        env = {**os.environ, 'PROMETHEUS_MULTIPROC_DIR': directory}
+        script = "from main.metrics import PAGE_CACHE_REQUESTS; PAGE_CACHE_REQUESTS.labels('hit').inc(3)"
+        for _ in range(2):
+            subprocess.run(
+                [sys.executable, 'manage.py', 'shell', '-c', script],
+                cwd=settings.BASE_DIR, env=env, check=True, capture_output=True,
+            )
+        with mock.patch.dict(os.environ, {'PROMETHEUS_MULTIPROC_DIR': directory}):
+            registry = metrics.registry()
+        self.assertEqual(registry.get_sample_value('school_page_cache_requests_total', {'outcome': 'hit'}), 6)
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.messages = [
+            ContactMessage.objects.create(name='Parent 1', email='p1@example.com', subject='Fees', message='When?'),
+            ContactMessage.objects.create(
+                name='Parent 2', email='p2@example.com', subject='=HYPERLINK("http://example.com")', message='Hi',
+            ),
+            ContactMessage.objects.create(name='Parent 3', email='p3@example.com', subject='Bus', message='Route?'),
+        ]
+
+    def test_command_streams_csv(self):
+        out = io.StringIO()
+        call_command('export_data', 'contact-messages', chunk_size=2, stdout=out)
+        rows = list(csv.reader(io.StringIO(out.getvalue())))
+        self.assertEqual(rows[0], ['ID', 'Sent', 'Read', 'Name', 'Email', 'Subject', 'Message'])
+        self.assertEqual([row[3] for row in rows[1:]], ['Parent 1', 'Parent 2', 'Parent 3'])
+        # Not a formula when opened in a spreadsheet
+        self.assertEqual(rows[2][5], '\'=HYPERLINK("http://example.com")')
+
+    def test_csv_leaves_phone_numbers_alone(self):
+        ContactMessage.objects.create(name='Parent 4', email='p4@example.com', subject='+977 1-4123456', message='-5')
+        ContactMessage.objects.create(name='Parent 5', email='p5@example.com', subject='+SUM(1)', message='-cmd')
+        out = io.StringIO()
+        call_command('export_data', 'contact-messages', stdout=out)
+        rows = list(csv.reader(io.StringIO(out.getvalue())))
+        self.assertEqual(rows[4][5:], ['+977 1-4123456', '-5'])
+        self.assertEqual(rows[5][5:], ["'+SUM(1)", "'-cmd"])
+
+    def test_command_requires_output_for_xlsx(self):
+        with self.assertRaisesMessage(CommandError, '--output is required'):
+            call_command('export_data', 'admissions', format='xlsx')
+
+    def post_action(self, action, selected):
+        self.client.force_login(User.objects.create(username='admin', is_staff=True, is_superuser=True))
+        return self.client.post(
+            reverse('admin:main_contactmessage_changelist'),
+            {'action': action, '_selected_action': [m.pk for m in selected]},
+        )
+
+    def test_admin_csv_action_exports_selected_rows(self):
+        response = self.post_action('export_csv', self.messages[1:])
+        self.assertTrue(response.streaming)
+        self.assertIn('attachment; filename="contact-messages-', response['Content-Disposition'])
+        rows = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual([row[3] for row in rows[1:]], ['Parent 2', 'Parent 3'])
+
+    def test_admin_xlsx_action(self):
+        response = self.post_action('export_xlsx', self.messages)
+        sheet = load_workbook(io.BytesIO(b''.join(response.streaming_content))).active
+        rows = list(sheet.iter_rows(values_only=True))
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[2][5], '=HYPERLINK("http://example.com")')
+        self.assertEqual(sheet['F3'].data_type, 's')
+        self.assertIsInstance(rows[1][1], datetime)
+
+
+STUDENT_CSV_HEADER = (
+    'username,email,password,first_name,last_name,date_of_birth,phone_number,address,city,zip_code,'
+    'student_id,faculty,department,enrollment_date\n'
+)
+
+
+def student_csv_row(n, password='', **overrides):
+    row = {
+        'username': f'student{n}', 'email': f'student{n}@example.com', 'password': password,
+        'first_name': 'Sita', 'last_name': f'Rai {n}', 'date_of_birth': '2010-04-01', 'phone_number': '9800000000',
+        'address': 'Ward 4', 'city': 'Kathmandu', 'zip_code': '44600', 'student_id': f'S{n:05}',
+        'faculty': 'science', 'department': 'physics', 'enrollment_date': '2025-04-14',
+    }
+    row.update(overrides)
+    return ','.join(row.values()) + '\n'
+
+
+@override_settings(IMPORT_HASH_WORKERS=1)
+class ImportTests(TestCase):
+    def test_students_with_accounts_and_row_errors(self):
+        User.objects.create(username='taken')
+        file = io.StringIO(
+            STUDENT_CSV_HEADER
+            + student_csv_row(1, password='Secret#123')
+            + student_csv_row(2)
+            + student_csv_row(3, date_of_birth='2010-13-01')
+            + student_csv_row(4, student_id='S00001')
+            + student_csv_row(5, username='taken')
+        )
+        result = import_csv(IMPORTERS['students'], file, batch_size=1)
+        self.assertEqual(result.created, 2)
+        self.assertEqual([line for line, _ in result.errors], [4, 5, 6])
+        self.assertIn('date_of_birth: Enter a valid date.', result.errors[0][1])
+        self.assertIn('student_id: Already used on line 2 of this file.', result.errors[1][1])
+        self.assertTrue(result.errors[2][1][0].startswith('username: '))
+
+        first, second = Student.objects.select_related('user').order_by('student_id')
+        self.assertEqual((first.user.username, first.user.email), ('student1', 'student1@example.com'))
+        self.assertTrue(first.user.check_password('Secret#123'))
+        self.assertFalse(second.user.has_usable_password())
+
+    def test_staff_in_batches(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        os.makedirs(os.path.join(media_root, 'staff', 'photos'))
+        PILImage.new('RGB', (400, 300), 'red').save(os.path.join(media_root, 'staff', 'photos', 'ram.jpg'))
+        photos = ['staff/photos/ram.jpg'] * 3 + ['staff/photos/hari.jpg', 'staff/../../etc/passwd']
+        rows = ''.join(
+            f'Ram,Sharma {i},Teacher,teaching,,{photo},2020-01-0{i}\n' for i, photo in enumerate(photos, 1)
+        )
+        file = io.StringIO('first_name,last_name,position,department,bio,photo,join_date\n' + rows)
+        with self.settings(MEDIA_ROOT=media_root, IMAGE_DERIVATIVE_WIDTHS=[100]):
+            result = import_csv(IMPORTERS['staff'], file, batch_size=2)
+        self.assertEqual((result.created, [line for line, _ in result.errors]), (3, [5, 6]))
+        self.assertIn('photo: There is no file staff/photos/hari.jpg', result.errors[0][1][0])
+        self.assertIn("without '..'", result.errors[1][1][0])
+        self.assertEqual(Staff.objects.get(last_name='Sharma 2').photo.name, 'staff/photos/ram.jpg')
+        # bulk_create skips post_save, so the import makes the resized copies itself
+        self.assertTrue(os.path.exists(os.path.join(media_root, 'staff', 'photos', 'ram.100w.webp')))
+
+    def test_command_dry_run_and_missing_columns(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'students.csv')
+        with open(path, 'w') as file:
+            file.write(STUDENT_CSV_HEADER + student_csv_row(1) + student_csv_row(2, faculty='art'))
+        out = io.StringIO()
+        call_command('import_data', 'students', path, dry_run=True, stdout=out)
+        self.assertIn('Line 3: faculty: Select a valid choice.', out.getvalue())
+        self.assertIn('1 valid rows, 1 with errors. Nothing was saved.', out.getvalue())
+        self.assertFalse(Student.objects.exists())
+
+        with open(path, 'w') as file:
+            file.write('username,first_name\nstudent1,Sita\n')
+        with self.assertRaisesMessage(CommandError, 'Missing columns: email, last_name'):
+            call_command('import_data', 'students', path, stdout=out)
+
+    def test_admin_import_page(self):
+        self.client.force_login(User.objects.create(username='admin', is_staff=True, is_superuser=True))
+        changelist = self.client.get(reverse('admin:main_student_changelist'))
+        self.assertContains(changelist, reverse('admin:main_student_import'))
+        upload = SimpleUploadedFile('students.csv', (STUDENT_CSV_HEADER + student_csv_row(1)).encode('utf-8-sig'))
+        response = self.client.post(reverse('admin:main_student_import'), {'file': upload})
+        self.assertContains(response, 'Imported 1 students')
+        self.assertTrue(Student.objects.filter(student_id='S00001', user__username='student1').exists())
+
+    @override_settings(IMPORT_ADMIN_MAX_ROWS=2, IMPORT_ADMIN_MAX_PASSWORDS=1)
+    def test_admin_import_is_capped(self):
+        self.client.force_login(User.objects.create(username='admin', is_staff=True, is_superuser=True))
+        url = reverse('admin:main_student_import')
+        rows = [
+            STUDENT_CSV_HEADER + ''.join(student_csv_row(n) for n in range(1, 4)),
+            STUDENT_CSV_HEADER + student_csv_row(1, password='Secret#123') + student_csv_row(2, password='Secret#123'),
+        ]
+        for csv_text in rows:
+            response = self.client.post(url, {'file': SimpleUploadedFile('students.csv', csv_text.encode())})
+            self.assertContains(response, 'import larger files with manage.py import_data students')
+        self.assertFalse(Student.objects.exists())
+
+        # A dry run doesn't hash, so only the row cap applies
+        upload = SimpleUploadedFile('students.csv', rows[1].encode())
+        response = self.client.post(url, {'file': upload, 'dry_run': 'on'})
+        self.assertContains(response, 'Nothing was saved')
+
+    def test_admin_import_of_accounts_needs_add_user(self):
+        clerk = User.objects.create(username='clerk', is_staff=True)
+        clerk.user_permissions.add(
+            Permission.objects.get(codename='add_student'), Permission.objects.get(codename='add_staff'),
+        )
+        self.client.force_login(clerk)
+        self.assertEqual(self.client.get(reverse('admin:main_student_import')).status_code, 403)
+        self.assertEqual(self.client.get(reverse('admin:main_staff_import')).status_code, 200)
+
+
+class AdminChangeListTests(TestCase):
+    CHANGELISTS = [
+        'announcement', 'event', 'galleryimage', 'student', 'admission', 'parent', 'staff', 'contactmessage',
+    ]
+
+    def setUp(self):
+        self.client.force_login(User.objects.create(username='admin', is_staff=True, is_superuser=True))
+        self.rows = 0
+
+    def add_rows(self, count):
+        """
+        ``count`` more rows of every listed model, each with its own related row.
+        """
+        now = timezone.now()
+        for n in range(self.rows, self.rows + count):
+            user = User.objects.create(username=f'user{n}')
+            staff = Staff.objects.create(
+                first_name='Ram', last_name=f'Sharma {n}', photo='staff/photos/ram.jpg', position='Teacher',
+                department='teaching', join_date=date(2020, 1, 1),
+            )
+            Announcement.objects.create(title=f'Notice {n}', content='...', author=user)
+            Event.objects.create(
+                title=f'Sports Day {n}', description='...', start_date=now, end_date=now, location='Ground',
+                event_type='sports', organizer=staff,
+            )
+            gallery = Gallery.objects.create(title=f'Gallery {n}', cover_image='gallery/covers/cover.jpg')
+            GalleryImage.objects.create(gallery=gallery, image=f'gallery/images/{n}.jpg', caption=f'Photo {n}')
+            Student.objects.create(
+                user=user, first_name='Sita', last_name=f'Rai {n}', date_of_birth=date(2010, 4, 1),
+                phone_number='9800000000', address='Ward 4', city='Kathmandu', zip_code='44600',
+                student_id=f'S{n:05}', faculty='science', department='physics', enrollment_date=date(2025, 4, 14),
+            )
+            Admission.objects.create(
+                applicant_name=f'Hari {n}', date_of_birth=date(2012, 1, 1), applying_for_grade='5',
+                parent_guardian_name='Gita', contact_email=f'gita{n}@example.com', contact_phone='9800000000',
+                previous_school='Ward School', previous_report_card='admission_documents/card.pdf', user=user,
+            )
+            Parent.objects.create(
+                user=user, first_name='Gita', last_name=f'Rai {n}', phone='9800000000',
+                email=f'gita{n}@example.com', address='Ward 4',
+            )
+            ContactMessage.objects.create(name=f'Parent {n}', email=f'p{n}@example.com', subject='Fees', message='?')
+        self.rows += count
+
+    def changelist_queries(self, name, query=''):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse(f'admin:main_{name}_changelist') + query)
+        self.assertEqual(response.status_code, 200)
+        return response, [q['sql'] for q in ctx.captured_queries]
+
+    def test_query_counts_are_constant(self):
+        self.add_rows(1)
+        counts = {name: len(self.changelist_queries(name)[1]) for name in self.CHANGELISTS}
+        # Session, user, the size estimate, COUNT (the table is small) and
+        # one page query, plus the gallery filter's choices
+        self.assertEqual(counts['student'], 5)
+        self.assertEqual(counts['galleryimage'], 6)
+        self.add_rows(5)
+        self.assertEqual({name: len(self.changelist_queries(name)[1]) for name in self.CHANGELISTS}, counts)
+
+    def test_search_and_filters(self):
+        self.add_rows(3)
+        response, queries = self.changelist_queries('student', '?q=s00001')
+        self.assertEqual([s.student_id for s in response.context['cl'].result_list], ['S00001'])
+        # No second COUNT for the "3 total" link
+        self.assertEqual(sum('COUNT(' in sql for sql in queries), 1)
+        response, _ = self.changelist_queries('admission', '?status__exact=Pending')
+        self.assertEqual(response.context['cl'].result_count, 3)
+
+    @override_settings(ADMIN_ESTIMATED_COUNT_THRESHOLD=3)
+    def test_estimated_count_for_large_tables(self):
+        self.add_rows(5)
+        ContactMessage.objects.filter(name='Parent 1').delete()
+        response, queries = self.changelist_queries('contactmessage')
+        self.assertFalse(any('COUNT(' in sql for sql in queries))
+        # SQLite's estimate is the highest rowid
+        self.assertEqual(response.context['cl'].result_count, 5)
+        self.assertEqual(len(response.context['cl'].result_list), 4)
+        # Filtered lists are counted
+        response, _ = self.changelist_queries('contactmessage', '?is_read__exact=0')
+        self.assertEqual(response.context['cl'].result_count, 4)
+
+
+class QueryAuditTests(TestCase):
+    def test_hot_queries_use_indexes(self):
+        out = io.StringIO()
+        call_command('audit_queries', stdout=out)
+        self.assertNotIn('full scan', out.getvalue())
+
+    def test_full_table_scan_fails_the_audit(self):
+        unindexed = {'contact: by email': lambda: ContactMessage.objects.filter(email='parent@example.com')}
+        out = io.StringIO()
+        with mock.patch.dict(HOT_QUERIES, unindexed), self.assertRaisesMessage(CommandError, '1 hot queries'):
+            call_command('audit_queries', stdout=out)
+        self.assertIn('contact: by email: full scan of main_contactmessage', out.getvalue())
+
+
+def reload_urlconf():
+    # main/urls.py picks sync or async views when imported
+    clear_url_caches()
+    importlib.reload(main_urls)
+    importlib.reload(importlib.import_module('school_website.urls'))
+
+
+class AsyncViewTests(TestCase):
+    def setUp(self):
+        caches['default'].clear()
+        self.addCleanup(reload_urlconf)
+        self.enterContext(override_settings(ASYNC_VIEWS=True))
+        reload_urlconf()
+        create_school_info()
+        self.author = User.objects.create(username='author')
+
+    def create_announcements(self, count, **kwargs):
+        return [
+            Announcement.objects.create(title=f'Announcement {i}', content='...', author=self.author, **kwargs)
+            for i in range(count)
+        ]
+
+    async def test_home_is_async_and_page_cached(self):
+        self.assertTrue(asyncio.iscoroutinefunction(resolve(reverse('home')).func))
+        await sync_to_async(self.create_announcements)(1, important=True)
+        first = await self.async_client.get(reverse('home'))
+        self.assertContains(first, 'Announcement 0')
+        self.assertEqual(first['X-Page-Cache'], 'miss')
+        second = await self.async_client.get(reverse('home'))
+        self.assertEqual(second['X-Page-Cache'], 'hit')
+        self.assertEqual(second.content, first.content)
+
+    async def test_list_pages(self):
+        self.assertTrue(resolve(reverse('announcements')).func.view_class.view_is_async)
+        await sync_to_async(self.create_announcements)(12)
+        first = await self.async_client.get(reverse('announcements'))
+        self.assertEqual(len(first.context['announcements']), 10)
+        last = await self.async_client.get(reverse('announcements'), {'page': 'last'})
+        self.assertEqual(
+            [a.title for a in last.context['announcements']], ['Announcement 1', 'Announcement 0'],
+        )
+        self.assertEqual(last.context['page_obj'].number, 2)
+        missing = await self.async_client.get(reverse('announcements'), {'page': 3})
+        self.assertEqual(missing.status_code, 404)
+
+    @override_settings(LIST_PAGINATION_MODE='keyset')
+    async def test_keyset_list_page(self):
+        await sync_to_async(self.create_announcements)(12)
+        first = await self.async_client.get(reverse('announcements'))
+        second = await self.async_client.get(reverse('announcements'), {'cursor': first.context['page_obj'].next_cursor})
+        self.assertEqual([a.title for a in second.context['announcements']], ['Announcement 1', 'Announcement 0'])
+
+    async def test_event_list_months(self):
+        await Event.objects.acreate(
+            title='Sports day', description='...', location='Ground',
+            start_date=timezone.now() + timedelta(days=3), end_date=timezone.now() + timedelta(days=3, hours=6),
+            event_type='sports',
+        )
+        response = await self.async_client.get(reverse('events'))
+        self.assertContains(response, 'Sports day')
+        self.assertEqual(len(response.context['months']), 1)
+
+    async def test_detail_conditional_get_and_404(self):
+        announcement, = await sync_to_async(self.create_announcements)(1)
+        url = reverse('announcement-detail', args=[announcement.pk])
+        first = await self.async_client.get(url)
+        self.assertContains(first, 'Announcement 0')
+        second = await self.async_client.get(url, headers={'if-none-match': first['ETag']})
+        self.assertEqual(second.status_code, 304)
+        missing = await self.async_client.get(reverse('announcement-detail', args=[announcement.pk + 1]))
+        self.assertEqual(missing.status_code, 404)
+
+    @override_settings(REQUEST_TIMING_SAMPLE_RATE=1)
+    async def test_request_timing(self):
+        reset_request_stats()
+        self.addCleanup(reset_request_stats)
+        await sync_to_async(self.create_announcements)(3)
+        await self.async_client.get(reverse('announcements'))
+        stats = request_stats()['announcements']
+        self.assertEqual(stats['sampled'], 1)
+        self.assertGreater(stats['queries'], 0)
+        self.assertGreater(stats['render_ms'], 0)
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        caches['default'].clear()
+        create_school_info()
+        self.author = Staff.objects.create(
+            first_name='Ram', last_name='Sharma', photo='staff/photos/ram.jpg',
+            position='Teacher', department='teaching', join_date=date(2020, 1, 1),
+        )
+        self.user = User.objects.create_user('author')
+
+    def titles(self, query):
+        return [document.title for document in SearchResults(query)[:20]]
+
+    def test_index_follows_saves_and_deletes(self):
+        news = News.objects.create(
+            title='Annual Science Fair', content='<p>Projects from every class</p>',
+            author=self.author, featured_image='news/n.jpg',
+        )
+        Notice.objects.create(title='Library closed', paragraph='The library is closed for stocktaking.')
+        self.assertEqual(self.titles('science'), ['Annual Science Fair'])
+        self.assertEqual(self.titles('stocktaking'), ['Library closed'])
+        self.assertEqual(SearchDocument.objects.get(kind='news').body, 'Projects from every class')
+
+        news.title = 'Annual Art Fair'
+        news.save()
+        self.assertEqual(self.titles('science'), [])
+        self.assertEqual(self.titles('art'), ['Annual Art Fair'])
+
+        news.is_published = False
+        news.save()
+        self.assertEqual(self.titles('art'), [])
+        news.delete()
+        self.assertFalse(SearchDocument.objects.filter(kind='news').exists())
+
+    def test_title_matches_rank_first_and_words_are_stemmed(self):
+        Announcement.objects.create(title='Bus timings', content='Buses leave after the football match.', author=self.user)
+        Event.objects.create(
+            title='Football final', description='Inter-school final', location='Ground', event_type='sports',
+            start_date=timezone.now(), end_date=timezone.now(),
+        )
+        self.assertEqual(self.titles('football'), ['Football final', 'Bus timings'])
+        self.assertEqual(self.titles('finals football'), ['Football final'])
+        self.assertEqual(self.titles('timing'), ['Bus timings'])
+        # FTS syntax in the query is treated as plain words
+        self.assertEqual(self.titles('"football OR (NEAR'), [])
+
+    @override_settings(SEARCH_RANK_WINDOW=3)
+    def test_only_newest_matches_are_ranked(self):
+        for i in range(5):
+            Announcement.objects.create(title=f'Exam schedule {i}', content='...', author=self.user)
+        results = SearchResults('exam')
+        self.assertEqual(results.count(), 3)
+        self.assertEqual(sorted(d.title for d in results[:10]), ['Exam schedule 2', 'Exam schedule 3', 'Exam schedule 4'])
+
+    def test_search_view_is_paginated(self):
+        for i in range(12):
+            Announcement.objects.create(title=f'Exam schedule {i}', content='...', author=self.user)
+        response = self.client.get(reverse('search'), {'q': 'exam'})
+        self.assertEqual(len(response.context['results']), 10)
+        self.assertContains(response, '12 results')
+        response = self.client.get(reverse('search'), {'q': 'exam', 'page': 2})
+        self.assertEqual(len(response.context['results']), 2)
+        self.assertEqual(self.client.get(reverse('search')).status_code, 200)
+
+    def test_rebuild_command(self):
+        Gallery.objects.create(title='Sports Day', cover_image='gallery/covers/c.jpg')
+        SearchDocument.objects.all().delete()
+        self.assertEqual(self.titles('sports'), [])
+        call_command('rebuild_search_index', stdout=io.StringIO())
+        self.assertEqual(self.titles('sports'), ['Sports Day'])
+
+    @override_settings(SEARCH_RANK_WINDOW=2)
+    def test_rebuilt_index_window_holds_the_newest_matches(self):
+        now = timezone.now()
+        for days in (1, 3):
+            Event.objects.create(
+                title=f'Exam day {days}', description='...', location='Hall', event_type='academic',
+                start_date=now - timedelta(days=days), end_date=now,
+            )
+        announcement = Announcement.objects.create(title='Exam results', content='...', author=self.user)
+        Announcement.objects.filter(pk=announcement.pk).update(date_posted=now - timedelta(days=5))
+        Announcement.objects.create(title='Exam timetable', content='...', author=self.user)
+        call_command('rebuild_search_index', stdout=io.StringIO())
+        self.assertEqual(
+            list(SearchDocument.objects.order_by('pk').values_list('title', flat=True)),
+            ['Exam results', 'Exam day 3', 'Exam day 1', 'Exam timetable'],
+        )
+        self.assertEqual(sorted(self.titles('exam')), ['Exam day 1', 'Exam timetable'])
+
+    def test_migration_backfills_existing_rows(self):
+        # Rows from before the index, as bulk_create leaves them: unindexed
+        Announcement.objects.bulk_create([Announcement(title='Sports week', content='...', author=self.user)])
+        Gallery.objects.bulk_create([Gallery(title='Sports results', cover_image='gallery/covers/c.jpg')])
+        self.assertEqual(self.titles('sports'), [])
+        migration = importlib.import_module('main.migrations.0015_backfill_search_index')
+        state = MigrationLoader(connection).project_state(('main', '0015_backfill_search_index'))
+        migration.backfill(state.apps, None)
+        self.assertEqual(sorted(self.titles('sports')), ['Sports results', 'Sports week'])
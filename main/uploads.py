@@ -0,0 +1,275 @@
+import logging
+import os
+import re
+import shutil
+import tempfile
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.text import get_valid_filename
+
+from .images import delete_derivatives, generate_derivatives
+from .models import Admission, ChunkedUpload, Gallery, GalleryImage
+from .pagecache import purge
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+
+# Where each kind of upload is stored once complete, what it may be, and the
+# file field that will hold its name (whose max_length the name must fit)
+DESTINATIONS = {
+    'admission_document': (
+        'admission_documents/', {'.pdf', '.jpg', '.jpeg', '.png'}, Admission._meta.get_field('previous_report_card'),
+    ),
+    'gallery_image': (
+        'gallery/images/', {'.jpg', '.jpeg', '.png', '.gif', '.webp'}, GalleryImage._meta.get_field('image'),
+    ),
+}
+
+_CONTENT_RANGE_RE = re.compile(r'^bytes (\d+)-(\d+)/(\d+)$')
+
+
+class UploadError(ValueError):
+    """
+    A request the client has to correct. ``status`` is the HTTP status to
+    answer with.
+    """
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class _PartialFile(File):
+    # Lets FileSystemStorage move the finished file into place with a rename
+    # instead of copying it.
+    def temporary_file_path(self):
+        return self.name
+
+
+def partial_path(upload):
+    return os.path.join(settings.CHUNKED_UPLOAD_DIR, f'{upload.pk}.part')
+
+
+def start_upload(user, purpose, filename, size):
+    """
+    Open a new upload of ``size`` bytes. Gallery images are staff only.
+    """
+    if purpose not in DESTINATIONS:
+        raise UploadError(f"Unknown upload purpose {purpose!r}")
+    if purpose == 'gallery_image' and not user.is_staff:
+        raise UploadError("Only staff can upload gallery images", status=403)
+    filename = get_valid_filename(os.path.basename(filename or ''))
+    if len(filename) > ChunkedUpload._meta.get_field('filename').max_length:
+        raise UploadError("The file name is too long")
+    if os.path.splitext(filename)[1].lower() not in DESTINATIONS[purpose][1]:
+        raise UploadError(f"{filename or 'This file'} is not an accepted file type")
+    try:
+        size = int(size)
+    except (TypeError, ValueError):
+        raise UploadError("size must be the file's length in bytes")
+    if not 0 < size <= settings.CHUNKED_UPLOAD_MAX_SIZE:
+        raise UploadError(f"Files must be between 1 byte and {settings.CHUNKED_UPLOAD_MAX_SIZE} bytes", status=413)
+
+    upload = ChunkedUpload.objects.create(
+        user=user if user.is_authenticated else None,
+        purpose=purpose,
+        filename=filename,
+        size=size,
+    )
+    os.makedirs(settings.CHUNKED_UPLOAD_DIR, exist_ok=True)
+    open(partial_path(upload), 'wb').close()
+    return upload
+
+
+def remember_upload(request, upload):
+    """
+    Note ``upload`` in the session of the anonymous visitor who started it;
+    signed-in users' uploads are theirs through ``upload.user``.
+    """
+    if not request.user.is_authenticated:
+        request.session['chunked_uploads'] = request.session.get('chunked_uploads', []) + [str(upload.pk)]
+
+
+def uploads_of(request):
+    """
+    The uploads the visitor making ``request`` started, which only they may
+    continue or attach to a form.
+    """
+    if request.user.is_authenticated:
+        return ChunkedUpload.objects.filter(user=request.user)
+    return ChunkedUpload.objects.filter(user__isnull=True, pk__in=request.session.get('chunked_uploads', []))
+
+
+def parse_content_range(header):
+    """
+    ``"bytes 0-1023/5000"`` -> ``(0, 1023, 5000)``.
+    """
+    match = _CONTENT_RANGE_RE.match(header or '')
+    if not match:
+        raise UploadError("Chunks need a 'Content-Range: bytes start-end/total' header")
+    start, end, total = (int(value) for value in match.groups())
+    if start > end:
+        raise UploadError("Content-Range ends before it starts")
+    return start, end, total
+
+
+def _read_chunk(stream, length):
+    """
+    Read ``length`` bytes of ``stream`` into an anonymous temporary file,
+    ``CHUNK_SIZE`` bytes at a time.
+    """
+    chunk = tempfile.TemporaryFile(dir=settings.CHUNKED_UPLOAD_DIR)
+    try:
+        remaining = length
+        while remaining:
+            data = stream.read(min(CHUNK_SIZE, remaining))
+            if not data:
+                raise UploadError("Chunk is shorter than its Content-Range")
+            chunk.write(data)
+            remaining -= len(data)
+    except BaseException:
+        chunk.close()
+        raise
+    chunk.seek(0)
+    return chunk
+
+
+def _write_chunk(path, start, chunk):
+    # Anything past ``start`` is left over from an interrupted attempt.
+    with open(path, 'r+b') as f:
+        f.seek(start)
+        f.truncate()
+        try:
+            shutil.copyfileobj(chunk, f, CHUNK_SIZE)
+        except BaseException:
+            f.seek(start)
+            f.truncate()
+            raise
+
+
+def _assemble(upload):
+    directory, _, field = DESTINATIONS[upload.purpose]
+    path = partial_path(upload)
+    with _PartialFile(open(path, 'rb'), name=path) as partial:
+        # The storage shortens a name that wouldn't fit the field
+        upload.stored_name = default_storage.save(directory + upload.filename, partial, max_length=field.max_length)
+    if os.path.exists(path):
+        # Storages that copy rather than move leave the partial file behind
+        os.remove(path)
+    upload.status = 'complete'
+
+
+def _check_chunk(upload, start, end, total):
+    if total != upload.size or end >= upload.size:
+        raise UploadError(f"This upload is {upload.size} bytes long")
+    if start != upload.received:
+        raise UploadError(f"Expected the chunk starting at byte {upload.received}", status=409)
+
+
+def append_chunk(upload, stream, content_range):
+    """
+    Append one chunk from ``stream`` to ``upload``'s partial file. Chunks
+    must arrive in order: a chunk that doesn't start at ``upload.received``
+    is refused with 409 so the client can resume from there. The last chunk
+    moves the finished file into storage.
+
+    The chunk is read from the client into a temporary file before the
+    upload's row is locked, so a slow client never holds the database's
+    write lock (or a pooled connection) while it sends.
+    """
+    start, end, total = parse_content_range(content_range)
+    length = end - start + 1
+    if length > settings.CHUNKED_UPLOAD_MAX_CHUNK:
+        raise UploadError(f"Chunks may be at most {settings.CHUNKED_UPLOAD_MAX_CHUNK} bytes", status=413)
+    upload.refresh_from_db()
+    if upload.status == 'complete':
+        # A retry of the last chunk whose response was lost
+        return upload
+    _check_chunk(upload, start, end, total)
+
+    with _read_chunk(stream, length) as chunk:
+        with transaction.atomic():
+            upload = ChunkedUpload.objects.select_for_update().get(pk=upload.pk)
+            if upload.status == 'complete':
+                return upload
+            # Another request may have appended this chunk while it was being read
+            _check_chunk(upload, start, end, total)
+            _write_chunk(partial_path(upload), start, chunk)
+            upload.received = end + 1
+            if upload.received == upload.size:
+                _assemble(upload)
+            upload.save(update_fields=['received', 'status', 'stored_name'])
+
+    if upload.status == 'complete' and upload.purpose == 'gallery_image':
+        # Resize now, one file per request, rather than all at once when the
+        # images are added to the gallery
+        fieldfile = GalleryImage(image=upload.stored_name).image
+        try:
+            generate_derivatives(fieldfile)
+        except (OSError, ValueError):
+            logger.exception("Could not generate derivatives for %s", fieldfile.name)
+    return upload
+
+
+def completed_uploads(ids, purpose, user):
+    """
+    The finished uploads ``ids``, in that order, started by ``user`` for
+    ``purpose``.
+    """
+    try:
+        ids = [uuid.UUID(str(pk)) for pk in ids]
+    except ValueError:
+        raise UploadError("Upload ids must be UUIDs")
+    uploads = ChunkedUpload.objects.filter(pk__in=ids, purpose=purpose, status='complete')
+    uploads = uploads.filter(user=user) if user.is_authenticated else uploads.filter(user__isnull=True)
+    by_id = {upload.pk: upload for upload in uploads}
+    missing = [str(pk) for pk in ids if pk not in by_id]
+    if missing:
+        raise UploadError(f"Unknown or unfinished uploads: {', '.join(missing)}")
+    return [by_id[pk] for pk in ids]
+
+
+def add_gallery_images(gallery, names, batch_size=None):
+    """
+    Append already-stored images ``names`` to ``gallery`` in the given order,
+    after its existing images, with one INSERT per ``batch_size`` rows.
+    """
+    with transaction.atomic():
+        # Serialise concurrent appends to the same gallery so orders don't collide
+        Gallery.objects.select_for_update().get(pk=gallery.pk)
+        last = gallery.images.aggregate(last=Max('order'))['last']
+        first = 0 if last is None else last + 1
+        images = GalleryImage.objects.bulk_create(
+            (GalleryImage(gallery=gallery, image=name, order=first + i) for i, name in enumerate(names)),
+            batch_size=batch_size or settings.GALLERY_BULK_BATCH_SIZE,
+        )
+    # bulk_create sends no post_save, so the cached gallery pages are purged here
+    purge(GalleryImage)
+    return images
+
+
+def delete_stale_uploads():
+    """
+    Remove uploads started more than CHUNKED_UPLOAD_EXPIRY seconds ago that
+    were never finished or never used, along with their files.
+    """
+    cutoff = timezone.now() - timedelta(seconds=settings.CHUNKED_UPLOAD_EXPIRY)
+    deleted = 0
+    for upload in ChunkedUpload.objects.filter(created_at__lt=cutoff).iterator():
+        path = partial_path(upload)
+        if os.path.exists(path):
+            os.remove(path)
+        if upload.stored_name:
+            default_storage.delete(upload.stored_name)
+            delete_derivatives(upload.stored_name, default_storage)
+        upload.delete()
+        deleted += 1
+    return deleted
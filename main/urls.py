@@ -1,19 +1,19 @@
+from django.conf import settings
 from django.urls import path
 from django.contrib.auth import views as auth_views
 
-from . import views
+from . import async_views, views
 from .views import (
-    AnnouncementListView, AnnouncementDetailView,
     StaffListView, StaffDetailView,
-    EventListView, EventDetailView,
-    NewsListView, NewsDetailView,
-    GalleryListView, GalleryDetailView,
     ContactView, StudentPortalView, ParentPortalView,subject,academics_view, admission,admission_success
 )
 
+# The public read pages, async under ASGI when ASYNC_VIEWS is set
+read_views = async_views if settings.ASYNC_VIEWS else views
+
 urlpatterns = [
     # Home page
-    path('', views.home, name='home'),
+    path('', read_views.home, name='home'),
     
     # About pages
     path('about/', views.about, name='about'),
@@ -21,8 +21,8 @@ urlpatterns = [
     path('about/history/', views.history, name='history'),
     
     # Announcements
-    path('announcements/', AnnouncementListView.as_view(), name='announcements'),
-    path('announcements/<int:pk>/', AnnouncementDetailView.as_view(), name='announcement-detail'),
+    path('announcements/', read_views.AnnouncementListView.as_view(), name='announcements'),
+    path('announcements/<int:pk>/', read_views.AnnouncementDetailView.as_view(), name='announcement-detail'),
     
     # Staff directory
     path('staff/', StaffListView.as_view(), name='staff-list'),
@@ -41,17 +41,29 @@ urlpatterns = [
 
     
     # Events calendar
-    path('events/', EventListView.as_view(), name='events'),
-    path('events/<int:pk>/', EventDetailView.as_view(), name='event-detail'),
+    path('events/', read_views.EventListView.as_view(), name='events'),
+    path('events/<int:pk>/', read_views.EventDetailView.as_view(), name='event-detail'),
     
     # News
-    path('news/', NewsListView.as_view(), name='news'),
-    path('news/<int:pk>/', NewsDetailView.as_view(), name='news-detail'),
+    path('news/', read_views.NewsListView.as_view(), name='news'),
+    path('news/<int:pk>/', read_views.NewsDetailView.as_view(), name='news-detail'),
     
     # Gallery
-    path('gallery/', GalleryListView.as_view(), name='gallery'),
-    path('gallery/<int:pk>/', GalleryDetailView.as_view(), name='gallery-detail'),
+    path('gallery/', read_views.GalleryListView.as_view(), name='gallery'),
+    path('gallery/<int:pk>/', read_views.GalleryDetailView.as_view(), name='gallery-detail'),
+    path('gallery/<int:pk>/upload/', views.gallery_upload, name='gallery-upload'),
+
+    # Chunked, resumable uploads
+    path('uploads/', views.upload_start, name='upload-start'),
+    path('uploads/<uuid:pk>/', views.upload_chunk, name='upload-chunk'),
     
+    # Site search
+    path('search/', views.search, name='search'),
+
+    # Operations
+    path('status/db-pool/', views.db_pool_status, name='db-pool-status'),
+    path('metrics', views.metrics, name='metrics'),
+
     # Contact
     path('contact/', ContactView.as_view(), name='contact'),
     
@@ -60,7 +72,9 @@ urlpatterns = [
     path('portal/parent/', ParentPortalView.as_view(), name='parent-portal'),
     
     # Utility pages
-    path('calendar/', views.calendar, name='calendar'),
+    path('calendar/', read_views.calendar, name='calendar'),
+    path('calendar/events/', views.calendar_events, name='calendar-events'),
+    path('calendar/<slug:event_type>.ics', views.calendar_feed, name='calendar-feed'),
     path('resources/', views.resources, name='resources'),
     path('faq/', views.faq, name='faq'),
 
@@ -3,30 +3,58 @@ from django.contrib.auth import login, authenticate
 from django.contrib import messages
 from django.views.generic import ListView, DetailView, CreateView, TemplateView
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.contrib.auth.models import User
 from django.utils import timezone
 from django.urls import reverse_lazy
+from django.utils.decorators import method_decorator
 from django.core.paginator import Paginator
-from django.core.mail import send_mail
 from django.conf import settings
-from twilio.rest import Client
-
-
+from django.db import transaction
+from django.db.models import Count
+from django.http import Http404, HttpResponse, JsonResponse
+from django.contrib.admin.views.decorators import staff_member_required
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.crypto import constant_time_compare
+from django.utils.http import quote_etag
+from django.views.decorators.http import require_http_methods, require_POST, require_safe
+
+
+from .cache import get_school_info
+from .calendars import EVENT_TYPES, WindowError, event_json, events_in_window, ics_feed, parse_window
 from .forms import (
     UserRegistrationForm, UserRegistrationForm,
     ParentRegistrationForm, StudentRegistrationForm, ContactForm,AdmissionForm
 )
+from .notifications import enqueue_otp, send_otp
+from .conditional import conditional_page
+from .dbpool import pool_stats
+from .metrics import exposition
+from .pagecache import anonymous_page_cache
+from .pagination import KeysetPaginationMixin
+from .ratelimit import ratelimit
+from .search import SearchResults
+from .uploads import (
+    UploadError, add_gallery_images, append_chunk, completed_uploads, remember_upload, start_upload, uploads_of,
+)
 from .models import (
     Announcement, Staff, Student, Event, 
-    News, Gallery, GalleryImage, ContactMessage,
-    SchoolInfo, Parent, Class, Subject, OTP,Program,Facility,Notice
+    News, Gallery, GalleryImage, ContactMessage, AnnouncementAttachment,
+    SchoolInfo, Parent, Class, Subject, OTP,Program,Facility,Notice, ChunkedUpload,
+    NotificationJob,
 )
 
 
+# GET parameters the cached list pages read (see anonymous_page_cache)
+PAGINATION_QUERY = ('page', 'cursor')
+EVENT_LIST_QUERY = ('type', 'month', 'timeframe') + PAGINATION_QUERY
+
+
 # ---------------------------
 # Home Page Views
 # ---------------------------
+@anonymous_page_cache(Announcement, Event, News, SchoolInfo)
 def home(request):
-    school_info = SchoolInfo.objects.first()
+    school_info = get_school_info()
     announcements = Announcement.objects.filter(important=True).order_by('-date_posted')[:3]
     upcoming_events = Event.objects.filter(start_date__gte=timezone.now()).order_by('start_date')[:3]
     latest_news = News.objects.filter(is_published=True).order_by('-date_posted')[:3]
@@ -43,35 +71,41 @@ def home(request):
 # ---------------------------
 # About Views
 # ---------------------------
+@anonymous_page_cache(SchoolInfo, Staff)
 def about(request):
-    school_info = SchoolInfo.objects.first()
+    school_info = get_school_info()
     staff_count = Staff.objects.count()
     return render(request, 'about/about.html', {
         'school_info': school_info,
         'staff_count': staff_count,
     })
 
+@anonymous_page_cache(SchoolInfo)
 def mission(request):
     return render(request, 'about/mission.html', {
-        'school_info': SchoolInfo.objects.first()
+        'school_info': get_school_info()
     })
 
+@anonymous_page_cache(SchoolInfo)
 def history(request):
     return render(request, 'about/history.html', {
-        'school_info': SchoolInfo.objects.first()
+        'school_info': get_school_info()
     })
 
 
 # ---------------------------
 # Announcement Views
 # ---------------------------
-class AnnouncementListView(ListView):
+@method_decorator(conditional_page(Announcement), name='dispatch')
+class AnnouncementListView(KeysetPaginationMixin, ListView):
     model = Announcement
     template_name = 'announcements/list.html'
     context_object_name = 'announcements'
     ordering = ['-date_posted']
     paginate_by = 10
+    keyset_ordering = ('-date_posted', '-pk')
 
+@method_decorator(conditional_page(Announcement, AnnouncementAttachment, related=(User, Staff)), name='dispatch')
 class AnnouncementDetailView(DetailView):
     model = Announcement
     template_name = 'announcements/detail.html'
@@ -81,11 +115,12 @@ class AnnouncementDetailView(DetailView):
 # ---------------------------
 # Staff Views
 # ---------------------------
-class StaffListView(ListView):
+class StaffListView(KeysetPaginationMixin, ListView):
     model = Staff
     template_name = 'about/staff.html'
     context_object_name = 'staff_members'
     paginate_by = 12
+    keyset_ordering = ('-join_date', '-pk')
 
     def get_queryset(self):
         department = self.request.GET.get('department')
@@ -102,7 +137,7 @@ class StaffDetailView(DetailView):
 # ---------------------------
 def academics_view(request):
     return render(request, "academics/academics.html", {
-        "school_info": SchoolInfo.objects.first(),
+        "school_info": get_school_info(),
         "classes": Class.objects.all(),
         "subjects": Subject.objects.all(),
     })
@@ -118,11 +153,14 @@ def subject(request, pk):
 # ---------------------------
 # Event Views
 # ---------------------------
-class EventListView(ListView):
+@method_decorator(conditional_page(Event, upcoming_events=True), name='dispatch')
+@method_decorator(anonymous_page_cache(Event, SchoolInfo, query=EVENT_LIST_QUERY), name='dispatch')
+class EventListView(KeysetPaginationMixin, ListView):
     model = Event
     template_name = 'events/list.html'
     context_object_name = 'events'
     paginate_by = 10
+    keyset_ordering = ('start_date', 'pk')
 
     def get_queryset(self):
         queryset = super().get_queryset()
@@ -143,15 +181,22 @@ class EventListView(ListView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        months = Event.objects.dates('start_date', 'month')
         context.update({
             'current_type': self.request.GET.get('type'),
             'current_month': self.request.GET.get('month'),
             'current_timeframe': self.request.GET.get('timeframe', 'upcoming'),
-            'months': [{'num': date.month, 'name': date.strftime('%B')} for date in months],
+            'months': self.get_months(),
         })
         return context
 
+    def get_months(self):
+        return self.month_choices(Event.objects.dates('start_date', 'month'))
+
+    @staticmethod
+    def month_choices(dates):
+        return [{'num': date.month, 'name': date.strftime('%B')} for date in dates]
+
+@method_decorator(conditional_page(Event, related=(Staff,)), name='dispatch')
 class EventDetailView(DetailView):
     model = Event
     template_name = 'events/detail.html'
@@ -168,13 +213,17 @@ class EventDetailView(DetailView):
 # ---------------------------
 # News Views
 # ---------------------------
-class NewsListView(ListView):
+@method_decorator(conditional_page(News, related=(Staff,)), name='dispatch')
+@method_decorator(anonymous_page_cache(News, SchoolInfo, query=PAGINATION_QUERY), name='dispatch')
+class NewsListView(KeysetPaginationMixin, ListView):
     model = News
     template_name = 'news/list.html'
     context_object_name = 'news_list'
     ordering = ['-date_posted']
     paginate_by = 5
+    keyset_ordering = ('-date_posted', '-pk')
 
+@method_decorator(conditional_page(News, related=(Staff,)), name='dispatch')
 class NewsDetailView(DetailView):
     model = News
     template_name = 'news/detail.html'
@@ -184,19 +233,33 @@ class NewsDetailView(DetailView):
 # ---------------------------
 # Gallery Views
 # ---------------------------
-class GalleryListView(ListView):
+@method_decorator(conditional_page(Gallery, GalleryImage, Event), name='dispatch')
+@method_decorator(
+    anonymous_page_cache(Event, Gallery, GalleryImage, SchoolInfo, query=PAGINATION_QUERY), name='dispatch',
+)
+class GalleryListView(KeysetPaginationMixin, ListView):
     model = Gallery
     template_name = 'gallery/list.html'
     context_object_name = 'galleries'
     paginate_by = 12
+    keyset_ordering = ('-date_created', '-pk')
     
     def get_queryset(self):
-        return Gallery.objects.filter(is_published=True).order_by('-date_created')
-
+        return (
+            Gallery.objects.filter(is_published=True)
+            .select_related('event')
+            .annotate(image_count=Count('images'))
+            .order_by('-date_created')
+        )
+
+@method_decorator(conditional_page(Gallery, GalleryImage, Event), name='dispatch')
 class GalleryDetailView(DetailView):
     model = Gallery
     template_name = 'gallery/detail.html'
     context_object_name = 'gallery'
+
+    def get_queryset(self):
+        return Gallery.objects.select_related('event').prefetch_related('images')
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -205,10 +268,120 @@ class GalleryDetailView(DetailView):
         ).exclude(pk=self.object.pk)[:4]
         return context
 
+@staff_member_required
+def gallery_upload(request, pk):
+    """
+    Staff page for dropping a folder of photos into a gallery. The browser
+    sends each file through the chunked upload endpoints, then posts the
+    finished upload ids here in folder order.
+    """
+    gallery = get_object_or_404(Gallery, pk=pk)
+    if request.method == 'POST':
+        try:
+            uploads = completed_uploads(request.POST.getlist('uploads'), 'gallery_image', request.user)
+        except UploadError as e:
+            return JsonResponse({'error': str(e)}, status=e.status)
+        images = add_gallery_images(gallery, [upload.stored_name for upload in uploads])
+        ChunkedUpload.objects.filter(pk__in=[upload.pk for upload in uploads]).delete()
+        return JsonResponse({'created': len(images), 'url': gallery.get_absolute_url()})
+    return render(request, 'gallery/upload.html', {'gallery': gallery})
+
+
+# ---------------------------
+# Chunked uploads
+# ---------------------------
+def _upload_state(upload):
+    return {
+        'id': str(upload.pk),
+        'offset': upload.received,
+        'size': upload.size,
+        'complete': upload.status == 'complete',
+        'chunk_size': settings.CHUNKED_UPLOAD_MAX_CHUNK,
+    }
+
+
+@require_POST
+@ratelimit('upload', keys=('ip',))
+def upload_start(request):
+    """
+    Open an upload: POST ``purpose``, ``filename`` and ``size``.
+    """
+    try:
+        upload = start_upload(
+            request.user, request.POST.get('purpose'), request.POST.get('filename'), request.POST.get('size'),
+        )
+    except UploadError as e:
+        return JsonResponse({'error': str(e)}, status=e.status)
+    remember_upload(request, upload)
+    return JsonResponse(_upload_state(upload), status=201)
+
+
+@require_http_methods(['GET', 'PUT'])
+def upload_chunk(request, pk):
+    """
+    GET reports how many bytes have arrived, so an interrupted upload can
+    resume. PUT appends the request body, described by its Content-Range.
+    """
+    upload = get_object_or_404(uploads_of(request), pk=pk)
+    if request.method == 'PUT':
+        try:
+            upload = append_chunk(upload, request, request.headers.get('Content-Range'))
+        except UploadError as e:
+            upload.refresh_from_db()
+            return JsonResponse({'error': str(e), **_upload_state(upload)}, status=e.status)
+    return JsonResponse(_upload_state(upload))
+
+
+# ---------------------------
+# Search
+# ---------------------------
+def search(request):
+    query = request.GET.get('q', '').strip()
+    paginator = Paginator(SearchResults(query), 10)
+    page_obj = paginator.get_page(request.GET.get('page'))
+    return render(request, 'search/results.html', {
+        'query': query,
+        'results': page_obj.object_list,
+        'page_obj': page_obj,
+        'is_paginated': page_obj.has_other_pages(),
+    })
+
+
+# ---------------------------
+# Status
+# ---------------------------
+@staff_member_required
+def db_pool_status(request):
+    """
+    The serving worker's database connection pool counters, as JSON.
+    """
+    stats = pool_stats()
+    return JsonResponse({'pooled': stats is not None, **(stats or {})})
+
+
+def _has_metrics_token(request):
+    token = settings.METRICS_TOKEN
+    return bool(token) and constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}')
+
+
+@require_safe
+def metrics(request):
+    """
+    Prometheus metrics in the text exposition format, for staff or a
+    scraper sending ``Authorization: Bearer <METRICS_TOKEN>``.
+    """
+    if not (_has_metrics_token(request) or request.user.is_staff):
+        response = HttpResponse('Authentication required', status=401, content_type='text/plain')
+        response['WWW-Authenticate'] = 'Bearer'
+        return response
+    content, content_type = exposition()
+    return HttpResponse(content, content_type=content_type)
+
 
 # ---------------------------
 # Contact
 # ---------------------------
+@method_decorator(ratelimit('contact', keys=('ip', 'session', 'identity')), name='dispatch')
 class ContactView(CreateView):
     form_class = ContactForm
     template_name = 'contact/contact_form.html'
@@ -263,10 +436,51 @@ def Notice(request):
 # ---------------------------
 # Utility Views
 # ---------------------------
+def calendar_context():
+    return {'event_types': EVENT_TYPES}
+
+
 def calendar(request):
-    return render(request, 'utilities/calendar.html', {
-        'events': Event.objects.all().order_by('start_date')
-    })
+    # The month grid fetches its events from calendar_events
+    return render(request, 'utilities/calendar.html', calendar_context())
+
+
+@require_safe
+@conditional_page(Event)
+def calendar_events(request):
+    """
+    JSON list of the events overlapping ``start``..``end`` (ISO 8601 dates
+    or date-times), optionally of one ``type``.
+    """
+    event_type = request.GET.get('type') or None
+    if event_type and event_type not in EVENT_TYPES:
+        return JsonResponse({'error': f'Unknown event type {event_type!r}'}, status=400)
+    try:
+        start, end = parse_window(request.GET.get('start'), request.GET.get('end'))
+    except WindowError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    events = events_in_window(start, end, event_type)
+    return JsonResponse({'events': [event_json(event) for event in events]})
+
+
+@require_safe
+def calendar_feed(request, event_type):
+    """
+    Subscribable iCalendar feed of one event type, or of every event for
+    ``all``.
+    """
+    if event_type != 'all' and event_type not in EVENT_TYPES:
+        raise Http404('Unknown event type')
+    event_type = None if event_type == 'all' else event_type
+    school_info = get_school_info()
+    school_name = school_info.name if school_info else 'School'
+    calendar_name = f'{school_name} {EVENT_TYPES[event_type]} events' if event_type else f'{school_name} events'
+    content, etag = ics_feed(event_type, calendar_name)
+
+    response = HttpResponse(content, content_type='text/calendar; charset=utf-8')
+    response['ETag'] = quote_etag(etag)
+    patch_cache_control(response, public=True, max_age=settings.CALENDAR_FEED_MAX_AGE)
+    return get_conditional_response(request, etag=response['ETag'], response=response)
 
 def resources(request):
     return render(request, 'utilities/resources.html')
@@ -276,31 +490,33 @@ def faq(request):
 
 def privacy(request):
     return render(request, 'utilities/privacy.html', {
-        'school_info': SchoolInfo.objects.first()
+        'school_info': get_school_info()
     })
 
 def terms(request):
     return render(request, 'utilities/terms.html', {
-        'school_info': SchoolInfo.objects.first()
+        'school_info': get_school_info()
     })
 
 def sitemap(request):
-    return render(request, 'utilities/sitemap.html', {'school_info': SchoolInfo.objects.first()})
+    return render(request, 'utilities/sitemap.html', {'school_info': get_school_info()})
 
 def accessibility(request):
-    return render(request, 'utilities/accessibility.html', {'school_info': SchoolInfo.objects.first()})
+    return render(request, 'utilities/accessibility.html', {'school_info': get_school_info()})
 
 # About / Facilities page
+@anonymous_page_cache(Facility, SchoolInfo)
 def facilities(request):
     return render(request, 'about/facilities.html', {
-        'school_info': SchoolInfo.objects.first(),
+        'school_info': get_school_info(),
         'facilities': Facility.objects.all()
     })
 
 # Academics / Special Programs page
+@anonymous_page_cache(Program, SchoolInfo)
 def programs(request):
     return render(request, 'academics/programs.html', {
-        'school_info': SchoolInfo.objects.first(),
+        'school_info': get_school_info(),
         'programs': Program.objects.all()
     })
 
@@ -313,13 +529,16 @@ def admission(request):
     Handles the admission application process.
     """
     if request.method == 'POST':
-        form = AdmissionForm(request.POST, request.FILES)
+        form = AdmissionForm(request.POST, request.FILES, uploads=uploads_of(request))
         if form.is_valid():
             admission = form.save(commit=False)
             # You can set the user if they are logged in, or leave it anonymous
             if request.user.is_authenticated:
                 admission.user = request.user
             admission.save()
+            if form.cleaned_data.get('report_card_upload'):
+                # The file now belongs to the application
+                ChunkedUpload.objects.filter(pk=form.cleaned_data['report_card_upload']).delete()
             messages.success(request, 'Your admission application has been submitted successfully!')
             return redirect('admission-success') # Redirect to a success page
         else:
@@ -329,7 +548,7 @@ def admission(request):
 
     return render(request, 'academics/admissions.html', {
         'form': form,
-        'school_info': SchoolInfo.objects.first(),
+        'school_info': get_school_info(),
     })
 
 def admission_success(request):
@@ -337,7 +556,7 @@ def admission_success(request):
     A simple view to display a success message after submitting an application.
     """
     return render(request, 'academics/admission_success.html', {
-        'school_info': SchoolInfo.objects.first(),
+        'school_info': get_school_info(),
     })
 
 
@@ -348,38 +567,6 @@ def register(request):
     return render(request, 'registration/register.html')
 
 
-def send_otp_email(email, otp_code):
-    subject = 'Your OTP Code for Registration'
-    message = f'Your OTP code is: {otp_code}. It will expire in 10 minutes.'
-    send_mail(subject, message, settings.DEFAULT_FROM_EMAIL, [email], fail_silently=False)
-
-
-# ---------------------------
-# Send OTP via WhatsApp
-# ---------------------------
-def send_otp_whatsapp(phone_number, otp_code):
-    client = Client(settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN)
-    message = client.messages.create(
-        body=f"Your OTP code is: {otp_code}. It will expire in 10 minutes.",
-        from_=settings.TWILIO_WHATSAPP_NUMBER,  # Twilio sandbox WhatsApp number
-        to=f"whatsapp:{phone_number}"
-    )
-    return message.sid
-
-
-# ---------------------------
-# Send OTP via SMS
-# ---------------------------
-def send_otp_sms(phone_number, otp_code):
-    client = Client(settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN)
-    message = client.messages.create(
-        body=f"Your OTP code is: {otp_code}. It will expire in 10 minutes.",
-        from_=settings.TWILIO_PHONE_NUMBER,  # Twilio SMS-enabled number
-        to=phone_number
-    )
-    return message.sid
-
-
 # ---------------------------
 # Student Register
 # ---------------------------
@@ -412,6 +599,7 @@ def student_register(request):
 # ---------------------------
 # Parent Register
 # ---------------------------
+@ratelimit('otp', keys=('ip', 'session', 'identity'))
 def parent_register(request):
     if request.method == 'POST':
         if 'verify_otp' in request.POST:
@@ -421,32 +609,32 @@ def parent_register(request):
             country_code = request.session.get('registration_country_code')
             otp_code = request.POST.get('otp_code')
 
-            try:
-                otp = OTP.objects.get(
-                    email=email,
-                    phone_number=phone_number,
-                    otp_code=otp_code,
-                    is_verified=False
-                )
-                if otp.is_expired():
+            candidates = OTP.objects.filter(
+                email=email,
+                phone_number=phone_number,
+                otp_code=otp_code,
+                is_verified=False
+            )
+            otp = candidates.filter(created_at__gt=OTP.expiry_cutoff()).order_by('-created_at').first()
+            if otp is None:
+                if candidates.exists():
                     messages.error(request, 'OTP has expired. Please request a new one.')
                 else:
-                    otp.is_verified = True
-                    otp.save()
-
-                    user_form = UserRegistrationForm(request.session.get('user_form_data'))
-                    parent_form = ParentRegistrationForm(request.session.get('parent_form_data'))
-
-                    if user_form.is_valid() and parent_form.is_valid():
-                        user = user_form.save()
-                        parent = parent_form.save(commit=False)
-                        parent.user = user
-                        parent.save()
-                        login(request, user)
-                        messages.success(request, 'Parent registration successful!')
-                        return redirect('home')
-            except OTP.DoesNotExist:
-                messages.error(request, 'Invalid OTP code.')
+                    messages.error(request, 'Invalid OTP code.')
+            else:
+                OTP.objects.filter(pk=otp.pk).update(is_verified=True)
+
+                user_form = UserRegistrationForm(request.session.get('user_form_data'))
+                parent_form = ParentRegistrationForm(request.session.get('parent_form_data'))
+
+                if user_form.is_valid() and parent_form.is_valid():
+                    user = user_form.save()
+                    parent = parent_form.save(commit=False)
+                    parent.user = user
+                    parent.save()
+                    login(request, user)
+                    messages.success(request, 'Parent registration successful!')
+                    return redirect('home')
 
             return render(request, 'registration/verify_otp.html', {
                 'email': email,
@@ -474,23 +662,7 @@ def parent_register(request):
                 request.session['registration_phone'] = full_phone_number
                 request.session['registration_country_code'] = country_code
 
-                otp = OTP.generate_otp(email=email, phone_number=full_phone_number)
-
-                # Send OTP via email
-                send_otp_email(email, otp.otp_code)
-
-                # Send OTP via WhatsApp and SMS if phone number provided
-                if full_phone_number:
-                    try:
-                        send_otp_whatsapp(full_phone_number, otp.otp_code)
-                    except Exception as e:
-                        messages.warning(request, f'WhatsApp OTP failed: {str(e)}')
-                    
-                    try:
-                        send_otp_sms(full_phone_number, otp.otp_code)
-                    except Exception as e:
-                        messages.warning(request, f'SMS OTP failed: {str(e)}')
-
+                _deliver_otp(request, email, full_phone_number)
                 messages.info(request, f'An OTP has been sent to {email} and phone number {full_phone_number}.')
                 return render(request, 'registration/verify_otp.html', {
                     'email': email,
@@ -507,30 +679,34 @@ def parent_register(request):
     })
 
 
+def _deliver_otp(request, email, phone_number):
+    """
+    Create an OTP and send it by email, WhatsApp and SMS: through the
+    notification worker, or right away when OTP_DELIVERY is "inline", with
+    a warning for each channel that failed.
+    """
+    if settings.OTP_DELIVERY != 'inline':
+        with transaction.atomic():
+            enqueue_otp(OTP.generate_otp(email=email, phone_number=phone_number))
+        return
+    otp = OTP.generate_otp(email=email, phone_number=phone_number)
+    channels = dict(NotificationJob.CHANNEL_CHOICES)
+    for message, error in send_otp(otp):
+        if error is not None:
+            messages.warning(request, f'{channels[message.channel]} OTP failed: {error}')
+
+
 # ---------------------------
 # Resend OTP
 # ---------------------------
+@ratelimit('otp', keys=('ip', 'session'), methods=None)
 def resend_otp(request):
     email = request.session.get('registration_email')
     phone_number = request.session.get('registration_phone')
     country_code = request.session.get('registration_country_code')
 
     if email or phone_number:
-        otp = OTP.generate_otp(email=email, phone_number=phone_number)
-
-        if email:
-            send_otp_email(email, otp.otp_code)
-        if phone_number:
-            try:
-                send_otp_whatsapp(phone_number, otp.otp_code)
-            except Exception as e:
-                messages.warning(request, f'WhatsApp OTP failed: {str(e)}')
-            
-            try:
-                send_otp_sms(phone_number, otp.otp_code)
-            except Exception as e:
-                messages.warning(request, f'SMS OTP failed: {str(e)}')
-
+        _deliver_otp(request, email, phone_number)
         messages.info(request, f'A new OTP has been sent to {email} and phone number {phone_number}.')
     else:
         messages.error(request, 'Session expired. Please start registration again.')
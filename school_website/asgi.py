@@ -2,6 +2,9 @@
 ASGI config for school_website project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+To serve it, with the async public views, run:
+
+    ASYNC_VIEWS=True gunicorn school_website.asgi:application -k uvicorn_worker.UvicornWorker
 
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
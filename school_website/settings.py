@@ -13,6 +13,11 @@ DEBUG = os.environ.get("DEBUG", "False") == "True"
 
 ALLOWED_HOSTS = ["*"]  # For Render, "*" works, but you can add your Render domain
 
+# The site's canonical address. Links and ids in output that is cached and
+# shared between visitors (the calendar feeds) use it rather than the
+# request's Host header, which any client can set.
+SITE_URL = os.environ.get("SITE_URL", "http://localhost:8000").rstrip('/')
+
 # Application definition
 INSTALLED_APPS = [
     'django.contrib.admin',
@@ -33,7 +38,8 @@ if DEBUG:
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',  # must be above others
+    'main.middleware.WhiteNoiseMiddleware',  # must be above others
+    'main.middleware.RequestTimingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -46,7 +52,7 @@ ROOT_URLCONF = 'school_website.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'main.instrumentation.DjangoTemplates',  # DjangoTemplates that reports render time
         'DIRS': [os.path.join(BASE_DIR, 'main/templates')],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -71,6 +77,135 @@ DATABASES = {
     )
 }
 
+# PostgreSQL: DB_POOL=True swaps each worker's persistent connection for a
+# psycopg_pool connection pool (needs psycopg 3: pip install "psycopg[pool]").
+# One pool is shared by all of a worker's threads, so with gunicorn's gthread
+# workers DB_POOL_MAX_SIZE, not --threads, bounds the connections per worker.
+DB_POOL = os.environ.get("DB_POOL", "False") == "True"
+if DB_POOL and DATABASES['default']['ENGINE'] == 'django.db.backends.postgresql':
+    DB_POOL_OPTIONS = {
+        'min_size': int(os.environ.get("DB_POOL_MIN_SIZE", 2)),
+        'max_size': int(os.environ.get("DB_POOL_MAX_SIZE", 10)),
+        # Seconds a request waits for a free connection before erroring
+        'timeout': float(os.environ.get("DB_POOL_TIMEOUT", 10)),
+        'max_idle': float(os.environ.get("DB_POOL_MAX_IDLE", 300)),
+        'max_lifetime': float(os.environ.get("DB_POOL_MAX_LIFETIME", 3600)),
+    }
+    DATABASES['default']['CONN_MAX_AGE'] = 0  # the pool keeps connections instead
+    # Health check: the pool tests each connection as it hands it out
+    DATABASES['default']['CONN_HEALTH_CHECKS'] = os.environ.get("DB_POOL_CHECK", "True") == "True"
+    DATABASES['default'].setdefault('OPTIONS', {})['pool'] = DB_POOL_OPTIONS
+
+# SQLite (the default when DATABASE_URL is unset) tuned for several gunicorn
+# workers writing at once. The pragmas run on every new connection.
+SQLITE_TUNING = os.environ.get("SQLITE_TUNING", "True") == "True"
+if SQLITE_TUNING and DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+    DATABASES['default'].setdefault('OPTIONS', {}).update({
+        # Take the write lock at BEGIN: a transaction that reads and then
+        # writes can't be refused with "database is locked" halfway through
+        'transaction_mode': os.environ.get("SQLITE_TRANSACTION_MODE", "IMMEDIATE"),
+        'init_command': ';'.join([
+            # Readers don't block the writer or each other
+            f'PRAGMA journal_mode={os.environ.get("SQLITE_JOURNAL_MODE", "WAL")}',
+            # Safe with WAL: a power cut can lose the last commits, not corrupt the file
+            f'PRAGMA synchronous={os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL")}',
+            # Milliseconds a writer waits for the lock before giving up
+            f'PRAGMA busy_timeout={int(os.environ.get("SQLITE_BUSY_TIMEOUT", 20000))}',
+            f'PRAGMA mmap_size={int(os.environ.get("SQLITE_MMAP_SIZE", 256 * 1024 * 1024))}',
+            # Negative: KiB rather than pages, per connection
+            f'PRAGMA cache_size={int(os.environ.get("SQLITE_CACHE_SIZE", -64000))}',
+        ]),
+    })
+
+# Cache (set CACHE_BACKEND/CACHE_LOCATION to point at Redis or Memcached).
+# Every gunicorn worker must see the same cache: saving SchoolInfo, purging
+# cached pages, rate limits and the calendar feeds all rely on it. So with
+# DEBUG off the default is a file cache all workers on this host share;
+# LocMemCache is per process and only the default for runserver, and the
+# main.E001 system check refuses it with DEBUG off.
+# Rate-limit buckets get a cache of their own so a flood of cached pages
+# can't evict them. The file and local-memory caches cull a third of their
+# entries once they hold MAX_ENTRIES (Django's default is 300), so it is
+# raised well past what the site itself stores; Redis and Memcached evict
+# by their own policy and take no such option.
+CACHE_BACKEND = os.environ.get("CACHE_BACKEND", (
+    "django.core.cache.backends.locmem.LocMemCache" if DEBUG
+    else "django.core.cache.backends.filebased.FileBasedCache"
+))
+CACHE_LOCATION = os.environ.get("CACHE_LOCATION", "school-website" if DEBUG else str(BASE_DIR / 'cache'))
+CACHE_OPTIONS = {
+    'MAX_ENTRIES': int(os.environ.get("CACHE_MAX_ENTRIES", 100000)),
+} if CACHE_BACKEND.endswith(('.FileBasedCache', '.LocMemCache')) else {}
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': CACHE_LOCATION,
+        'OPTIONS': CACHE_OPTIONS,
+    },
+    'ratelimit': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': os.environ.get("RATELIMIT_CACHE_LOCATION", (
+            CACHE_LOCATION + '-ratelimit' if CACHE_BACKEND.endswith(('.FileBasedCache', '.LocMemCache'))
+            else CACHE_LOCATION
+        )),
+        'KEY_PREFIX': 'ratelimit',
+        'OPTIONS': CACHE_OPTIONS,
+    },
+}
+
+# SchoolInfo is read on every page, so it is cached until it is saved or deleted
+SCHOOL_INFO_CACHE_ALIAS = os.environ.get("SCHOOL_INFO_CACHE_ALIAS", "default")
+SCHOOL_INFO_CACHE_TIMEOUT = int(os.environ.get("SCHOOL_INFO_CACHE_TIMEOUT", 60 * 60 * 24))
+
+# Full-page cache of public pages for anonymous visitors (see main/pagecache.py),
+# purged when the models a page shows are saved or deleted
+PAGE_CACHE_ENABLE = os.environ.get("PAGE_CACHE_ENABLE", "True") == "True"
+PAGE_CACHE_ALIAS = os.environ.get("PAGE_CACHE_ALIAS", "default")
+PAGE_CACHE_TIMEOUT = int(os.environ.get("PAGE_CACHE_TIMEOUT", 600))
+
+# Token-bucket throttling of OTP and contact form submissions (see main/ratelimit.py)
+RATELIMIT_ENABLE = os.environ.get("RATELIMIT_ENABLE", "True") == "True"
+RATELIMIT_CACHE_ALIAS = os.environ.get("RATELIMIT_CACHE_ALIAS", "ratelimit")
+RATELIMIT_IP_HEADER = os.environ.get("RATELIMIT_IP_HEADER", "")  # e.g. HTTP_X_FORWARDED_FOR behind a proxy
+RATELIMITS = {
+    'otp': os.environ.get("RATELIMIT_OTP", "5/10m"),
+    'contact': os.environ.get("RATELIMIT_CONTACT", "10/h"),
+    'upload': os.environ.get("RATELIMIT_UPLOAD", "300/h"),
+}
+
+# Site search ranks at most this many of the most recently indexed matches for
+# a query (manage.py rebuild_search_index indexes in date order)
+SEARCH_RANK_WINDOW = int(os.environ.get("SEARCH_RANK_WINDOW", 1000))
+
+# List pagination: "page" (numbered pages) or "keyset" (cursor-based, no COUNT/OFFSET)
+LIST_PAGINATION_MODE = os.environ.get("LIST_PAGINATION_MODE", "page")
+
+# Calendar: the JSON API answers windows of at most CALENDAR_MAX_WINDOW_DAYS;
+# the .ics feeds reach back CALENDAR_FEED_PAST_DAYS and tell subscribers to
+# re-poll after CALENDAR_FEED_MAX_AGE seconds
+CALENDAR_MAX_WINDOW_DAYS = int(os.environ.get("CALENDAR_MAX_WINDOW_DAYS", 366))
+CALENDAR_FEED_PAST_DAYS = int(os.environ.get("CALENDAR_FEED_PAST_DAYS", 365))
+CALENDAR_FEED_MAX_AGE = int(os.environ.get("CALENDAR_FEED_MAX_AGE", 900))
+CALENDAR_FEED_TIMEOUT = int(os.environ.get("CALENDAR_FEED_TIMEOUT", 86400))  # cached feeds and events
+
+# Serve home, calendar and the announcement/event/news/gallery pages with the
+# async views in main/async_views.py. Only worth it under ASGI (see asgi.py).
+ASYNC_VIEWS = os.environ.get("ASYNC_VIEWS", "False") == "True"
+
+# Per-view request timings (see main/instrumentation.py). Every request's queries
+# are timed, and its render time for REQUEST_TIMING_SAMPLE_RATE of requests; any
+# request slower than REQUEST_TIMING_SLOW_MS is logged as JSON with its slowest
+# queries.
+REQUEST_TIMING_ENABLE = os.environ.get("REQUEST_TIMING_ENABLE", "True") == "True"
+REQUEST_TIMING_SAMPLE_RATE = float(os.environ.get("REQUEST_TIMING_SAMPLE_RATE", 0.1))
+REQUEST_TIMING_SLOW_MS = float(os.environ.get("REQUEST_TIMING_SLOW_MS", 1000))
+REQUEST_TIMING_SLOW_QUERIES = int(os.environ.get("REQUEST_TIMING_SLOW_QUERIES", 5))  # logged per slow request
+
+# Prometheus metrics at /metrics (see main/metrics.py), for staff or for
+# "Authorization: Bearer <METRICS_TOKEN>". Under gunicorn, also set
+# PROMETHEUS_MULTIPROC_DIR so the page covers every worker process.
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {"NAME": 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
@@ -94,6 +229,44 @@ STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"
 # Media files
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Uploads are served by main.media.serve_media. Set MEDIA_SENDFILE to
+# "x-accel-redirect" (nginx) or "x-sendfile" (Apache, lighttpd) to let the
+# front proxy send the bytes after Django has checked access.
+MEDIA_SENDFILE = os.environ.get("MEDIA_SENDFILE", "")
+MEDIA_ACCEL_PREFIX = os.environ.get("MEDIA_ACCEL_PREFIX", "/protected-media/")  # nginx "internal" location
+MEDIA_CACHE_MAX_AGE = int(os.environ.get("MEDIA_CACHE_MAX_AGE", 60 * 60))
+
+# Chunked, resumable uploads (see main/uploads.py). Keep CHUNKED_UPLOAD_DIR on
+# the same filesystem as MEDIA_ROOT so finishing an upload is a single rename.
+CHUNKED_UPLOAD_DIR = os.environ.get("CHUNKED_UPLOAD_DIR", os.path.join(BASE_DIR, 'uploads_partial'))
+CHUNKED_UPLOAD_MAX_CHUNK = int(os.environ.get("CHUNKED_UPLOAD_MAX_CHUNK", 5 * 1024 * 1024))
+CHUNKED_UPLOAD_MAX_SIZE = int(os.environ.get("CHUNKED_UPLOAD_MAX_SIZE", 100 * 1024 * 1024))
+CHUNKED_UPLOAD_EXPIRY = int(os.environ.get("CHUNKED_UPLOAD_EXPIRY", 60 * 60 * 24))
+GALLERY_BULK_BATCH_SIZE = 100
+
+# Rows fetched per query (and CSV rows per write) by the exports in main/exports.py
+EXPORT_CHUNK_SIZE = int(os.environ.get("EXPORT_CHUNK_SIZE", 2000))
+
+# Bulk CSV imports (see main/imports.py): rows per bulk_create transaction, and
+# processes hashing the imported accounts' passwords
+IMPORT_BATCH_SIZE = int(os.environ.get("IMPORT_BATCH_SIZE", 500))
+IMPORT_HASH_WORKERS = int(os.environ.get("IMPORT_HASH_WORKERS", os.cpu_count() or 1))
+# The admin's Import CSV page must finish within the request: at most this
+# many rows, and this many passwords (about half a second each to hash)
+IMPORT_ADMIN_MAX_ROWS = int(os.environ.get("IMPORT_ADMIN_MAX_ROWS", 1000))
+IMPORT_ADMIN_MAX_PASSWORDS = int(os.environ.get("IMPORT_ADMIN_MAX_PASSWORDS", 20))
+
+# Admin change lists of tables with at least this many rows (by the database's
+# estimate) show the estimate instead of running COUNT(*) on every page view
+ADMIN_ESTIMATED_COUNT_THRESHOLD = int(os.environ.get("ADMIN_ESTIMATED_COUNT_THRESHOLD", 100000))
+
+# Resized copies generated next to each uploaded gallery/staff/student image
+IMAGE_DERIVATIVE_WIDTHS = [320, 640, 1024]
+IMAGE_DERIVATIVE_QUALITY = 80
+# Which derivatives each image has is cached, so srcsets don't ask the storage
+# once per width and format on every render
+IMAGE_DERIVATIVE_CACHE_ALIAS = os.environ.get("IMAGE_DERIVATIVE_CACHE_ALIAS", "default")
+IMAGE_DERIVATIVE_CACHE_TIMEOUT = int(os.environ.get("IMAGE_DERIVATIVE_CACHE_TIMEOUT", 60 * 60 * 24))
 
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
@@ -117,3 +290,17 @@ TWILIO_ACCOUNT_SID = os.environ.get("TWILIO_ACCOUNT_SID", "")
 TWILIO_AUTH_TOKEN = os.environ.get("TWILIO_AUTH_TOKEN", "")
 TWILIO_WHATSAPP_NUMBER = os.environ.get("TWILIO_WHATSAPP_NUMBER", "whatsapp:+14155238886")
 TWILIO_PHONE_NUMBER = os.environ.get("TWILIO_PHONE_NUMBER", "")
+
+# Notification queue (OTP email/SMS/WhatsApp), drained by `manage.py run_notification_worker`.
+# Use "main.notifications.LocMemBackend" to develop or test without contacting providers.
+NOTIFICATION_BACKEND = os.environ.get("NOTIFICATION_BACKEND", "main.notifications.ProviderBackend")
+NOTIFICATION_MAX_ATTEMPTS = int(os.environ.get("NOTIFICATION_MAX_ATTEMPTS", 5))
+NOTIFICATION_RETRY_BACKOFF = int(os.environ.get("NOTIFICATION_RETRY_BACKOFF", 30))  # seconds, doubled per attempt
+NOTIFICATION_CLAIM_TIMEOUT = int(os.environ.get("NOTIFICATION_CLAIM_TIMEOUT", 300))
+NOTIFICATION_CONCURRENCY = int(os.environ.get("NOTIFICATION_CONCURRENCY", 8))  # parallel SMS/WhatsApp sends per batch
+NOTIFICATION_TIMEOUT = int(os.environ.get("NOTIFICATION_TIMEOUT", 10))  # seconds per provider call
+
+# OTPs go through the queue ("queue") or are sent during the registration
+# request ("inline"), all channels at once, each given OTP_SEND_TIMEOUT seconds.
+OTP_DELIVERY = os.environ.get("OTP_DELIVERY", "queue")
+OTP_SEND_TIMEOUT = float(os.environ.get("OTP_SEND_TIMEOUT", 8))
@@ -14,16 +14,20 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+import re
+
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, re_path, include
 from django.conf import settings
-from django.conf.urls.static import static
+
+from main.media import serve_media
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include('main.urls')),  # Main app URLs
     path('accounts/', include('django.contrib.auth.urls')),  # Authentication URLs
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+    re_path(r'^%s(?P<path>.+)$' % re.escape(settings.MEDIA_URL.lstrip('/')), serve_media, name='media'),
+]
 
 # Add debug toolbar URLs if in development
 if settings.DEBUG: